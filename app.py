@@ -3,39 +3,195 @@ KIA Python Trading Challenge - Web-Based Team Competition
 A real-time multiplayer game for teaching Python to financial professionals
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, g, Response, send_file
 from flask_socketio import SocketIO, emit, join_room
 import qrcode
+import qrcode.image.svg
 import io
 import base64
 import os
 import secrets
 from datetime import datetime
-import re
+from functools import lru_cache
 import socket
+import threading
+import time
+import hashlib
+import math
+import re
 import anthropic
+from llm_client import CircuitBreaker, LLMBusy, FenceStripper, strip_code_fences
+from llm_backends import create_llm
+from generation_cache import GenerationCache, normalize_prompt
+from sandbox import SandboxPool, SandboxBusy, DEFAULT_USER as DEFAULT_GRADING_USER
+from state_store import create_store, JournaledStore
+from question_bank import OutputMatcher
+from content_packs import (QuestionBank, SCHEMAS as PACK_SCHEMAS, CONTENT_DIR, DEFAULT_RELOAD_INTERVAL,
+                           watch as watch_question_banks)
+import verify_bank
+from broadcaster import TrainerBroadcaster
+from round_timer import RoundTimer, anchor as timer_anchor
+from metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from compression import Compressor, StaticBundles, DEFAULT_MIN_SIZE, negotiate
+import vendor_assets
+
+
+LOCAL_IP_TTL = 30  # seconds before the LAN IP is re-detected
+_local_ip_cache = {'ip': None, 'checked_at': 0.0}
 
 
 def get_local_ip():
-    """Get the local network IP address"""
+    """Get the local network IP address (re-detected at most every LOCAL_IP_TTL seconds)"""
+    now = time.monotonic()
+    if _local_ip_cache['ip'] and now - _local_ip_cache['checked_at'] < LOCAL_IP_TTL:
+        return _local_ip_cache['ip']
     try:
         # Create a socket to determine the local IP
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
         ip = s.getsockname()[0]
         s.close()
-        return ip
     except:
-        return "localhost"
+        ip = "localhost"
+    _local_ip_cache['ip'] = ip
+    _local_ip_cache['checked_at'] = now
+    return ip
 
-app = Flask(__name__)
+# static/ is only served through the fingerprinted /assets/ route
+app = Flask(__name__, static_folder=None)
 app.secret_key = os.environ.get('SECRET_KEY', secrets.token_hex(32))
-socketio = SocketIO(app, cors_allowed_origins="*")
+
+# Prometheus metrics served on /metrics (METRICS_TOKEN, if set, is required as a bearer token)
+metrics = Registry()
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    'kia_http_request_duration_seconds', 'Flask request latency by route', ('method', 'route', 'status'))
+HTTP_IN_FLIGHT = metrics.gauge(
+    'kia_http_requests_in_flight', 'Requests currently being handled', ('route',))
+SOCKETIO_CONNECTIONS = metrics.gauge(
+    'kia_socketio_connections', 'Open Socket.IO connections')
+SOCKETIO_EMITS = metrics.counter(
+    'kia_socketio_emits_total', 'Socket.IO emits by event name', ('event',))
+LLM_CALL_SECONDS = metrics.histogram(
+    'kia_llm_call_duration_seconds', 'Code generation call latency', ('backend', 'mode', 'outcome'),
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60))
+LLM_ERRORS = metrics.counter(
+    'kia_llm_errors_total', 'Failed code generation calls', ('backend', 'kind'))
+
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO that counts every emit by event name
+
+    flask_socketio's emit() and send() in event handlers look this instance up on the app and
+    call its emit(), so they are counted here too; wrapping them as well would count them twice.
+    """
+
+    def emit(self, event, *args, **kwargs):
+        SOCKETIO_EMITS.inc(event)
+        return super().emit(event, *args, **kwargs)
+
+
+# Game state backend: 'memory' or 'journal:///dir' (one worker; the journal survives restarts),
+# 'redis://...' or 'sqlite:///path.db' (shared by workers)
+STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+
+# With a shared backend, several workers must also share Socket.IO emits
+SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE') or (
+    STATE_BACKEND if STATE_BACKEND.startswith(('redis://', 'rediss://')) else None)
+
+# threading suits the dev server and `gunicorn --threads`; wsgi.py switches to gevent
+# so a single worker can hold thousands of idle WebSocket connections
+socketio = InstrumentedSocketIO(app, cors_allowed_origins="*",
+                    async_mode=os.environ.get('SOCKETIO_ASYNC_MODE', 'threading'),
+                    message_queue=SOCKETIO_MESSAGE_QUEUE)
+
+# SOCKETIO_TRANSPORT=websocket connects over WebSocket first (falling back to
+# long-polling if it's blocked); 'polling' forces HTTP long-polling only
+SOCKETIO_TRANSPORTS = {
+    'websocket': ['websocket', 'polling'],
+    'polling': ['polling']
+}.get(os.environ.get('SOCKETIO_TRANSPORT', 'websocket'), ['websocket', 'polling'])
+
+
+# Trainer dashboards get one merged update frame per TRAINER_BROADCAST_TICK_MS
+# (0 sends every update straight away)
+trainer_broadcaster = TrainerBroadcaster(
+    socketio, tick=float(os.environ.get('TRAINER_BROADCAST_TICK_MS', 250)) / 1000)
+
+
+@app.context_processor
+def inject_socketio_transports():
+    return {'socketio_transports': SOCKETIO_TRANSPORTS}
+
+
+@app.context_processor
+def inject_vendor_assets():
+    # Self-hosted copies from `python vendor_assets.py` when present, the CDN otherwise
+    return {'vendor_url': vendor_assets.url_for_asset, 'vendor_base_url': vendor_assets.base_url}
+
+
+# Page CSS/JS from static/, fingerprinted and precompressed once at startup
+static_bundles = StaticBundles()
+
+# HTML and JSON responses of at least COMPRESS_MIN_SIZE bytes are gzip/brotli-compressed;
+# COMPRESSION=0 leaves that to a reverse proxy
+COMPRESSION = os.environ.get('COMPRESSION', '1').lower() not in ('0', 'false', 'no')
+compressor = Compressor(min_size=int(os.environ.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)))
+
+
+@app.context_processor
+def inject_static_bundles():
+    return {'asset_url': static_bundles.url}
+
+
+# Seconds a team's code may run in the browser before its Pyodide worker is killed and replaced
+PYTHON_RUN_TIMEOUT = float(os.environ.get('PYTHON_RUN_TIMEOUT', 5))
+
+# QR_ENDPOINT=1 points dashboards at /qr/<game>.svg (ETag-cached; .png also served)
+# instead of inlining base64 PNGs in the HTML
+QR_ENDPOINT = os.environ.get('QR_ENDPOINT', '').lower() in ('1', 'true', 'yes')
+QR_JOIN_PATHS = {'python': '/join', 'prompt': '/prompt-join'}
 
 # Game configuration
 ROUND_TIME_LIMIT = 300  # 5 minutes per round
 
-# Pre-game poll configuration
+# Server-side grading (SERVER_GRADING=1 runs submitted code in a sandbox pool
+# instead of trusting the output reported by the browser)
+SERVER_GRADING = os.environ.get('SERVER_GRADING', '').lower() in ('1', 'true', 'yes')
+GRADING_USER = os.environ.get('GRADING_USER', DEFAULT_GRADING_USER) or None   # used when running as root
+grading_pool = None
+if SERVER_GRADING:
+    grading_pool = SandboxPool(
+        workers=int(os.environ.get('GRADING_WORKERS', 0)) or None,
+        cpu_time_limit=float(os.environ.get('GRADING_CPU_LIMIT', 2)),
+        wall_time_limit=float(os.environ.get('GRADING_WALL_LIMIT', 5)),
+        memory_limit_mb=int(os.environ.get('GRADING_MEMORY_MB', 256)),
+        user=GRADING_USER
+    ).start()
+
+# Code generation backend: the Claude API by default, or a local stub / recording for
+# offline rehearsals and load tests (LLM_BACKEND; LLM_* env vars tune the API client)
+LLM_BACKEND_NAME = os.environ.get('LLM_BACKEND', 'anthropic').split(':')[0]
+llm = create_llm(
+    os.environ.get('LLM_BACKEND', 'anthropic'),
+    model=os.environ.get('LLM_MODEL', 'claude-sonnet-4-20250514'),
+    timeout=float(os.environ.get('LLM_TIMEOUT', 20)),
+    max_retries=int(os.environ.get('LLM_MAX_RETRIES', 3)),
+    max_connections=int(os.environ.get('LLM_MAX_CONNECTIONS', 20)),
+    breaker=CircuitBreaker(
+        threshold=int(os.environ.get('LLM_BREAKER_THRESHOLD', 5)),
+        reset_timeout=float(os.environ.get('LLM_BREAKER_RESET', 30))
+    )
+)
+
+# Generated code is reused for identical prompts on the same challenge
+generation_cache = GenerationCache(
+    max_entries=int(os.environ.get('GENERATION_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('GENERATION_CACHE_TTL', 900))
+)
+
+# Pre-game icebreaker poll, created at startup; trainers can define more polls at runtime
+ICEBREAKER_POLL = 'icebreaker'
+POLL_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{1,40}')
 POLL_QUESTION = "What Takes Most of Your Time?"
 POLL_OPTIONS = [
     "Manual data entry and Excel formatting",
@@ -45,801 +201,70 @@ POLL_OPTIONS = [
     "Updating dashboards"
 ]
 
-# Game state stored in memory (use Redis for production scaling)
-game_state = {
-    'teams': {},  # team_id: {name, score, current_round, answers, joined_at}
-    'current_round': 0,
-    'round_start_time': None,
-    'game_started': False,
-    'game_paused': False,
-    'trainer_connected': False,
-    'poll_active': False,
-    'poll_votes': {}  # team_id: [selected_options]
+# All game state (teams, scores, answers, rankings, poll votes, round state) lives in the store.
+# The Python Challenge and the AI Prompt Challenge are kept apart as two named games.
+PYTHON_GAME = 'python'
+PROMPT_GAME = 'prompt'
+store = create_store(STATE_BACKEND)
+if store.get_poll(ICEBREAKER_POLL) is None:
+    store.create_poll(ICEBREAKER_POLL, POLL_QUESTION, POLL_OPTIONS)
+
+# Question banks, compiled from the JSON packs in content/<game>/ (CONTENT_DIR). Edited packs are
+# picked up every CONTENT_RELOAD_INTERVAL seconds (0 disables) without a restart.
+# Python questions: code_template = incomplete code for trainees to complete,
+# solution_code = correct solution (shown if wrong), expected_output = what the output should be.
+# Client payloads leave out solutions (and, in the Python game, expected outputs) until a team
+# has attempted the question; prompt challenges show their expected output up front.
+CONTENT_RELOAD_INTERVAL = float(os.environ.get('CONTENT_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL))
+question_banks = {
+    PYTHON_GAME: QuestionBank(os.path.join(CONTENT_DIR, 'python'), PACK_SCHEMAS['python']),
+    PROMPT_GAME: QuestionBank(os.path.join(CONTENT_DIR, 'prompt'), PACK_SCHEMAS['prompt']),
 }
 
-# Questions organized by rounds
-# code_template = incomplete code for trainees to complete
-# solution_code = correct solution (shown if wrong)
-# expected_output = what the output should be
-QUESTIONS = {
-    1: {
-        'title': 'Variables & Basic Math',
-        'theme': 'Calculate Portfolio Returns',
-        'questions': [
-            {
-                'id': '1.1',
-                'question': 'KIA invested $500 million in a fund that returned 12%. Calculate the profit by multiplying investment by rate, then print it.',
-                'code_template': '''initial_investment = 500000000
-return_rate = 0.12
-
-# Calculate the profit (multiply investment by rate)
-profit = ???
-
-print(f"Profit: ${profit}")''',
-                'solution_code': '''initial_investment = 500000000
-return_rate = 0.12
-
-# Calculate the profit (multiply investment by rate)
-profit = initial_investment * return_rate
-
-print(f"Profit: ${profit}")''',
-                'expected_output': 'Profit: $60000000.0',
-                'points': 100
-            },
-            {
-                'id': '1.2',
-                'question': 'A $100 million investment grows at 8% annually for 5 years with compound interest. Use the formula: Final = Principal × (1 + rate) ^ years',
-                'code_template': '''principal = 100000000
-rate = 0.08
-years = 5
-
-# Apply the compound interest formula
-# Hint: Use ** for exponent (power)
-final_value = ???
-
-print(f"Final Value: ${final_value:.2f}")''',
-                'solution_code': '''principal = 100000000
-rate = 0.08
-years = 5
-
-# Apply the compound interest formula
-final_value = principal * (1 + rate) ** years
-
-print(f"Final Value: ${final_value:.2f}")''',
-                'expected_output': 'Final Value: $146932807.68',
-                'points': 100
-            },
-            {
-                'id': '1.3',
-                'question': 'BONUS: Calculate 15% of 2 million. Hint: 15% = 0.15',
-                'code_template': '''# Calculate 15% of 2 million
-result = ???
-
-print(result)''',
-                'solution_code': '''# Calculate 15% of 2 million
-result = 2000000 * 0.15
-
-print(result)''',
-                'expected_output': '300000.0',
-                'points': 50
-            }
-        ]
-    },
-    2: {
-        'title': 'Data Types & Strings',
-        'theme': 'Format Investment Reports',
-        'questions': [
-            {
-                'id': '2.1',
-                'question': 'Format $750 billion with commas. In f-strings, use :, after the variable to add commas.',
-                'code_template': '''aum = 750000000000
-
-# Format with commas - add the formatting code after the colon
-formatted = f"${aum:???}"
-
-print(formatted)''',
-                'solution_code': '''aum = 750000000000
-
-# Format with commas
-formatted = f"${aum:,}"
-
-print(formatted)''',
-                'expected_output': '$750,000,000,000',
-                'points': 100
-            },
-            {
-                'id': '2.2',
-                'question': 'Convert $1,000,000 USD to KWD (exchange rate: 0.31). Multiply USD by the rate.',
-                'code_template': '''usd_amount = 1000000
-exchange_rate = 0.31
-
-# Convert by multiplying
-kwd_amount = ???
-
-print(f"{kwd_amount:,.2f} KWD")''',
-                'solution_code': '''usd_amount = 1000000
-exchange_rate = 0.31
-
-# Convert by multiplying
-kwd_amount = usd_amount * exchange_rate
-
-print(f"{kwd_amount:,.2f} KWD")''',
-                'expected_output': '310,000.00 KWD',
-                'points': 100
-            },
-            {
-                'id': '2.3',
-                'question': 'BONUS: Print the data type name of the number 3.14. Use type(x).__name__ to get just the name.',
-                'code_template': '''x = 3.14
-
-# Print just the type name (not the full <class ...>)
-print(???)''',
-                'solution_code': '''x = 3.14
-
-# Print just the type name
-print(type(x).__name__)''',
-                'expected_output': 'float',
-                'points': 50
-            }
-        ]
-    },
-    3: {
-        'title': 'Lists',
-        'theme': 'Manage Stock Portfolios',
-        'questions': [
-            {
-                'id': '3.1',
-                'question': 'Get the last stock from the list. Use negative indexing: list[-1] gets the last item.',
-                'code_template': '''stocks = ["Apple", "Microsoft", "Google", "Amazon", "NVIDIA"]
-
-# Get the last item using negative index
-last_stock = stocks[???]
-
-print(last_stock)''',
-                'solution_code': '''stocks = ["Apple", "Microsoft", "Google", "Amazon", "NVIDIA"]
-
-# Get the last item using negative index
-last_stock = stocks[-1]
-
-print(last_stock)''',
-                'expected_output': 'NVIDIA',
-                'points': 100
-            },
-            {
-                'id': '3.2',
-                'question': 'Calculate the total of all investments. Use the sum() function on the list.',
-                'code_template': '''investments = [250, 180, 320, 150, 275]
-
-# Calculate the total - what function adds all items?
-total = ???
-
-print(f"Total: ${total} million")''',
-                'solution_code': '''investments = [250, 180, 320, 150, 275]
-
-# Calculate the total using sum()
-total = sum(investments)
-
-print(f"Total: ${total} million")''',
-                'expected_output': 'Total: $1175 million',
-                'points': 100
-            },
-            {
-                'id': '3.3',
-                'question': 'BONUS: Print how many items are in the list. Use len() to get the length.',
-                'code_template': '''numbers = [10, 20, 30, 40]
-
-# Print the length of the list
-print(???)''',
-                'solution_code': '''numbers = [10, 20, 30, 40]
-
-# Print the length of the list
-print(len(numbers))''',
-                'expected_output': '4',
-                'points': 50
-            }
-        ]
-    },
-    4: {
-        'title': 'Conditionals',
-        'theme': 'Make Buy/Sell Decisions',
-        'questions': [
-            {
-                'id': '4.1',
-                'question': 'Complete the trading signal logic: "STRONG BUY" if return > 15%, "BUY" if > 5%, "HOLD" if > -5%, else "SELL".',
-                'code_template': '''return_rate = 8.5
-
-if return_rate > 15:
-    signal = "STRONG BUY"
-elif ???:
-    signal = "BUY"
-elif ???:
-    signal = "HOLD"
-else:
-    signal = "SELL"
-
-print(f"Signal: {signal}")''',
-                'solution_code': '''return_rate = 8.5
-
-if return_rate > 15:
-    signal = "STRONG BUY"
-elif return_rate > 5:
-    signal = "BUY"
-elif return_rate > -5:
-    signal = "HOLD"
-else:
-    signal = "SELL"
-
-print(f"Signal: {signal}")''',
-                'expected_output': 'Signal: BUY',
-                'points': 100
-            },
-            {
-                'id': '4.2',
-                'question': 'Determine risk: "MEDIUM-HIGH RISK" if volatility > 15 AND sector is "Tech". Use the "and" keyword.',
-                'code_template': '''volatility = 22
-sector = "Tech"
-
-if volatility > 30:
-    risk = "HIGH RISK"
-elif volatility > 15 ??? sector == "Tech":
-    risk = "MEDIUM-HIGH RISK"
-elif volatility > 15:
-    risk = "MEDIUM RISK"
-else:
-    risk = "LOW RISK"
-
-print(risk)''',
-                'solution_code': '''volatility = 22
-sector = "Tech"
-
-if volatility > 30:
-    risk = "HIGH RISK"
-elif volatility > 15 and sector == "Tech":
-    risk = "MEDIUM-HIGH RISK"
-elif volatility > 15:
-    risk = "MEDIUM RISK"
-else:
-    risk = "LOW RISK"
-
-print(risk)''',
-                'expected_output': 'MEDIUM-HIGH RISK',
-                'points': 100
-            },
-            {
-                'id': '4.3',
-                'question': 'BONUS: Approve if return > 0 AND risk is "LOW". Print "APPROVED" or "REJECTED".',
-                'code_template': '''return_rate = 7
-risk_level = "LOW"
-
-# Check BOTH conditions using "and"
-if ??? and ???:
-    decision = "APPROVED"
-else:
-    decision = "REJECTED"
-
-print(decision)''',
-                'solution_code': '''return_rate = 7
-risk_level = "LOW"
-
-if return_rate > 0 and risk_level == "LOW":
-    decision = "APPROVED"
-else:
-    decision = "REJECTED"
-
-print(decision)''',
-                'expected_output': 'APPROVED',
-                'points': 50
-            }
-        ]
-    },
-    5: {
-        'title': 'Loops & Functions',
-        'theme': 'Analyze Multiple Assets',
-        'questions': [
-            {
-                'id': '5.1',
-                'question': 'Loop through stocks and print each one. Use: for item in list:',
-                'code_template': '''stocks = ["Apple", "Google", "Amazon"]
-
-# Complete the for loop
-??? stock ??? stocks:
-    print(stock)''',
-                'solution_code': '''stocks = ["Apple", "Google", "Amazon"]
-
-for stock in stocks:
-    print(stock)''',
-                'expected_output': 'Apple\nGoogle\nAmazon',
-                'points': 100
-            },
-            {
-                'id': '5.2',
-                'question': 'Complete the function to calculate profit (principal × rate) and return the result.',
-                'code_template': '''def calculate_profit(principal, rate):
-    profit = ???
-    return profit
-
-# Test the function
-result = calculate_profit(1000, 0.10)
-print(f"Profit: ${result}")''',
-                'solution_code': '''def calculate_profit(principal, rate):
-    profit = principal * rate
-    return profit
-
-# Test the function
-result = calculate_profit(1000, 0.10)
-print(f"Profit: ${result}")''',
-                'expected_output': 'Profit: $100.0',
-                'points': 100
-            },
-            {
-                'id': '5.3',
-                'question': 'BOSS CHALLENGE: Loop through portfolio, calculate each profit, and add to total_profit.',
-                'code_template': '''portfolio = [
-    ("Oil Fund", 2000, 12.5),
-    ("Tech Fund", 1500, 18.3),
-    ("Real Estate", 800, 4.2),
-    ("Bonds", 1200, -2.1)
-]
 
-total_profit = 0
-for name, investment, rate in portfolio:
-    # Calculate profit for this asset
-    profit = ???
-    # Add to total
-    total_profit = ???
-
-print(f"Total Profit: ${total_profit:.1f} million")''',
-                'solution_code': '''portfolio = [
-    ("Oil Fund", 2000, 12.5),
-    ("Tech Fund", 1500, 18.3),
-    ("Real Estate", 800, 4.2),
-    ("Bonds", 1200, -2.1)
-]
+def bank(game):
+    """The game's current CompiledBank; read it once per request so a reload can't split it"""
+    return question_banks[game].current
 
-total_profit = 0
-for name, investment, rate in portfolio:
-    profit = investment * (rate / 100)
-    total_profit = total_profit + profit
 
-print(f"Total Profit: ${total_profit:.1f} million")''',
-                'expected_output': 'Total Profit: $532.9 million',
-                'points': 150
-            }
-        ]
-    }
-}
+@lru_cache(maxsize=32)
+def render_qr_code(url, fmt='png'):
+    """Render a QR code for url as PNG or SVG bytes (cached per URL, so a changed URL re-renders)"""
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(url)
+    qr.make(fit=True)
 
-# AI Prompt Challenge - Questions for prompt-based code generation
-PROMPT_CHALLENGES = {
-    1: {
-        'title': 'Variables & Calculations',
-        'theme': 'Portfolio Returns',
-        'time_limit': 180,  # 3 minutes
-        'challenges': [
-            {
-                'id': 'P1.1',
-                'title': 'Investment Return Calculator',
-                'scenario': '''KIA invested $1,000,000 in a fund with an 8.5% annual return for 3 years (compound interest).
-
-Calculate and display:
-- Final value after 3 years
-- Total profit made''',
-                'given_data': '''initial_investment = 1000000
-annual_rate = 0.085
-years = 3''',
-                'expected_output': '''Final Value: $1,277,289.13
-Total Profit: $277,289.13''',
-                'hints': [
-                    'Use compound interest formula: final = principal * (1 + rate) ** years',
-                    'Format output with 2 decimal places using :.2f',
-                    'Calculate profit as final_value - initial_investment'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P1.2',
-                'title': 'Currency Converter',
-                'scenario': '''Convert $5,000,000 USD to Kuwaiti Dinar (KWD).
-
-Exchange rate: 1 USD = 0.31 KWD
-
-Display both amounts with proper currency formatting.''',
-                'given_data': '''amount_usd = 5000000
-exchange_rate = 0.31''',
-                'expected_output': '''USD: $5,000,000.00
-KWD: KD 1,550,000.00''',
-                'hints': [
-                    'Multiply USD amount by exchange rate',
-                    'Use :,.2f format for thousands separator and 2 decimals'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P1.3',
-                'title': 'Multi-Currency Portfolio',
-                'scenario': '''Calculate total portfolio value in KWD.
-
-Portfolio holdings and exchange rates to KWD are provided.
-Display each currency's KWD value and the total.''',
-                'given_data': '''portfolio = {"USD": 10000000, "EUR": 5000000, "GBP": 3000000}
-rates_to_kwd = {"USD": 0.31, "EUR": 0.34, "GBP": 0.39}''',
-                'expected_output': '''Portfolio Value in KWD:
-USD: KD 3,100,000.00
-EUR: KD 1,700,000.00
-GBP: KD 1,170,000.00
-Total: KD 5,970,000.00''',
-                'hints': [
-                    'Loop through the portfolio dictionary',
-                    'Look up corresponding exchange rate for each currency',
-                    'Keep a running total'
-                ],
-                'points': 150,
-                'is_bonus': True
-            }
-        ]
-    },
-    2: {
-        'title': 'Data Processing',
-        'theme': 'Asset Data Handling',
-        'time_limit': 180,
-        'challenges': [
-            {
-                'id': 'P2.1',
-                'title': 'Stock Data Parser',
-                'scenario': '''Parse stock data string and format for reporting.
-
-The data contains stock symbols and prices separated by colons and commas.
-Display each stock's price and calculate the average.''',
-                'given_data': '''data = "AAPL:178.50,MSFT:378.25,GOOGL:141.80,AMZN:178.35"''',
-                'expected_output': '''AAPL: $178.50
-MSFT: $378.25
-GOOGL: $141.80
-AMZN: $178.35
-Average Price: $219.23''',
-                'hints': [
-                    'Split by comma first, then by colon',
-                    'Convert price strings to floats',
-                    'Calculate average = sum / count'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P2.2',
-                'title': 'Portfolio Weight Calculator',
-                'scenario': '''Calculate the weight (percentage) of each investment in the portfolio.
-
-Total portfolio value and individual investments are provided.''',
-                'given_data': '''investments = {"Stocks": 450000000, "Bonds": 200000000, "Real Estate": 150000000, "Cash": 50000000}
-total = 850000000''',
-                'expected_output': '''Portfolio Weights:
-Stocks: 52.94%
-Bonds: 23.53%
-Real Estate: 17.65%
-Cash: 5.88%''',
-                'hints': [
-                    'Weight = (investment / total) * 100',
-                    'Format percentage with 2 decimal places'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P2.3',
-                'title': 'Investment Report Generator',
-                'scenario': '''Generate a formatted quarterly investment report.
-
-Include fund name, current value, quarterly return, and status.''',
-                'given_data': '''fund_name = "KIA Global Equity Fund"
-current_value = 2500000000
-quarterly_return = 4.7
-benchmark_return = 3.2''',
-                'expected_output': '''=== Quarterly Report ===
-Fund: KIA Global Equity Fund
-Value: $2,500,000,000.00
-Return: 4.70%
-Benchmark: 3.20%
-Status: OUTPERFORMING (+1.50%)''',
-                'hints': [
-                    'Calculate performance vs benchmark',
-                    'Use string formatting for alignment',
-                    'Compare returns to determine status'
-                ],
-                'points': 150,
-                'is_bonus': True
-            }
-        ]
-    },
-    3: {
-        'title': 'Lists & Filtering',
-        'theme': 'Portfolio Analysis',
-        'time_limit': 180,
-        'challenges': [
-            {
-                'id': 'P3.1',
-                'title': 'Stock Performance Sorter',
-                'scenario': '''Sort stocks by their annual return (highest to lowest).
-
-Display the sorted list with rankings.''',
-                'given_data': '''stocks = [
-    {"symbol": "AAPL", "return": 12.5},
-    {"symbol": "TSLA", "return": 45.8},
-    {"symbol": "MSFT", "return": 15.2},
-    {"symbol": "META", "return": -3.1},
-    {"symbol": "NVDA", "return": 85.3}
-]''',
-                'expected_output': '''Stock Rankings by Return:
-1. NVDA: 85.30%
-2. TSLA: 45.80%
-3. MSFT: 15.20%
-4. AAPL: 12.50%
-5. META: -3.10%''',
-                'hints': [
-                    'Use sorted() with key parameter',
-                    'Sort in descending order with reverse=True',
-                    'Use enumerate for ranking numbers'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P3.2',
-                'title': 'Underperforming Asset Filter',
-                'scenario': '''Identify all underperforming assets (negative returns).
-
-List them with their losses.''',
-                'given_data': '''assets = [
-    {"name": "Tech Fund", "return": 12.5},
-    {"name": "Energy Fund", "return": -8.3},
-    {"name": "Healthcare Fund", "return": 5.2},
-    {"name": "Retail Fund", "return": -12.1},
-    {"name": "Finance Fund", "return": 3.8}
-]''',
-                'expected_output': '''Underperforming Assets:
-Energy Fund: -8.30%
-Retail Fund: -12.10%
-Total Underperformers: 2''',
-                'hints': [
-                    'Filter for assets where return < 0',
-                    'Count the filtered results'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P3.3',
-                'title': 'Top N Stocks Selector',
-                'scenario': '''Select the top 3 stocks by market value.
-
-Display their details and combined value.''',
-                'given_data': '''stocks = [
-    {"symbol": "AAPL", "value": 2800000000000},
-    {"symbol": "MSFT", "value": 2700000000000},
-    {"symbol": "GOOGL", "value": 1800000000000},
-    {"symbol": "AMZN", "value": 1700000000000},
-    {"symbol": "NVDA", "value": 1200000000000}
-]
-n = 3''',
-                'expected_output': '''Top 3 Stocks by Market Value:
-1. AAPL: $2.80T
-2. MSFT: $2.70T
-3. GOOGL: $1.80T
-Combined Value: $7.30T''',
-                'hints': [
-                    'Sort by value descending',
-                    'Slice to get top n items',
-                    'Format large numbers as trillions (divide by 1e12)'
-                ],
-                'points': 150,
-                'is_bonus': True
-            }
-        ]
-    },
-    4: {
-        'title': 'Logic & Decisions',
-        'theme': 'Trading Strategies',
-        'time_limit': 240,  # 4 minutes for more complex logic
-        'challenges': [
-            {
-                'id': 'P4.1',
-                'title': 'Trading Signal Generator',
-                'scenario': '''Generate a trading recommendation based on price movement.
-
-Rules:
-- STRONG BUY if current > purchase * 1.20 (20% gain)
-- BUY if current > purchase * 1.05
-- HOLD if current > purchase * 0.95
-- SELL if current <= purchase * 0.95''',
-                'given_data': '''current_price = 156.00
-purchase_price = 120.00
-target_gain = 0.20
-stop_loss = 0.05''',
-                'expected_output': '''Current Position: +30.00%
-Recommendation: STRONG BUY
-Reason: Exceeded 20% target gain''',
-                'hints': [
-                    'Calculate percentage change: (current - purchase) / purchase * 100',
-                    'Use if/elif/else for decision logic',
-                    'Include the reason in output'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P4.2',
-                'title': 'Risk Assessment System',
-                'scenario': '''Assess investment risk based on multiple factors.
-
-Risk Levels:
-- HIGH: volatility > 30 OR (sector is "Crypto" AND volatility > 15)
-- MEDIUM-HIGH: volatility > 20 AND sector is "Tech"
-- MEDIUM: volatility > 15
-- LOW: volatility <= 15''',
-                'given_data': '''volatility = 25
-sector = "Tech"
-market_cap = "Large"''',
-                'expected_output': '''Risk Assessment:
-Volatility: 25%
-Sector: Tech
-Risk Level: MEDIUM-HIGH
-Recommendation: Suitable for moderate risk tolerance''',
-                'hints': [
-                    'Use compound conditions with and/or',
-                    'Order conditions from most specific to least',
-                    'Add contextual recommendation'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P4.3',
-                'title': 'Investment Approval System',
-                'scenario': '''Multi-criteria investment approval logic.
-
-Approval requires ALL of:
-- Expected return > 5%
-- Risk level is "LOW" or "MEDIUM"
-- Investment amount <= available_budget
-
-Provide detailed approval status.''',
-                'given_data': '''expected_return = 8.5
-risk_level = "MEDIUM"
-investment_amount = 5000000
-available_budget = 10000000''',
-                'expected_output': '''Investment Proposal Review:
-Expected Return: 8.50% [PASS]
-Risk Level: MEDIUM [PASS]
-Budget Check: $5M of $10M [PASS]
-Status: APPROVED
-Remaining Budget: $5,000,000.00''',
-                'hints': [
-                    'Check each criterion separately',
-                    'Track pass/fail for each',
-                    'All must pass for approval'
-                ],
-                'points': 150,
-                'is_bonus': True
-            }
-        ]
-    },
-    5: {
-        'title': 'Advanced Analysis',
-        'theme': 'Automated Trading',
-        'time_limit': 300,  # 5 minutes for boss challenge
-        'challenges': [
-            {
-                'id': 'P5.1',
-                'title': 'Portfolio Summary Function',
-                'scenario': '''Create a function to summarize any portfolio.
-
-The function should calculate total value, best performer, and average return.''',
-                'given_data': '''portfolio = [
-    {"name": "Tech Fund", "value": 500000, "return": 15.3},
-    {"name": "Bond Fund", "value": 300000, "return": 4.2},
-    {"name": "Real Estate", "value": 200000, "return": 8.7}
-]''',
-                'expected_output': '''Portfolio Summary:
-Total Value: $1,000,000.00
-Best Performer: Tech Fund (15.30%)
-Average Return: 9.40%''',
-                'hints': [
-                    'Define a function that takes portfolio as parameter',
-                    'Use max() with key to find best performer',
-                    'Calculate average return from all funds'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P5.2',
-                'title': 'Batch Trade Processor',
-                'scenario': '''Process multiple trades and generate a summary.
-
-For each trade, calculate the total cost (shares * price) and running total.''',
-                'given_data': '''trades = [
-    {"symbol": "AAPL", "shares": 100, "price": 178.50, "action": "BUY"},
-    {"symbol": "MSFT", "shares": 50, "price": 378.25, "action": "BUY"},
-    {"symbol": "GOOGL", "shares": 30, "price": 141.80, "action": "SELL"}
-]''',
-                'expected_output': '''Trade Execution Report:
-BUY 100 AAPL @ $178.50 = $17,850.00
-BUY 50 MSFT @ $378.25 = $18,912.50
-SELL 30 GOOGL @ $141.80 = $4,254.00
-Net Cash Flow: -$32,508.50''',
-                'hints': [
-                    'Loop through each trade',
-                    'Calculate cost for each trade',
-                    'BUY is negative cash flow, SELL is positive'
-                ],
-                'points': 100
-            },
-            {
-                'id': 'P5.3',
-                'title': 'Complete Portfolio Analyzer',
-                'scenario': '''BOSS CHALLENGE: Build a comprehensive portfolio analysis system.
-
-Analyze the portfolio to provide:
-1. Total portfolio value
-2. Gain/Loss for each position
-3. Best and worst performers
-4. Overall portfolio return percentage
-5. Risk classification based on sector diversity''',
-                'given_data': '''portfolio = [
-    {"symbol": "AAPL", "shares": 100, "purchase": 150, "current": 178, "sector": "Tech"},
-    {"symbol": "MSFT", "shares": 50, "purchase": 350, "current": 378, "sector": "Tech"},
-    {"symbol": "XOM", "shares": 200, "purchase": 95, "current": 105, "sector": "Energy"},
-    {"symbol": "JNJ", "shares": 75, "purchase": 160, "current": 155, "sector": "Healthcare"}
-]''',
-                'expected_output': '''=== PORTFOLIO ANALYSIS ===
-
-Holdings Summary:
-AAPL: 100 shares @ $178.00 = $17,800.00 (+18.67%)
-MSFT: 50 shares @ $378.00 = $18,900.00 (+8.00%)
-XOM: 200 shares @ $105.00 = $21,000.00 (+10.53%)
-JNJ: 75 shares @ $155.00 = $11,625.00 (-3.13%)
-
-Portfolio Metrics:
-Total Value: $69,325.00
-Total Cost: $64,250.00
-Overall Return: +7.90%
-
-Performance:
-Best: AAPL (+18.67%)
-Worst: JNJ (-3.13%)
-
-Risk Assessment:
-Sectors: 3 (Tech, Energy, Healthcare)
-Diversification: MODERATE''',
-                'hints': [
-                    'Calculate position value and return for each holding',
-                    'Track total value and total cost',
-                    'Find max and min returns',
-                    'Count unique sectors for diversification'
-                ],
-                'points': 200,
-                'is_boss': True
-            }
-        ]
-    }
-}
+    if fmt == 'svg':
+        return qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).to_string()
 
-# Prompt game state (separate from regular game)
-prompt_game_state = {
-    'teams': {},  # team_id: {name, score, current_challenge, attempts, joined_at}
-    'current_round': 0,
-    'round_start_time': None,
-    'game_started': False,
-    'game_paused': False,
-    'game_mode': 'speed',  # 'speed', 'efficiency', 'debug'
-    'trainer_connected': False
-}
+    img = qr.make_image(fill_color="black", back_color="white")
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
 
 
+@lru_cache(maxsize=32)
 def generate_qr_code(url):
     """Generate QR code as base64 image"""
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(url)
-    qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
+    return base64.b64encode(render_qr_code(url)).decode()
 
-    buffer = io.BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
 
-    return base64.b64encode(buffer.getvalue()).decode()
+def get_join_url(path):
+    """Public URL for path: the Render external URL in production, else this machine's LAN IP"""
+    if os.environ.get('RENDER'):
+        render_url = os.environ.get('RENDER_EXTERNAL_URL', request.host_url.rstrip('/'))
+        return f"{render_url}{path}"
+    # Use local network IP so other devices can connect
+    local_ip = get_local_ip()
+    port = request.host.split(':')[-1] if ':' in request.host else '8080'
+    return f"http://{local_ip}:{port}{path}"
+
+
+def qr_image_src(game):
+    """<img src> for a game's join QR code: an ETag-cached endpoint or an inline data URI"""
+    if QR_ENDPOINT:
+        return url_for('qr_image', game=game, fmt='svg')
+    return f"data:image/png;base64,{generate_qr_code(get_join_url(QR_JOIN_PATHS[game]))}"
 
 
 def generate_team_id():
@@ -847,59 +272,153 @@ def generate_team_id():
     return secrets.token_hex(4).upper()
 
 
-def normalize_output(output):
-    """Normalize output for comparison (strip whitespace, normalize newlines)"""
-    if output is None:
-        return ""
-    # Strip whitespace, normalize line endings to spaces, lowercase
-    text = str(output).strip()
-    text = text.replace('\r\n', '\n').replace('\r', '\n')
-    text = re.sub(r'\s+', ' ', text)
-    return text.lower()
+@lru_cache(maxsize=256)
+def compile_output_matcher(expected_output):
+    """Matcher for an expected output that isn't part of the question bank"""
+    return OutputMatcher(expected_output)
 
 
 def check_output_match(user_output, expected_output):
     """Check if user output matches expected output (flexible matching)"""
-    if not user_output or not expected_output:
-        return False
+    return compile_output_matcher(expected_output or '').matches(user_output)
 
-    user_norm = normalize_output(user_output)
-    expected_norm = normalize_output(expected_output)
 
-    # Exact match after normalization
-    if user_norm == expected_norm:
-        return True
+def find_question_record(question_id):
+    """Look a question or prompt challenge up by ID in either index"""
+    return bank(PYTHON_GAME).index.get(question_id) or bank(PROMPT_GAME).index.get(question_id)
 
-    # Check if expected output is contained in user output (or vice versa)
-    if expected_norm in user_norm or user_norm in expected_norm:
-        return True
 
-    # For multi-line outputs, check if all expected lines are present
-    expected_lines = [line.strip().lower() for line in expected_output.strip().split('\n') if line.strip()]
-    user_lines = [line.strip().lower() for line in user_output.strip().split('\n') if line.strip()]
+def grade_batch(question_id, outputs):
+    """Grade many outputs for one question in a single call (e.g. re-grading after a fix)"""
+    record = find_question_record(question_id)
+    if record is None:
+        raise KeyError(question_id)
+    return record.matcher.grade_batch(outputs)
 
-    if expected_lines and user_lines:
-        # Check if all expected lines match user lines
-        if expected_lines == user_lines:
-            return True
-        # Check if expected content is in user output
-        if all(exp_line in user_norm for exp_line in expected_lines):
-            return True
 
-    # Check if outputs contain the same key numbers
-    user_numbers = re.findall(r'[\d,]+\.?\d*', user_output or '')
-    expected_numbers = re.findall(r'[\d,]+\.?\d*', expected_output or '')
+def versioned(game, payload):
+    """Stamp a broadcast state delta with the game's next version and the server clock"""
+    payload['v'] = store.bump_version(game)
+    payload['server_time'] = int(time.time() * 1000)
+    return payload
+
+
+def push_team_delta(game, team_id, room, event, payload):
+    """Push a team's own score/answer changes to its room, stamped with the team's version"""
+    payload['tv'] = store.bump_team_version(game, team_id)
+    socketio.emit(event, payload, room=room)
+
+
+# Round clocks run server-side: events for each game are prefixed like its other broadcasts
+ROUND_EVENT_PREFIX = {PYTHON_GAME: '', PROMPT_GAME: 'prompt_'}
+
+
+def announce_round_warning(game, timer, seconds_left):
+    socketio.emit(f'{ROUND_EVENT_PREFIX[game]}round_warning', {
+        'round': timer['round'],
+        'seconds_left': seconds_left,
+        'timer': timer_anchor(timer)
+    })
+
+
+def announce_round_end(game, timer):
+    socketio.emit(f'{ROUND_EVENT_PREFIX[game]}round_ended', versioned(game, {
+        'round': timer['round'],
+        'timer': timer_anchor(timer)
+    }))
+
+
+round_timer = RoundTimer(store, socketio, (PYTHON_GAME, PROMPT_GAME),
+                         on_warning=announce_round_warning, on_end=announce_round_end)
 
-    if user_numbers and expected_numbers:
-        try:
-            user_val = float(user_numbers[-1].replace(',', '').rstrip('.'))
-            expected_val = float(expected_numbers[-1].replace(',', '').rstrip('.'))
-            if abs(user_val - expected_val) < 1:
-                return True
-        except:
-            pass
 
-    return False
+# VERIFY_CONTENT=1 runs every solution and reference answer against its expected output
+# (verify_bank.py) in the background at startup and after each reload, and logs what fails.
+# Runs take turns. With server grading on they share its pool but use at most VERIFY_WORKERS
+# of its workers, so teams' submissions keep the rest; otherwise they start a pool that size.
+VERIFY_CONTENT = os.environ.get('VERIFY_CONTENT', '').lower() in ('1', 'true', 'yes')
+VERIFY_WORKERS = int(os.environ.get('VERIFY_WORKERS', 2))
+content_reports = {}   # game -> latest verify_bank.Report
+verification_lock = threading.Lock()
+
+
+def verify_content(games, locked=False):
+    """Verify the games' banks once no other run is going; `locked`: the caller took the lock"""
+    if not locked:
+        verification_lock.acquire()
+    try:
+        pool = grading_pool or SandboxPool(workers=VERIFY_WORKERS, user=GRADING_USER).start()
+        try:
+            for game in games:
+                report = verify_bank.verify(bank(game), pool, game, workers=VERIFY_WORKERS)
+                content_reports[game] = report
+                verify_bank.log_report(report)
+        finally:
+            if pool is not grading_pool:
+                pool.shutdown()
+    finally:
+        verification_lock.release()
+
+
+def announce_content_update(game, compiled):
+    # Open pages switch to the new versioned round URLs for rounds they haven't shown yet
+    socketio.emit(f'{ROUND_EVENT_PREFIX[game]}content_updated', {'version': compiled.version})
+    if VERIFY_CONTENT:
+        socketio.start_background_task(verify_content, (game,))
+
+
+if CONTENT_RELOAD_INTERVAL > 0:
+    watch_question_banks(question_banks, socketio, announce_content_update, CONTENT_RELOAD_INTERVAL)
+if VERIFY_CONTENT:
+    socketio.start_background_task(verify_content, tuple(question_banks))
+
+
+def clock_fields(game, default_limit):
+    """Round clock fields for a game state response: the countdown anchor and whole seconds left"""
+    timer = round_timer.get(game)
+    if timer is None:
+        return {'timer': None, 'time_remaining': default_limit}
+    clock = timer_anchor(timer)
+    return {'timer': clock, 'time_remaining': math.ceil(clock['remaining'])}
+
+
+def get_page_args():
+    """Read optional ?limit=&offset= leaderboard paging parameters"""
+    limit = request.args.get('limit', type=int)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    if limit is not None:
+        limit = max(0, limit)
+    return limit, offset
+
+
+def wants_answers():
+    """False for ?answers=0, which scoreboards use to poll names and scores only"""
+    return request.args.get('answers', 1, type=int) != 0
+
+
+def grade_submission_output(code, reported_output):
+    """Return the output to grade: sandboxed stdout when server grading is on, else the client's
+
+    With server grading on, the reported output is never trusted: no code means no output.
+    """
+    if grading_pool is None:
+        return reported_output
+    if not code:
+        return ''
+    result = grading_pool.run(code)
+    if result['error']:
+        return f"{result['stdout']}{result['error']}"
+    return result['stdout']
+
+
+def already_solved_response(game, team_id, error):
+    """Reply to a submission for a question the team has already solved: no points, nothing recorded"""
+    return jsonify({
+        'error': error,
+        'correct': True,
+        'points_earned': 0,
+        'total_score': store.get_team(game, team_id)['score']
+    })
 
 
 @app.route('/')
@@ -911,51 +430,158 @@ def index():
 @app.route('/trainer')
 def trainer_dashboard():
     """Trainer dashboard to control the game and view all scores"""
-    # Check if running on Render (production) or locally
-    if os.environ.get('RENDER'):
-        # Use the Render external URL
-        render_url = os.environ.get('RENDER_EXTERNAL_URL', request.host_url.rstrip('/'))
-        join_url = f"{render_url}/join"
-    else:
-        # Use local network IP so other devices can connect
-        local_ip = get_local_ip()
-        port = request.host.split(':')[-1] if ':' in request.host else '8080'
-        join_url = f"http://{local_ip}:{port}/join"
-    qr_code = generate_qr_code(join_url)
+    join_url = get_join_url(QR_JOIN_PATHS['python'])
 
     return render_template('trainer.html',
-                         qr_code=qr_code,
+                         qr_code=qr_image_src('python'),
                          join_url=join_url,
-                         teams=game_state['teams'],
-                         current_round=game_state['current_round'],
-                         total_rounds=len(QUESTIONS))
+                         current_round=store.get_state(PYTHON_GAME)['current_round'],
+                         total_rounds=len(bank(PYTHON_GAME).rounds))
 
 
 @app.route('/unified-trainer')
 def unified_trainer_dashboard():
     """Unified trainer dashboard for both Python Challenge and AI Prompt Challenge"""
-    if os.environ.get('RENDER'):
-        render_url = os.environ.get('RENDER_EXTERNAL_URL', request.host_url.rstrip('/'))
-        python_join_url = f"{render_url}/join"
-        prompt_join_url = f"{render_url}/prompt-join"
-    else:
-        local_ip = get_local_ip()
-        port = request.host.split(':')[-1] if ':' in request.host else '8080'
-        python_join_url = f"http://{local_ip}:{port}/join"
-        prompt_join_url = f"http://{local_ip}:{port}/prompt-join"
-
-    python_qr = generate_qr_code(python_join_url)
-    prompt_qr = generate_qr_code(prompt_join_url)
+    python_join_url = get_join_url(QR_JOIN_PATHS['python'])
+    prompt_join_url = get_join_url(QR_JOIN_PATHS['prompt'])
+    python_qr = qr_image_src('python')
+    prompt_qr = qr_image_src('prompt')
 
     return render_template('unified_trainer.html',
                           python_qr=python_qr,
                           python_join_url=python_join_url,
-                          python_current_round=game_state['current_round'],
-                          python_total_rounds=len(QUESTIONS),
+                          python_current_round=store.get_state(PYTHON_GAME)['current_round'],
+                          python_total_rounds=len(bank(PYTHON_GAME).rounds),
                           prompt_qr=prompt_qr,
                           prompt_join_url=prompt_join_url,
-                          prompt_current_round=prompt_game_state['current_round'],
-                          prompt_total_rounds=len(PROMPT_CHALLENGES))
+                          prompt_current_round=store.get_state(PROMPT_GAME)['current_round'],
+                          prompt_total_rounds=len(bank(PROMPT_GAME).rounds))
+
+
+@app.route('/qr/<game>.<fmt>')
+def qr_image(game, fmt):
+    """Join QR code as a cacheable image; the ETag changes whenever the join URL does"""
+    if game not in QR_JOIN_PATHS or fmt not in ('png', 'svg'):
+        return jsonify({'error': 'Not found'}), 404
+
+    join_url = get_join_url(QR_JOIN_PATHS[game])
+    response = app.response_class(
+        render_qr_code(join_url, fmt),
+        mimetype='image/svg+xml' if fmt == 'svg' else 'image/png'
+    )
+    response.set_etag(hashlib.sha1(f"{fmt}:{join_url}".encode()).hexdigest())
+    response.cache_control.public = True
+    response.cache_control.max_age = LOCAL_IP_TTL
+    return response.make_conditional(request)
+
+
+@app.route('/api/content/<game>/<int:round_num>')
+def round_content(game, round_num):
+    """One round's questions without their answers; URLs carrying the current ?v= are cached for good"""
+    if game not in question_banks:
+        return jsonify({'error': 'Round not found'}), 404
+    compiled = bank(game)
+    content = compiled.content.get(round_num)
+    if content is None:
+        return jsonify({'error': 'Round not found'}), 404
+
+    # Precompressed, so each encoding keeps its own strong ETag
+    encoding = negotiate(request.accept_encodings, offered=content.variants)
+    response = app.response_class(content.variants[encoding], mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f'{content.etag}-{encoding}' if encoding else content.etag)
+    response.cache_control.public = True
+    if request.args.get('v') == compiled.version:
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route('/api/solution/<question_id>')
+def question_solution(question_id):
+    """Expected output and solution of a Python-game question, once this team has attempted it"""
+    team_id = session.get('team_id')
+    team = store.get_team(PYTHON_GAME, team_id) if team_id else None
+    if team is None:
+        return jsonify({'error': 'Not registered'}), 401
+
+    record = bank(PYTHON_GAME).index.get(question_id)
+    if record is None:
+        return jsonify({'error': 'Question not found'}), 404
+    if question_id not in team['answers']:
+        return jsonify({'error': 'Attempt the question first'}), 403
+
+    response = jsonify({
+        'question_id': question_id,
+        'expected_output': record.expected_output,
+        'solution_code': record.data.get('solution_code', '')
+    })
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
+
+
+@app.route('/assets/<digest>/<path:filename>')
+def static_bundle(digest, filename):
+    """Page CSS/JS by content hash, precompressed; the current digest's URL is cached for good"""
+    bundle = static_bundles.get(filename)
+    if bundle is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    encoding = negotiate(request.accept_encodings, offered=bundle.variants)
+    response = app.response_class(bundle.variants[encoding], mimetype=bundle.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f'{bundle.digest}-{encoding}' if encoding else bundle.digest)
+    response.cache_control.public = True
+    if digest == bundle.digest:
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    else:
+        # A page rendered before the file changed: serve the current one, but don't pin it
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route('/vendor/<name>/<version>/<path:filename>')
+def vendor_asset(name, version, filename):
+    """Self-hosted library file, precompressed; the URL changes with the version, so it's cached for good"""
+    found = vendor_assets.resolve(name, version, filename, lambda encoding: request.accept_encodings[encoding])
+    if found is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    path, encoding, mimetype = found
+    response = send_file(path, mimetype=mimetype, conditional=True, max_age=365 * 24 * 3600)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+@app.route('/sw.js')
+def service_worker():
+    """Service worker that precaches the self-hosted libraries when a team opens the join page"""
+    response = app.response_class(
+        render_template('sw.js', assets=vendor_assets.precache_urls(), cache_version=vendor_assets.cache_version()),
+        mimetype='text/javascript'
+    )
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/pyodide_worker.js')
+def pyodide_worker():
+    """Web Worker the game pages run team code in, off the main thread"""
+    response = app.response_class(render_template('pyodide_worker.js'), mimetype='text/javascript')
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/join', methods=['GET', 'POST'])
@@ -965,22 +591,12 @@ def join_game():
         team_name = request.form.get('team_name', '').strip()
         if team_name:
             team_id = generate_team_id()
-            game_state['teams'][team_id] = {
-                'name': team_name,
-                'score': 0,
-                'current_question': 0,
-                'answers': {},
-                'joined_at': datetime.now().isoformat()
-            }
+            store.add_team(PYTHON_GAME, team_id, team_name, datetime.now().isoformat())
             session['team_id'] = team_id
             session['team_name'] = team_name
 
             # Notify trainer dashboard
-            socketio.emit('team_joined', {
-                'team_id': team_id,
-                'team_name': team_name,
-                'score': 0
-            }, room='trainer')
+            trainer_broadcaster.team('trainer', 'trainer_frame', team_id, name=team_name, score=0)
 
             return redirect(url_for('team_game'))
 
@@ -991,88 +607,100 @@ def join_game():
 def team_game():
     """Main game interface for teams"""
     team_id = session.get('team_id')
-    if not team_id or team_id not in game_state['teams']:
+    team = store.get_team(PYTHON_GAME, team_id) if team_id else None
+    if team is None:
         return redirect(url_for('join_game'))
 
-    team = game_state['teams'][team_id]
+    state = store.get_state(PYTHON_GAME)
     return render_template('game.html',
                          team_id=team_id,
                          team_name=team['name'],
                          score=team['score'],
-                         questions=QUESTIONS,
-                         current_round=game_state['current_round'],
-                         game_started=game_state['game_started'])
+                         content_version=bank(PYTHON_GAME).version,
+                         round_numbers=list(bank(PYTHON_GAME).rounds),
+                         current_round=state['current_round'],
+                         game_started=state['game_started'],
+                         run_timeout_ms=int(PYTHON_RUN_TIMEOUT * 1000))
 
 
 @app.route('/api/submit_answer', methods=['POST'])
 def submit_answer():
     """Handle answer submission from teams - now compares code output"""
     team_id = session.get('team_id')
-    if not team_id or team_id not in game_state['teams']:
+    if not store.has_team(PYTHON_GAME, team_id):
         return jsonify({'error': 'Not registered'}), 401
 
+    closed = round_timer.closed(PYTHON_GAME)
+    if closed:
+        return jsonify({'error': closed, 'round_over': True}), 409
+
     data = request.json
     question_id = data.get('question_id')
     user_code = data.get('code', '')
     user_output = data.get('output', '')
 
     # Find the question
-    round_num = int(question_id.split('.')[0])
-    if round_num not in QUESTIONS:
-        return jsonify({'error': 'Invalid question'}), 400
-
-    question = None
-    for q in QUESTIONS[round_num]['questions']:
-        if q['id'] == question_id:
-            question = q
-            break
-
-    if not question:
+    record = bank(PYTHON_GAME).index.get(question_id)
+    if record is None:
         return jsonify({'error': 'Question not found'}), 400
+    question = record.data
 
     # Check if already answered correctly
-    existing_answer = game_state['teams'][team_id]['answers'].get(question_id)
+    existing_answer = store.get_answer(PYTHON_GAME, team_id, question_id)
     if existing_answer and existing_answer.get('correct'):
-        return jsonify({
-            'error': 'Already answered correctly',
-            'correct': True,
-            'points_earned': 0,
-            'total_score': game_state['teams'][team_id]['score']
-        }), 200
+        return already_solved_response(PYTHON_GAME, team_id, 'Already answered correctly')
 
     # Compare output
-    expected_output = question.get('expected_output', '')
-    is_correct = check_output_match(user_output, expected_output)
-
-    points_earned = 0
-    if is_correct:
-        points_earned = question['points']
-        game_state['teams'][team_id]['score'] += points_earned
-
-    # Record answer
-    game_state['teams'][team_id]['answers'][question_id] = {
+    try:
+        user_output = grade_submission_output(user_code, user_output)
+    except SandboxBusy:
+        return jsonify({'error': 'Grader busy, please submit again'}), 503
+
+    expected_output = record.expected_output
+    is_correct = record.matcher.matches(user_output)
+
+    # Another of the team's requests may have solved the question while this one was graded.
+    # Only the request that claims the solve records a correct answer; any other answer is
+    # recorded by record_attempt, which refuses atomically once the question is solved.
+    claimed = is_correct and store.claim_solve(PYTHON_GAME, team_id, question_id)
+    if is_correct and not claimed:
+        return already_solved_response(PYTHON_GAME, team_id, 'Already answered correctly')
+
+    points_earned = record.points if claimed else 0
+    answer = {
         'code': user_code,
         'output': user_output,
         'correct': is_correct,
         'points': points_earned,
         'timestamp': datetime.now().isoformat()
     }
-
-    # Notify trainer
-    team = game_state['teams'][team_id]
-    socketio.emit('score_update', {
-        'team_id': team_id,
-        'team_name': team['name'],
+    if claimed:
+        store.add_score(PYTHON_GAME, team_id, points_earned)
+        store.set_answer(PYTHON_GAME, team_id, question_id, answer)
+    elif store.record_attempt(PYTHON_GAME, team_id, question_id, answer) is None:
+        return already_solved_response(PYTHON_GAME, team_id, 'Already answered correctly')
+
+    # Push the change to the team's own devices, then notify trainer
+    team = store.get_team(PYTHON_GAME, team_id)
+    push_team_delta(PYTHON_GAME, team_id, f'team_{team_id}', 'team_delta', {
         'score': team['score'],
-        'question_id': question_id,
-        'correct': is_correct,
-        'points': points_earned
-    }, room='trainer')
+        'answers': {question_id: {
+            'correct': is_correct,
+            'points': points_earned,
+            'code': user_code,
+            'output': user_output
+        }}
+    })
+    trainer_broadcaster.team('trainer', 'trainer_frame', team_id, name=team['name'], score=team['score'])
+    if is_correct:
+        trainer_broadcaster.solved('trainer', 'trainer_frame', team_id=team_id, team_name=team['name'],
+                                   question_id=question_id, points=points_earned)
 
     return jsonify({
         'correct': is_correct,
         'points_earned': points_earned,
-        'total_score': game_state['teams'][team_id]['score'],
+        'total_score': team['score'],
+        'graded_output': user_output if grading_pool is not None else None,
         'expected_output': expected_output if not is_correct else None,
         'solution_code': question.get('solution_code', '') if not is_correct else None
     })
@@ -1084,25 +712,32 @@ def get_game_state():
     team_id = session.get('team_id')
     team_score = 0
     team_answers = {}
+    team_rank = None
+    team_version = 0
 
-    if team_id and team_id in game_state['teams']:
-        team_score = game_state['teams'][team_id]['score']
-        team_answers = game_state['teams'][team_id]['answers']
+    team = store.get_team(PYTHON_GAME, team_id) if team_id else None
+    if team is not None:
+        team_score = team['score']
+        team_answers = team['answers']
+        team_rank = store.rank(PYTHON_GAME, team_id)
+        team_version = team['version']
 
-    # Calculate remaining time
-    time_remaining = ROUND_TIME_LIMIT
-    if game_state['round_start_time'] and game_state['game_started']:
-        elapsed = (datetime.now() - game_state['round_start_time']).seconds
-        time_remaining = max(0, ROUND_TIME_LIMIT - elapsed)
+    state = store.get_state(PYTHON_GAME)
 
     return jsonify({
-        'current_round': game_state['current_round'],
-        'game_started': game_state['game_started'],
-        'game_paused': game_state['game_paused'],
-        'poll_active': game_state['poll_active'],
+        'version': state['version'],
+        'team_version': team_version,
+        'server_time': int(time.time() * 1000),
+        'current_round': state['current_round'],
+        'game_started': state['game_started'],
+        'game_paused': state['game_paused'],
+        'poll_active': state['poll_active'],
+        'active_poll': state['active_poll'],
         'your_score': team_score,
         'your_answers': team_answers,
-        'time_remaining': time_remaining
+        'your_rank': team_rank,
+        'total_teams': store.team_count(PYTHON_GAME),
+        **clock_fields(PYTHON_GAME, ROUND_TIME_LIMIT)
     })
 
 
@@ -1110,17 +745,18 @@ def get_game_state():
 def start_round():
     """Trainer starts a new round"""
     round_num = request.json.get('round', 1)
-    game_state['current_round'] = round_num
-    game_state['game_started'] = True
-    game_state['game_paused'] = False
-    game_state['round_start_time'] = datetime.now()
+    round_data = bank(PYTHON_GAME).rounds[round_num]
+    time_limit = round_data.get('time_limit', ROUND_TIME_LIMIT)
+    timer = round_timer.start(PYTHON_GAME, round_num, time_limit,
+                              current_round=round_num, game_started=True)
 
-    socketio.emit('round_started', {
+    socketio.emit('round_started', versioned(PYTHON_GAME, {
         'round': round_num,
-        'title': QUESTIONS[round_num]['title'],
-        'theme': QUESTIONS[round_num]['theme'],
-        'time_limit': ROUND_TIME_LIMIT
-    })
+        'title': round_data['title'],
+        'theme': round_data['theme'],
+        'time_limit': time_limit,
+        'timer': timer_anchor(timer)
+    }))
 
     return jsonify({'success': True, 'round': round_num})
 
@@ -1128,138 +764,266 @@ def start_round():
 @app.route('/api/trainer/pause_game', methods=['POST'])
 def pause_game():
     """Trainer pauses the game"""
-    game_state['game_paused'] = not game_state['game_paused']
+    paused = not store.get_state(PYTHON_GAME)['game_paused']
+    timer = round_timer.pause(PYTHON_GAME, paused)
 
-    socketio.emit('game_paused', {
-        'paused': game_state['game_paused']
-    })
+    socketio.emit('game_paused', versioned(PYTHON_GAME, {
+        'paused': paused,
+        'timer': timer_anchor(timer) if timer else None
+    }))
 
-    return jsonify({'success': True, 'paused': game_state['game_paused']})
+    return jsonify({'success': True, 'paused': paused})
 
 
 @app.route('/api/trainer/reset_game', methods=['POST'])
 def reset_game():
     """Trainer resets the entire game"""
-    game_state['teams'] = {}
-    game_state['current_round'] = 0
-    game_state['game_started'] = False
-    game_state['game_paused'] = False
-    game_state['round_start_time'] = None
+    store.reset(PYTHON_GAME)
+    trainer_broadcaster.discard('trainer', 'trainer_frame')
+    round_timer.reset(PYTHON_GAME, current_round=0, game_started=False)
 
-    socketio.emit('game_reset', {})
+    socketio.emit('game_reset', versioned(PYTHON_GAME, {}))
 
     return jsonify({'success': True})
 
 
+@app.route('/api/trainer/content/reload', methods=['POST'])
+def reload_content():
+    """Recompile both question banks from their packs now; a broken pack is reported, not loaded"""
+    result = {}
+    for game, question_bank in question_banks.items():
+        if question_bank.reload(force=True):
+            announce_content_update(game, question_bank.current)
+        result[game] = dict(question_bank.stats(), version=question_bank.current.version,
+                            error=question_bank.last_error)
+    ok = all(entry['error'] is None for entry in result.values())
+    return jsonify({'success': ok, 'banks': result}), 200 if ok else 422
+
+
+@app.route('/api/trainer/content/verify', methods=['GET', 'POST'])
+def verify_content_now():
+    """POST starts verifying both banks in the background (202); both return the latest reports
+
+    Reports list failures and ambiguous matchers; a GET answers 422 if the latest run failed.
+    """
+    if request.method == 'POST' and verification_lock.acquire(blocking=False):
+        socketio.start_background_task(verify_content, tuple(question_banks), locked=True)
+    running = verification_lock.locked()
+    reports = list(content_reports.values())
+    result = {report.game: dict(report.counts(), elapsed_ms=report.elapsed_ms, problems=[
+        {'id': r.id, 'status': r.status, 'rule': r.rule, 'error': r.error,
+         'accepted_wrong': [{'rule': rule, 'output': output} for rule, output in r.accepted_wrong]}
+        for r in report.problems()]) for report in reports}
+    ok = not any(report.failed() for report in reports)
+    status = 202 if request.method == 'POST' else 200 if ok else 422
+    return jsonify({'success': ok, 'running': running, 'banks': result}), status
+
+
 @app.route('/api/trainer/teams')
 def get_teams():
-    """Get all teams and scores for trainer"""
+    """Get teams and scores for trainer, ranked (supports ?limit=&offset= paging and ?answers=0)"""
+    limit, offset = get_page_args()
+    answers = wants_answers()
+    ranking = store.top(PYTHON_GAME, limit, offset)
+    teams = store.get_teams(PYTHON_GAME, [team_id for team_id, _ in ranking])
     teams_list = []
-    for team_id, team_data in game_state['teams'].items():
-        teams_list.append({
-            'id': team_id,
-            'name': team_data['name'],
-            'score': team_data['score'],
-            'answers': team_data['answers']
-        })
+    for team_id, score in ranking:
+        team_data = teams.get(team_id)
+        if team_data is None:
+            continue
+        entry = {'id': team_id, 'name': team_data['name'], 'score': score}
+        if answers:
+            entry['answers'] = team_data['answers']
+        teams_list.append(entry)
+
+    state = store.get_state(PYTHON_GAME)
+    return jsonify({
+        'teams': teams_list,
+        'total_teams': store.team_count(PYTHON_GAME),
+        'current_round': state['current_round'],
+        'game_started': state['game_started']
+    })
 
-    # Sort by score descending
-    teams_list.sort(key=lambda x: x['score'], reverse=True)
+
+@app.route('/api/trainer/grade_batch', methods=['POST'])
+def api_grade_batch():
+    """Grade a list of outputs against one question's expected output"""
+    data = request.json or {}
+    question_id = data.get('question_id')
+    outputs = data.get('outputs', [])
+    if not isinstance(outputs, list):
+        return jsonify({'error': 'outputs must be a list'}), 400
+
+    try:
+        results = grade_batch(question_id, outputs)
+    except KeyError:
+        return jsonify({'error': 'Question not found'}), 404
 
     return jsonify({
-        'teams': teams_list,
-        'current_round': game_state['current_round'],
-        'game_started': game_state['game_started']
+        'question_id': question_id,
+        'results': results,
+        'correct': sum(results)
     })
 
 
 # Poll endpoints
-@app.route('/api/poll/start', methods=['POST'])
-def start_poll():
-    """Trainer starts the poll"""
-    game_state['poll_active'] = True
-    game_state['poll_votes'] = {}
-
-    socketio.emit('poll_started', {
-        'question': POLL_QUESTION,
-        'options': POLL_OPTIONS
-    })
+# Each poll keeps running per-option counters in the store, so a vote is one counter update
+# (minus the team's previous selection) rather than a rescan of every team's votes.
+def poll_results(poll_id, poll, tally):
+    """A poll's definition with its vote counts and the share of voters that picked each option"""
+    voters = tally['voters']
+    return {
+        'poll_id': poll_id,
+        'question': poll['question'],
+        'options': poll['options'],
+        'active': poll['active'],
+        'counts': tally['counts'],
+        'results': {option: round(count / voters * 100) if voters else 0
+                    for option, count in tally['counts'].items()},
+        'total_votes': voters
+    }
 
+
+def load_poll_results(poll_id):
+    poll = store.get_poll(poll_id)
+    if poll is None:
+        return None
+    return poll_results(poll_id, poll, store.tally(poll_id))
+
+
+@app.route('/api/polls', methods=['GET', 'POST'])
+def polls():
+    """List every poll with its results, or (POST) define a new one"""
+    if request.method == 'GET':
+        return jsonify({'polls': [poll_results(poll_id, poll, store.tally(poll_id))
+                                  for poll_id, poll in store.list_polls().items()]})
+
+    data = request.json or {}
+    question = str(data.get('question', '')).strip()
+    options = list(dict.fromkeys(str(option).strip() for option in data.get('options', []) if str(option).strip()))
+    poll_id = str(data.get('poll_id') or secrets.token_hex(4))
+    if not POLL_ID_PATTERN.fullmatch(poll_id):
+        return jsonify({'error': 'Poll IDs are up to 40 letters, digits, - or _'}), 400
+    if not question or len(options) < 2:
+        return jsonify({'error': 'A poll needs a question and at least two options'}), 400
+    if store.get_poll(poll_id) is not None:
+        return jsonify({'error': f'Poll {poll_id} already exists'}), 409
+
+    store.create_poll(poll_id, question, options)
+    return jsonify(load_poll_results(poll_id)), 201
+
+
+@app.route('/api/polls/<poll_id>', methods=['DELETE'])
+def delete_poll(poll_id):
+    """Trainer removes a poll and its votes"""
+    if store.get_poll(poll_id) is None:
+        return jsonify({'error': 'Unknown poll'}), 404
+    if poll_id == ICEBREAKER_POLL:
+        return jsonify({'error': 'The icebreaker poll cannot be deleted'}), 400
+    stop_poll(poll_id)
+    store.delete_poll(poll_id)
     return jsonify({'success': True})
 
 
-@app.route('/api/poll/stop', methods=['POST'])
-def stop_poll():
-    """Trainer stops the poll"""
-    game_state['poll_active'] = False
+@app.route('/api/polls/<poll_id>/start', methods=['POST'])
+def start_poll(poll_id):
+    """Trainer starts a poll; teams are shown the most recently started one"""
+    poll = store.get_poll(poll_id)
+    if poll is None:
+        return jsonify({'error': 'Unknown poll'}), 404
+    store.clear_votes(poll_id)
+    store.set_poll_active(poll_id, True)
+    store.set_state(PYTHON_GAME, poll_active=True, active_poll=poll_id)
 
-    socketio.emit('poll_stopped', {})
+    socketio.emit('poll_started', versioned(PYTHON_GAME, {
+        'poll_id': poll_id,
+        'question': poll['question'],
+        'options': poll['options']
+    }))
 
     return jsonify({'success': True})
 
 
-@app.route('/api/poll/vote', methods=['POST'])
-def submit_vote():
-    """Team submits their vote"""
+@app.route('/api/polls/<poll_id>/stop', methods=['POST'])
+def stop_poll(poll_id):
+    """Trainer stops a poll"""
+    store.set_poll_active(poll_id, False)
+    if store.get_state(PYTHON_GAME)['active_poll'] == poll_id:
+        store.set_state(PYTHON_GAME, poll_active=False, active_poll=None)
+
+    socketio.emit('poll_stopped', versioned(PYTHON_GAME, {'poll_id': poll_id}))
+
+    return jsonify({'success': True})
+
+
+@app.route('/api/polls/<poll_id>/vote', methods=['POST'])
+def submit_vote(poll_id):
+    """Team submits (or changes) their vote"""
     team_id = session.get('team_id')
-    if not team_id or team_id not in game_state['teams']:
+    if not store.has_team(PYTHON_GAME, team_id):
         return jsonify({'error': 'Not registered'}), 401
 
-    if not game_state['poll_active']:
+    poll = store.get_poll(poll_id)
+    if poll is None:
+        return jsonify({'error': 'Unknown poll'}), 404
+    if not poll['active']:
         return jsonify({'error': 'Poll not active'}), 400
 
-    data = request.json
-    selected_options = data.get('options', [])
+    data = request.json or {}
+    selected_options = [option for option in dict.fromkeys(data.get('options', []))
+                        if isinstance(option, str) and option in poll['options']]
+    if not selected_options:
+        return jsonify({'error': 'Select at least one option'}), 400
 
-    game_state['poll_votes'][team_id] = selected_options
+    tally = store.vote(poll_id, team_id, selected_options)
+    if tally is None:
+        return jsonify({'error': 'Unknown poll'}), 404
 
-    # Calculate results and send to trainer
-    results = calculate_poll_results()
-    socketio.emit('poll_update', {
-        'results': results,
-        'total_votes': len(game_state['poll_votes'])
-    }, room='trainer')
+    # Send the new results to the trainer
+    trainer_broadcaster.update('trainer', 'trainer_frame', 'polls', poll_id, poll_results(poll_id, poll, tally))
 
     return jsonify({'success': True})
 
 
-@app.route('/api/poll/results')
-def get_poll_results():
-    """Get current poll results"""
-    results = calculate_poll_results()
-    return jsonify({
-        'question': POLL_QUESTION,
-        'options': POLL_OPTIONS,
-        'results': results,
-        'total_votes': len(game_state['poll_votes']),
-        'active': game_state['poll_active']
-    })
+@app.route('/api/polls/<poll_id>/results')
+def get_poll_results(poll_id):
+    """Get a poll's current results"""
+    results = load_poll_results(poll_id)
+    if results is None:
+        return jsonify({'error': 'Unknown poll'}), 404
+    return jsonify(results)
+
+
+# The original single-poll endpoints act on the icebreaker
+@app.route('/api/poll/start', methods=['POST'])
+def start_icebreaker_poll():
+    return start_poll(ICEBREAKER_POLL)
 
 
-def calculate_poll_results():
-    """Calculate poll results as percentages"""
-    results = {option: 0 for option in POLL_OPTIONS}
-    total_votes = len(game_state['poll_votes'])
+@app.route('/api/poll/stop', methods=['POST'])
+def stop_icebreaker_poll():
+    return stop_poll(ICEBREAKER_POLL)
+
 
-    for team_votes in game_state['poll_votes'].values():
-        for option in team_votes:
-            if option in results:
-                results[option] += 1
+@app.route('/api/poll/vote', methods=['POST'])
+def submit_icebreaker_vote():
+    return submit_vote(ICEBREAKER_POLL)
 
-    # Convert to percentages
-    if total_votes > 0:
-        results = {k: round((v / total_votes) * 100) for k, v in results.items()}
 
-    return results
+@app.route('/api/poll/results')
+def get_icebreaker_results():
+    return get_poll_results(ICEBREAKER_POLL)
 
 
 # ============ AI PROMPT CHALLENGE FUNCTIONS ============
 
-def generate_code_from_prompt(prompt: str, challenge_context: str, given_data: str) -> dict:
-    """Generate Python code from user prompt using Claude API"""
-    try:
-        client = anthropic.Anthropic()
+def generate_code_from_prompt(prompt: str, challenge_context: str, given_data: str, on_code=None) -> dict:
+    """Generate Python code from user prompt using Claude API
 
+    With `on_code`, the reply is streamed and on_code(text) receives each new piece of
+    fence-stripped code as it arrives.
+    """
+    try:
         system_prompt = """You are a Python code generator for KIA (Kuwait Investment Authority) training exercises.
 Your task is to generate ONLY executable Python code based on the user's prompt.
 
@@ -1284,32 +1048,35 @@ User's Prompt:
 
 Generate the Python code:"""
 
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1024,
-            system=system_prompt,
-            messages=[
-                {"role": "user", "content": user_message}
-            ]
-        )
+        messages = [
+            {"role": "user", "content": user_message}
+        ]
+        if on_code is not None:
+            stripper = FenceStripper()
 
-        # Extract the code from the response
-        code = message.content[0].text.strip()
+            def stream_code(chunk):
+                code = stripper.feed(chunk)
+                if code:
+                    on_code(code)
+        else:
+            stream_code = None
 
-        # Clean up any markdown code blocks if present
-        if code.startswith("```python"):
-            code = code[9:]
-        if code.startswith("```"):
-            code = code[3:]
-        if code.endswith("```"):
-            code = code[:-3]
+        text = call_llm(system=system_prompt, messages=messages, on_text=stream_code)
 
+        # Clean up any markdown code blocks if present
         return {
             'success': True,
-            'code': code.strip(),
+            'code': strip_code_fences(text),
             'error': None
         }
 
+    except LLMBusy as e:
+        return {
+            'success': False,
+            'code': None,
+            'error': str(e),
+            'busy': True
+        }
     except anthropic.APIError as e:
         return {
             'success': False,
@@ -1324,6 +1091,27 @@ Generate the Python code:"""
         }
 
 
+def call_llm(system, messages, on_text=None):
+    """llm.generate_text() with its latency and outcome recorded for /metrics"""
+    mode = 'blocking' if on_text is None else 'stream'
+    outcome = 'error'
+    started = time.perf_counter()
+    try:
+        text = llm.generate_text(system=system, messages=messages, max_tokens=1024, on_text=on_text)
+        outcome = 'ok'
+        return text
+    except LLMBusy:
+        outcome = 'busy'
+        raise
+    except anthropic.APIError:
+        outcome = 'api_error'
+        raise
+    finally:
+        LLM_CALL_SECONDS.observe(LLM_BACKEND_NAME, mode, outcome, value=time.perf_counter() - started)
+        if outcome != 'ok':
+            LLM_ERRORS.inc(LLM_BACKEND_NAME, outcome)
+
+
 def evaluate_prompt_quality(prompt: str) -> dict:
     """Evaluate the quality of a prompt and return bonus points"""
     score = 0
@@ -1368,23 +1156,14 @@ def evaluate_prompt_quality(prompt: str) -> dict:
 @app.route('/prompt-trainer')
 def prompt_trainer_dashboard():
     """Trainer dashboard for the AI Prompt Challenge"""
-    if os.environ.get('RENDER'):
-        render_url = os.environ.get('RENDER_EXTERNAL_URL', request.host_url.rstrip('/'))
-        join_url = f"{render_url}/prompt-join"
-    else:
-        local_ip = get_local_ip()
-        port = request.host.split(':')[-1] if ':' in request.host else '8080'
-        join_url = f"http://{local_ip}:{port}/prompt-join"
-
-    qr_code = generate_qr_code(join_url)
+    join_url = get_join_url(QR_JOIN_PATHS['prompt'])
 
     return render_template('prompt_trainer.html',
-                          qr_code=qr_code,
+                          qr_code=qr_image_src('prompt'),
                           join_url=join_url,
-                          teams=prompt_game_state['teams'],
-                          current_round=prompt_game_state['current_round'],
-                          total_rounds=len(PROMPT_CHALLENGES),
-                          challenges=PROMPT_CHALLENGES)
+                          current_round=store.get_state(PROMPT_GAME)['current_round'],
+                          total_rounds=len(bank(PROMPT_GAME).rounds),
+                          challenges=dict(bank(PROMPT_GAME).rounds))
 
 
 @app.route('/prompt-join', methods=['GET', 'POST'])
@@ -1394,21 +1173,12 @@ def prompt_join_game():
         team_name = request.form.get('team_name', '').strip()
         if team_name:
             team_id = generate_team_id()
-            prompt_game_state['teams'][team_id] = {
-                'name': team_name,
-                'score': 0,
-                'attempts': {},  # challenge_id: {attempts, best_score}
-                'joined_at': datetime.now().isoformat()
-            }
+            store.add_team(PROMPT_GAME, team_id, team_name, datetime.now().isoformat())
             session['prompt_team_id'] = team_id
             session['prompt_team_name'] = team_name
 
             # Notify trainer dashboard
-            socketio.emit('prompt_team_joined', {
-                'team_id': team_id,
-                'team_name': team_name,
-                'score': 0
-            }, room='prompt_trainer')
+            trainer_broadcaster.team('prompt_trainer', 'prompt_trainer_frame', team_id, name=team_name, score=0)
 
             return redirect(url_for('prompt_play'))
 
@@ -1419,24 +1189,27 @@ def prompt_join_game():
 def prompt_play():
     """Main game interface for AI Prompt Challenge"""
     team_id = session.get('prompt_team_id')
-    if not team_id or team_id not in prompt_game_state['teams']:
+    team = store.get_team(PROMPT_GAME, team_id) if team_id else None
+    if team is None:
         return redirect(url_for('prompt_join_game'))
 
-    team = prompt_game_state['teams'][team_id]
+    state = store.get_state(PROMPT_GAME)
     return render_template('prompt_game.html',
                           team_id=team_id,
                           team_name=team['name'],
                           score=team['score'],
-                          challenges=PROMPT_CHALLENGES,
-                          current_round=prompt_game_state['current_round'],
-                          game_started=prompt_game_state['game_started'])
+                          content_version=bank(PROMPT_GAME).version,
+                          round_numbers=list(bank(PROMPT_GAME).rounds),
+                          current_round=state['current_round'],
+                          game_started=state['game_started'],
+                          run_timeout_ms=int(PYTHON_RUN_TIMEOUT * 1000))
 
 
 @app.route('/api/prompt/generate', methods=['POST'])
 def api_generate_code():
     """Generate code from user prompt using Claude API"""
     team_id = session.get('prompt_team_id')
-    if not team_id or team_id not in prompt_game_state['teams']:
+    if not store.has_team(PROMPT_GAME, team_id):
         return jsonify({'error': 'Not registered'}), 401
 
     data = request.json
@@ -1447,22 +1220,33 @@ def api_generate_code():
         return jsonify({'error': 'Missing prompt or challenge_id'}), 400
 
     # Find the challenge
-    round_num = int(challenge_id[1])  # P1.1 -> 1
-    challenge = None
-    for c in PROMPT_CHALLENGES.get(round_num, {}).get('challenges', []):
-        if c['id'] == challenge_id:
-            challenge = c
-            break
-
-    if not challenge:
+    record = bank(PROMPT_GAME).index.get(challenge_id)
+    if record is None:
         return jsonify({'error': 'Challenge not found'}), 404
-
-    # Generate code using Claude
-    result = generate_code_from_prompt(
-        prompt=prompt,
-        challenge_context=challenge['scenario'],
-        given_data=challenge['given_data']
+    challenge = record.data
+
+    # Streaming mode: answer right away and push the code to the team's room as it is written
+    if data.get('stream'):
+        request_id = str(data.get('request_id') or secrets.token_hex(8))[:64]
+        socketio.start_background_task(stream_generated_code, team_id, request_id,
+                                       challenge_id, prompt, challenge)
+        return jsonify({'success': True, 'streaming': True, 'request_id': request_id}), 202
+
+    # Generate code using Claude, sharing the result with identical prompts (cached or in flight)
+    cache_key = (challenge_id, normalize_prompt(prompt), llm.model)
+    result, cache_status = generation_cache.get_or_compute(
+        cache_key,
+        lambda: generate_code_from_prompt(
+            prompt=prompt,
+            challenge_context=challenge['scenario'],
+            given_data=challenge['given_data']
+        ),
+        cacheable=lambda generated: generated['success']
     )
+    result = dict(result, cached=cache_status != 'miss')
+
+    if result.get('busy'):
+        return jsonify(result), 503
 
     if result['success']:
         # Evaluate prompt quality
@@ -1472,13 +1256,50 @@ def api_generate_code():
     return jsonify(result)
 
 
+def stream_generated_code(team_id, request_id, challenge_id, prompt, challenge):
+    """Background task: stream generated code to a team as prompt_code_chunk events, then prompt_code_complete"""
+    room = f'prompt_team_{team_id}'
+
+    def on_code(code):
+        socketio.emit('prompt_code_chunk', {
+            'request_id': request_id,
+            'challenge_id': challenge_id,
+            'code': code
+        }, room=room)
+
+    # Identical prompts still share one upstream call; waiters and cache hits get only the final event
+    cache_key = (challenge_id, normalize_prompt(prompt), llm.model)
+    try:
+        result, cache_status = generation_cache.get_or_compute(
+            cache_key,
+            lambda: generate_code_from_prompt(
+                prompt=prompt,
+                challenge_context=challenge['scenario'],
+                given_data=challenge['given_data'],
+                on_code=on_code
+            ),
+            cacheable=lambda generated: generated['success']
+        )
+    except Exception as e:
+        result, cache_status = {'success': False, 'code': None, 'error': f"Error: {str(e)}"}, 'miss'
+
+    result = dict(result, cached=cache_status != 'miss', request_id=request_id, challenge_id=challenge_id)
+    if result['success']:
+        result['prompt_quality'] = evaluate_prompt_quality(prompt)
+    socketio.emit('prompt_code_complete', result, room=room)
+
+
 @app.route('/api/prompt/submit', methods=['POST'])
 def api_submit_prompt_answer():
     """Submit and score a prompt challenge answer"""
     team_id = session.get('prompt_team_id')
-    if not team_id or team_id not in prompt_game_state['teams']:
+    if not store.has_team(PROMPT_GAME, team_id):
         return jsonify({'error': 'Not registered'}), 401
 
+    closed = round_timer.closed(PROMPT_GAME)
+    if closed:
+        return jsonify({'error': closed, 'round_over': True}), 409
+
     data = request.json
     challenge_id = data.get('challenge_id', '')
     prompt = data.get('prompt', '')
@@ -1486,81 +1307,92 @@ def api_submit_prompt_answer():
     user_output = data.get('output', '')
 
     # Find the challenge
-    round_num = int(challenge_id[1])
-    challenge = None
-    for c in PROMPT_CHALLENGES.get(round_num, {}).get('challenges', []):
-        if c['id'] == challenge_id:
-            challenge = c
-            break
-
-    if not challenge:
+    record = bank(PROMPT_GAME).index.get(challenge_id)
+    if record is None:
         return jsonify({'error': 'Challenge not found'}), 404
 
     # Check if already answered correctly
-    team = prompt_game_state['teams'][team_id]
-    existing = team['attempts'].get(challenge_id, {})
-    if existing.get('correct'):
-        return jsonify({
-            'error': 'Already solved',
-            'correct': True,
-            'points_earned': 0,
-            'total_score': team['score']
-        })
+    if (store.get_answer(PROMPT_GAME, team_id, challenge_id) or {}).get('correct'):
+        return already_solved_response(PROMPT_GAME, team_id, 'Already solved')
 
     # Compare output
-    is_correct = check_output_match(user_output, challenge['expected_output'])
+    try:
+        user_output = grade_submission_output(generated_code, user_output)
+    except SandboxBusy:
+        return jsonify({'error': 'Grader busy, please submit again'}), 503
+
+    is_correct = record.matcher.matches(user_output)
+
+    # Another of the team's requests may have solved the challenge while this one was graded.
+    # Only the request that claims the solve records a correct answer; any other answer is
+    # recorded by record_attempt, which counts the attempt and refuses once it is solved.
+    claimed = is_correct and store.claim_solve(PROMPT_GAME, team_id, challenge_id)
+    if is_correct and not claimed:
+        return already_solved_response(PROMPT_GAME, team_id, 'Already solved')
 
     # Calculate points
     points_earned = 0
     prompt_bonus = 0
+    answer = {
+        'correct': is_correct,
+        'prompt': prompt,
+        'code': generated_code,
+        'output': user_output,
+        'points': points_earned,
+        'prompt_bonus': prompt_bonus,
+        'timestamp': datetime.now().isoformat()
+    }
 
-    if is_correct:
-        base_points = challenge['points']
+    if claimed:
+        # The claim stops any other request writing this answer, so its attempt count is final
+        attempt_number = (store.get_answer(PROMPT_GAME, team_id, challenge_id) or {}).get('attempts', 0) + 1
+        base_points = record.points
 
         # Evaluate prompt quality for bonus
         quality = evaluate_prompt_quality(prompt)
         prompt_bonus = quality['bonus_points']
 
         # Apply attempt penalty (if not first attempt)
-        attempt_num = existing.get('attempts', 0) + 1
-        if attempt_num == 1:
+        if attempt_number == 1:
             points_earned = base_points + prompt_bonus
-        elif attempt_num == 2:
+        elif attempt_number == 2:
             points_earned = int((base_points + prompt_bonus) * 0.75)
         else:
             points_earned = int((base_points + prompt_bonus) * 0.5)
 
-        team['score'] += points_earned
-
-    # Record attempt
-    team['attempts'][challenge_id] = {
-        'attempts': existing.get('attempts', 0) + 1,
-        'correct': is_correct,
-        'prompt': prompt,
-        'code': generated_code,
-        'output': user_output,
-        'points': points_earned,
-        'prompt_bonus': prompt_bonus,
-        'timestamp': datetime.now().isoformat()
-    }
+        store.add_score(PROMPT_GAME, team_id, points_earned)
+        store.set_answer(PROMPT_GAME, team_id, challenge_id, dict(
+            answer, attempts=attempt_number, points=points_earned, prompt_bonus=prompt_bonus))
+    else:
+        attempt_number = store.record_attempt(PROMPT_GAME, team_id, challenge_id, answer)
+        if attempt_number is None:
+            return already_solved_response(PROMPT_GAME, team_id, 'Already solved')
 
-    # Notify trainer
-    socketio.emit('prompt_score_update', {
-        'team_id': team_id,
-        'team_name': team['name'],
+    # Push the change to the team's own devices, then notify trainer
+    team = store.get_team(PROMPT_GAME, team_id)
+    push_team_delta(PROMPT_GAME, team_id, f'prompt_team_{team_id}', 'prompt_team_delta', {
         'score': team['score'],
-        'challenge_id': challenge_id,
-        'correct': is_correct,
-        'points': points_earned
-    }, room='prompt_trainer')
+        'attempts': {challenge_id: {
+            'correct': is_correct,
+            'points': points_earned,
+            'attempts': attempt_number,
+            'prompt': prompt
+        }}
+    })
+    trainer_broadcaster.team('prompt_trainer', 'prompt_trainer_frame', team_id,
+                             name=team['name'], score=team['score'])
+    if is_correct:
+        trainer_broadcaster.solved('prompt_trainer', 'prompt_trainer_frame', team_id=team_id,
+                                   team_name=team['name'], challenge_id=challenge_id, points=points_earned)
 
     return jsonify({
         'correct': is_correct,
         'points_earned': points_earned,
         'prompt_bonus': prompt_bonus,
         'total_score': team['score'],
-        'expected_output': challenge['expected_output'] if not is_correct else None,
-        'attempt_number': team['attempts'][challenge_id]['attempts']
+        'graded_output': user_output if grading_pool is not None else None,
+        'expected_output': record.expected_output if not is_correct else None,
+        'attempt_number': attempt_number
     })
 
 
@@ -1570,29 +1402,32 @@ def get_prompt_game_state():
     team_id = session.get('prompt_team_id')
     team_score = 0
     team_attempts = {}
+    team_rank = None
+    team_version = 0
 
-    if team_id and team_id in prompt_game_state['teams']:
-        team_score = prompt_game_state['teams'][team_id]['score']
-        team_attempts = prompt_game_state['teams'][team_id]['attempts']
-
-    # Calculate remaining time
-    time_remaining = 180  # Default 3 minutes
-    if prompt_game_state['current_round'] in PROMPT_CHALLENGES:
-        time_limit = PROMPT_CHALLENGES[prompt_game_state['current_round']].get('time_limit', 180)
-        if prompt_game_state['round_start_time'] and prompt_game_state['game_started']:
-            elapsed = (datetime.now() - prompt_game_state['round_start_time']).seconds
-            time_remaining = max(0, time_limit - elapsed)
-        else:
-            time_remaining = time_limit
+    team = store.get_team(PROMPT_GAME, team_id) if team_id else None
+    if team is not None:
+        team_score = team['score']
+        team_attempts = team['answers']
+        team_rank = store.rank(PROMPT_GAME, team_id)
+        team_version = team['version']
+
+    state = store.get_state(PROMPT_GAME)
+    time_limit = bank(PROMPT_GAME).rounds.get(state['current_round'], {}).get('time_limit', 180)
 
     return jsonify({
-        'current_round': prompt_game_state['current_round'],
-        'game_started': prompt_game_state['game_started'],
-        'game_paused': prompt_game_state['game_paused'],
-        'game_mode': prompt_game_state['game_mode'],
+        'version': state['version'],
+        'team_version': team_version,
+        'server_time': int(time.time() * 1000),
+        'current_round': state['current_round'],
+        'game_started': state['game_started'],
+        'game_paused': state['game_paused'],
+        'game_mode': state['game_mode'],
         'your_score': team_score,
         'your_attempts': team_attempts,
-        'time_remaining': time_remaining
+        'your_rank': team_rank,
+        'total_teams': store.team_count(PROMPT_GAME),
+        **clock_fields(PROMPT_GAME, time_limit)
     })
 
 
@@ -1600,19 +1435,17 @@ def get_prompt_game_state():
 def prompt_start_round():
     """Trainer starts a new round in prompt challenge"""
     round_num = request.json.get('round', 1)
-    prompt_game_state['current_round'] = round_num
-    prompt_game_state['game_started'] = True
-    prompt_game_state['game_paused'] = False
-    prompt_game_state['round_start_time'] = datetime.now()
-
-    round_data = PROMPT_CHALLENGES.get(round_num, {})
+    round_data = bank(PROMPT_GAME).rounds.get(round_num, {})
+    timer = round_timer.start(PROMPT_GAME, round_num, round_data.get('time_limit', 180),
+                              current_round=round_num, game_started=True)
 
-    socketio.emit('prompt_round_started', {
+    socketio.emit('prompt_round_started', versioned(PROMPT_GAME, {
         'round': round_num,
         'title': round_data.get('title', ''),
         'theme': round_data.get('theme', ''),
-        'time_limit': round_data.get('time_limit', 180)
-    })
+        'time_limit': timer['limit'],
+        'timer': timer_anchor(timer)
+    }))
 
     return jsonify({'success': True, 'round': round_num})
 
@@ -1620,62 +1453,149 @@ def prompt_start_round():
 @app.route('/api/prompt/trainer/pause', methods=['POST'])
 def prompt_pause_game():
     """Trainer pauses/resumes the prompt game"""
-    prompt_game_state['game_paused'] = not prompt_game_state['game_paused']
+    paused = not store.get_state(PROMPT_GAME)['game_paused']
+    timer = round_timer.pause(PROMPT_GAME, paused)
 
-    socketio.emit('prompt_game_paused', {
-        'paused': prompt_game_state['game_paused']
-    })
+    socketio.emit('prompt_game_paused', versioned(PROMPT_GAME, {
+        'paused': paused,
+        'timer': timer_anchor(timer) if timer else None
+    }))
 
-    return jsonify({'success': True, 'paused': prompt_game_state['game_paused']})
+    return jsonify({'success': True, 'paused': paused})
 
 
 @app.route('/api/prompt/trainer/reset', methods=['POST'])
 def prompt_reset_game():
     """Trainer resets the prompt game"""
-    prompt_game_state['teams'] = {}
-    prompt_game_state['current_round'] = 0
-    prompt_game_state['game_started'] = False
-    prompt_game_state['game_paused'] = False
-    prompt_game_state['round_start_time'] = None
+    store.reset(PROMPT_GAME)
+    trainer_broadcaster.discard('prompt_trainer', 'prompt_trainer_frame')
+    round_timer.reset(PROMPT_GAME, current_round=0, game_started=False)
 
-    socketio.emit('prompt_game_reset', {})
+    socketio.emit('prompt_game_reset', versioned(PROMPT_GAME, {}))
 
     return jsonify({'success': True})
 
 
 @app.route('/api/prompt/trainer/teams')
 def get_prompt_teams():
-    """Get all teams and scores for prompt game trainer"""
+    """Get prompt game teams and scores for trainer, ranked (supports ?limit=&offset= paging and ?answers=0)"""
+    limit, offset = get_page_args()
+    answers = wants_answers()
+    ranking = store.top(PROMPT_GAME, limit, offset)
+    teams = store.get_teams(PROMPT_GAME, [team_id for team_id, _ in ranking])
     teams_list = []
-    for team_id, team_data in prompt_game_state['teams'].items():
-        teams_list.append({
-            'id': team_id,
-            'name': team_data['name'],
-            'score': team_data['score'],
-            'attempts': team_data['attempts']
-        })
-
-    teams_list.sort(key=lambda x: x['score'], reverse=True)
-
+    for team_id, score in ranking:
+        team_data = teams.get(team_id)
+        if team_data is None:
+            continue
+        entry = {'id': team_id, 'name': team_data['name'], 'score': score}
+        if answers:
+            entry['attempts'] = team_data['answers']
+        teams_list.append(entry)
+
+    state = store.get_state(PROMPT_GAME)
     return jsonify({
         'teams': teams_list,
-        'current_round': prompt_game_state['current_round'],
-        'game_started': prompt_game_state['game_started']
+        'total_teams': store.team_count(PROMPT_GAME),
+        'current_round': state['current_round'],
+        'game_started': state['game_started'],
+        'generation_cache': generation_cache.stats()
     })
 
 
+# ============ METRICS ============
+
+def route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+@app.before_request
+def start_request_timer():
+    g.metrics_started = time.perf_counter()
+    g.metrics_route = route_label()
+    HTTP_IN_FLIGHT.inc(g.metrics_route)
+
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(request.method, g.metrics_route, response.status_code,
+                                     value=time.perf_counter() - started)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    if COMPRESSION:
+        response = compressor(response, request.accept_encodings)
+    return response
+
+
+@app.teardown_request
+def end_request_timer(error=None):
+    route = g.pop('metrics_route', None)
+    if route is not None:
+        HTTP_IN_FLIGHT.dec(route)
+
+
+def socketio_room_sizes():
+    """Sockets in each dashboard room, as seen by this worker"""
+    manager = socketio.server.manager
+    return {(room,): len(list(manager.get_participants('/', room)))
+            for room in ('trainer', 'prompt_trainer') if room in manager.rooms.get('/', {})}
+
+
+metrics.gauge_callback('kia_socketio_room_members', 'Sockets in the trainer dashboard rooms',
+                       ('room',), socketio_room_sizes)
+metrics.gauge_callback('kia_teams', 'Registered teams per game', ('game',),
+                       lambda: {(game,): store.team_count(game) for game in (PYTHON_GAME, PROMPT_GAME)})
+metrics.gauge_callback('kia_generation_cache', 'Code generation cache counters', ('stat',),
+                       lambda: {(stat,): value for stat, value in generation_cache.stats().items()})
+metrics.gauge_callback('kia_trainer_broadcaster', 'Coalesced trainer broadcast counters', ('stat',),
+                       lambda: {(stat,): value for stat, value in trainer_broadcaster.stats().items()})
+metrics.gauge_callback('kia_question_banks', 'Question bank size and reloads per game', ('game', 'stat'),
+                       lambda: {(game, stat): value for game, question_bank in question_banks.items()
+                                for stat, value in question_bank.stats().items()})
+metrics.gauge_callback('kia_content_verification', 'Latest question bank verification counts per game',
+                       ('game', 'stat'), lambda: {(game, stat): value for game, report in content_reports.items()
+                                                  for stat, value in report.counts().items()})
+metrics.gauge_callback('kia_compression', 'Compressed responses and their bytes before/after', ('stat',),
+                       lambda: {(stat,): value for stat, value in compressor.stats().items()})
+metrics.gauge_callback('kia_grading_pool', 'Server-side grading pool counters', ('stat',),
+                       lambda: {(stat,): value for stat, value in grading_pool.stats().items()} if grading_pool else {})
+metrics.gauge_callback('kia_state_journal', 'State journal counters', ('stat',),
+                       lambda: {(stat,): value for stat, value in store.stats().items()}
+                       if isinstance(store, JournaledStore) else {})
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 # SocketIO events
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
-    pass
+    SOCKETIO_CONNECTIONS.inc()
+
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    """Handle client disconnection"""
+    SOCKETIO_CONNECTIONS.dec()
 
 
 @socketio.on('join_trainer')
 def handle_trainer_join():
     """Trainer joins their room for updates"""
     join_room('trainer')
-    game_state['trainer_connected'] = True
+    store.set_state(PYTHON_GAME, trainer_connected=True)
     emit('connected', {'status': 'Trainer connected'})
 
 
@@ -1692,7 +1612,7 @@ def handle_team_join(data):
 def handle_prompt_trainer_join():
     """Prompt game trainer joins their room"""
     join_room('prompt_trainer')
-    prompt_game_state['trainer_connected'] = True
+    store.set_state(PROMPT_GAME, trainer_connected=True)
     emit('connected', {'status': 'Prompt trainer connected'})
 
 
@@ -0,0 +1,125 @@
+"""
+Connection-count benchmark
+Ramps up concurrent Socket.IO team connections against a running server and reports
+how many stay connected and responsive, for WebSocket and long-polling transports.
+
+    python benchmarks/connections.py --url http://localhost:5000 --max 3000 --step 250
+    python benchmarks/connections.py --transport polling --max 1000
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import socketio
+
+
+TRANSPORTS = {
+    'websocket': ['websocket'],
+    'polling': ['polling']
+}
+
+
+class TeamConnection:
+    """One simulated team phone holding an idle Socket.IO connection"""
+
+    def __init__(self, url, transports, team_id):
+        self.url = url
+        self.transports = transports
+        self.team_id = team_id
+        self.client = socketio.AsyncClient(reconnection=False)
+        self.connected = False
+        self.client.on('disconnect', self._on_disconnect)
+
+    async def _on_disconnect(self):
+        self.connected = False
+
+    async def connect(self, timeout):
+        try:
+            await asyncio.wait_for(self.client.connect(self.url, transports=self.transports), timeout)
+            self.connected = True
+        except Exception:
+            self.connected = False
+        return self.connected
+
+    async def round_trip(self, timeout):
+        """Seconds for a join_team_room acknowledgement, or None if it didn't come back"""
+        if not self.connected:
+            return None
+        started = time.perf_counter()
+        try:
+            await self.client.call('join_team_room', {'team_id': self.team_id}, timeout=timeout)
+        except Exception:
+            return None
+        return time.perf_counter() - started
+
+    async def close(self):
+        try:
+            await self.client.disconnect()
+        except Exception:
+            pass
+        http = getattr(self.client.eio, 'http', None)
+        if http is not None and not http.closed:
+            await http.close()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def ramp(args):
+    transports = TRANSPORTS[args.transport]
+    connections = []
+    sustained = 0
+    print(f"transport={args.transport} url={args.url}")
+    print(f"{'target':>7} {'connected':>10} {'rtt p50 ms':>11} {'rtt p99 ms':>11} {'lost':>6}")
+
+    try:
+        while len(connections) < args.max:
+            batch = [TeamConnection(args.url, transports, f"BENCH{len(connections) + i:05d}")
+                     for i in range(min(args.step, args.max - len(connections)))]
+            await asyncio.gather(*(c.connect(args.timeout) for c in batch))
+            connections.extend(batch)
+
+            await asyncio.sleep(args.hold)
+            rtts = await asyncio.gather(*(c.round_trip(args.timeout) for c in connections))
+            ok = [r * 1000 for r in rtts if r is not None]
+            lost = len(connections) - len(ok)
+            p50 = percentile(ok, 50)
+            p99 = percentile(ok, 99)
+            print(f"{len(connections):>7} {len(ok):>10} "
+                  f"{(p50 or 0):>11.1f} {(p99 or 0):>11.1f} {lost:>6}")
+
+            healthy = lost <= len(connections) * args.max_loss and (p99 or 0) <= args.max_rtt
+            if not healthy:
+                break
+            sustained = len(ok)
+    finally:
+        await asyncio.gather(*(c.close() for c in connections))
+
+    print(f"\nSustained {sustained} concurrent teams over {args.transport} "
+          f"(<= {args.max_loss:.0%} lost, p99 round trip <= {args.max_rtt} ms)")
+    return sustained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='websocket')
+    parser.add_argument('--max', type=int, default=2000, help='stop after this many connections')
+    parser.add_argument('--step', type=int, default=100, help='connections added per step')
+    parser.add_argument('--hold', type=float, default=5, help='seconds to hold each step before probing')
+    parser.add_argument('--timeout', type=float, default=10, help='connect / round-trip timeout in seconds')
+    parser.add_argument('--max-loss', type=float, default=0.01, help='fraction of lost connections tolerated')
+    parser.add_argument('--max-rtt', type=float, default=1000, help='p99 round trip (ms) tolerated')
+    args = parser.parse_args()
+
+    return 0 if asyncio.run(ramp(args)) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
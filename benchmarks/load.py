@@ -0,0 +1,516 @@
+"""
+End-to-end load benchmark
+Plays one scripted session against the app with N simulated teams. Teams join, hold a
+Socket.IO connection, vote in the poll, re-sync game state, and submit answers with a burst
+at round end; prompt teams also generate and submit code. Trainer dashboards poll the team
+lists throughout. Reports p50/p95/p99 latency and error rate per endpoint, plus delivery lag
+per Socket.IO event.
+
+    python benchmarks/load.py --teams 300                       # starts gunicorn + gevent with the stub LLM
+    python benchmarks/load.py --url http://localhost:5000 --teams 100 --prompt-share 0.5
+    python benchmarks/load.py --teams 300 --json today.json --baseline last-release.json
+
+Runs are repeatable: the schedule, answers and team names come from --seed.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import aiohttp
+import socketio
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from content_packs import CONTENT_DIR, SCHEMAS, compile_bank  # noqa: E402
+
+
+TEAM_ID_PATTERN = re.compile(r'const teamId = "(\w+)"')
+
+# Each game's rounds with answers, from this checkout's content packs
+ROUNDS = {game: compile_bank(os.path.join(CONTENT_DIR, game), schema).rounds for game, schema in SCHEMAS.items()}
+
+# Broadcasts stamped with server_time by the app; lag is measured against that stamp
+TIMED_EVENTS = ('round_started', 'game_paused', 'poll_started', 'poll_stopped',
+                'prompt_round_started', 'prompt_game_paused')
+
+
+def now_ms():
+    return time.time() * 1000
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint, and lag samples per event"""
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.defaultdict(int)
+        self.failures = collections.defaultdict(collections.Counter)  # endpoint: {status or exception: count}
+        self.events = collections.defaultdict(list)
+
+    def request(self, name, elapsed_ms, ok, failure=None):
+        self.latencies[name].append(elapsed_ms)
+        if not ok:
+            self.errors[name] += 1
+            self.failures[name][failure or 'error'] += 1
+
+    def event(self, name, lag_ms):
+        self.events[name].append(max(0.0, lag_ms))
+
+    def report(self):
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            endpoints[name] = {
+                'count': len(samples),
+                'errors': self.errors[name],
+                'error_rate': round(self.errors[name] / len(samples), 4),
+                'failures': dict(self.failures[name]),
+                'p50': round(percentile(samples, 50), 1),
+                'p95': round(percentile(samples, 95), 1),
+                'p99': round(percentile(samples, 99), 1)
+            }
+        events = {}
+        for name, samples in sorted(self.events.items()):
+            events[name] = {
+                'count': len(samples),
+                'p50': round(percentile(samples, 50), 1),
+                'p95': round(percentile(samples, 95), 1),
+                'p99': round(percentile(samples, 99), 1)
+            }
+        return {'endpoints': endpoints, 'events': events}
+
+
+class Client:
+    """HTTP session with its own cookies (one browser) on a shared connection pool"""
+
+    def __init__(self, url, connector, recorder):
+        self.url = url
+        self.recorder = recorder
+        self.http = aiohttp.ClientSession(connector=connector, connector_owner=False,
+                                          cookie_jar=aiohttp.CookieJar(unsafe=True))
+
+    async def call(self, method, path, name=None, **kwargs):
+        """Timed request; returns (status, body) with body parsed as JSON when possible"""
+        name = name or f"{method} {path}"
+        started = time.perf_counter()
+        try:
+            async with self.http.request(method, self.url + path, **kwargs) as response:
+                text = await response.text()
+                status = response.status
+        except Exception as e:
+            self.recorder.request(name, (time.perf_counter() - started) * 1000, False, type(e).__name__)
+            return None, None
+        self.recorder.request(name, (time.perf_counter() - started) * 1000, status < 400, f"HTTP {status}")
+        try:
+            return status, json.loads(text)
+        except ValueError:
+            return status, text
+
+    async def close(self):
+        await self.http.close()
+
+
+class SimTeam(Client):
+    """One team's phone: joins, keeps a socket open and plays the round"""
+
+    def __init__(self, url, connector, recorder, args, index, game):
+        super().__init__(url, connector, recorder)
+        self.args = args
+        self.game = game
+        self.name = f"Load {game} {index:04d}"
+        self.rng = random.Random(args.seed * 100003 + index)
+        self.team_id = None
+        self.items = {}
+        self.sent = collections.deque()   # send times of submissions awaiting their team delta
+        self.streams = {}                 # request_id: send time of a streamed generation
+        self.completed = None             # future for the streamed generation in progress
+        self.sio = socketio.AsyncClient(reconnection=False)
+
+        delta = 'team_delta' if game == 'python' else 'prompt_team_delta'
+        self.sio.on(delta, self._on_delta)
+        self.sio.on('prompt_code_chunk', self._on_code_chunk)
+        self.sio.on('prompt_code_complete', self._on_code_complete)
+        for event in TIMED_EVENTS:
+            self.sio.on(event, self._timed(event))
+
+    def _timed(self, event):
+        async def handler(data):
+            if isinstance(data, dict) and 'server_time' in data:
+                self.recorder.event(event, now_ms() - data['server_time'])
+        return handler
+
+    async def _on_delta(self, data):
+        if self.sent:
+            self.recorder.event('team_delta (after submit)', now_ms() - self.sent.popleft())
+
+    async def _on_code_chunk(self, data):
+        started = self.streams.get(data.get('request_id'))
+        if started is not None:
+            self.recorder.event('prompt_code_chunk (first)', now_ms() - started)
+            self.streams[data['request_id']] = None  # only the first chunk counts
+
+    async def _on_code_complete(self, data):
+        self.streams.pop(data.get('request_id'), None)
+        if self.completed is not None and not self.completed.done():
+            self.completed.set_result(data)
+
+    async def join(self):
+        path = '/join' if self.game == 'python' else '/prompt-join'
+        status, page = await self.call('POST', path, data={'team_name': self.name})
+        if status != 200 or not isinstance(page, str):
+            return False
+        team_id = TEAM_ID_PATTERN.search(page)
+        if not team_id:
+            return False
+        self.team_id = team_id.group(1)
+        # Pages only get answer-free round payloads; simulated answers come from the packs on disk
+        self.items = ROUNDS[self.game]
+        return True
+
+    async def connect(self):
+        try:
+            await asyncio.wait_for(self.sio.connect(self.url, transports=[self.args.transport]), 15)
+        except Exception:
+            self.recorder.request('socket connect', 15000, False, 'connect failed')
+            return
+        room = 'join_team_room' if self.game == 'python' else 'join_prompt_team'
+        await self.sio.emit(room, {'team_id': self.team_id})
+
+    def _round_items(self, round_num):
+        data = self.items.get(round_num, {})
+        return data.get('questions') or data.get('challenges') or []
+
+    def _schedule(self, count):
+        """Submission times across the round: a share lands in the last 10% (the buzzer burst)"""
+        length = self.args.round_seconds
+        times = []
+        for _ in range(count):
+            if self.rng.random() < self.args.burst:
+                times.append(self.rng.uniform(length * 0.9, length))
+            else:
+                times.append(self.rng.uniform(0, length * 0.9))
+        return sorted(times)
+
+    async def vote(self, options):
+        await asyncio.sleep(self.rng.uniform(0, 3))
+        chosen = self.rng.sample(options, self.rng.randint(1, 2))
+        await self.call('POST', '/api/poll/vote', json={'options': chosen})
+
+    async def play_round(self, round_num, round_started):
+        await self.call('GET', f'/api/content/{self.game}/{round_num}', name='GET /api/content')
+        items = self._round_items(round_num)
+        tasks = [asyncio.create_task(self._resync_loop(round_started))]
+        for at, item in zip(self._schedule(len(items)), items):
+            delay = round_started + at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.game == 'python':
+                await self._submit(item)
+            else:
+                await self._generate_and_submit(item)
+        remaining = round_started + self.args.round_seconds - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+        for task in tasks:
+            task.cancel()
+
+    async def _resync_loop(self, round_started):
+        """Occasional full state fetches, as phones do after reconnecting or waking up"""
+        path = '/api/game_state' if self.game == 'python' else '/api/prompt/game_state'
+        await asyncio.sleep(self.rng.uniform(0, self.args.state_interval))
+        while True:
+            await self.call('GET', path)
+            await asyncio.sleep(self.args.state_interval)
+
+    def _output_for(self, item):
+        if self.rng.random() < self.args.correct_rate:
+            return item.get('expected_output', '')
+        return 'Traceback (most recent call last): NameError'
+
+    async def _submit(self, item):
+        self.sent.append(now_ms())
+        status, _ = await self.call('POST', '/api/submit_answer', json={
+            'question_id': item['id'],
+            'code': 'print("load test")',
+            'output': self._output_for(item)
+        })
+        if status != 200 and self.sent:
+            self.sent.pop()
+
+    async def _generate_and_submit(self, item):
+        prompt = f"Calculate the answer for {item['id']} and print it. Variant {self.rng.randint(1, self.args.prompt_variants)}"
+        stream = self.sio.connected and self.args.stream
+        request_id = f"{self.team_id}-{item['id']}-{time.monotonic_ns()}"
+        self.completed = asyncio.get_running_loop().create_future()
+        if stream:
+            self.streams[request_id] = now_ms()
+        status, body = await self.call('POST', '/api/prompt/generate', json={
+            'prompt': prompt,
+            'challenge_id': item['id'],
+            'stream': stream,
+            'request_id': request_id
+        })
+        if status == 202:
+            started = now_ms()
+            try:
+                await asyncio.wait_for(self.completed, self.args.generate_timeout)
+                self.recorder.event('prompt_code_complete', now_ms() - started)
+            except asyncio.TimeoutError:
+                self.recorder.request('prompt_code_complete (missing)', self.args.generate_timeout * 1000, False, 'timeout')
+                return
+        elif status != 200:
+            return
+        self.sent.append(now_ms())
+        await self.call('POST', '/api/prompt/submit', json={
+            'challenge_id': item['id'],
+            'prompt': prompt,
+            'generated_code': 'print("load test")',
+            'output': self._output_for(item)
+        })
+
+    async def close(self):
+        try:
+            await self.sio.disconnect()
+        except Exception:
+            pass
+        http = getattr(self.sio.eio, 'http', None)
+        if http is not None and not http.closed:
+            await http.close()
+        await super().close()
+
+
+class SimTrainer(Client):
+    """Trainer laptop: drives the session and polls its dashboard"""
+
+    def __init__(self, url, connector, recorder, args, game):
+        super().__init__(url, connector, recorder)
+        self.args = args
+        self.game = game
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.delivered = collections.Counter()
+        for event in ('trainer_frame', 'prompt_trainer_frame'):
+            self.sio.on(event, self._on_frame(event))
+
+    def _on_frame(self, event):
+        async def handler(frame):
+            self.delivered[event] += 1
+            self.delivered[f"{event} updates"] += len(frame['teams']) + len(frame.get('polls', {}))
+            self.recorder.event(event, now_ms() - frame['server_time'])
+        return handler
+
+    async def connect(self):
+        await self.sio.connect(self.url, transports=[self.args.transport])
+        await self.sio.emit('join_trainer' if self.game == 'python' else 'join_prompt_trainer')
+
+    async def dashboard_loop(self):
+        path = '/api/trainer/teams' if self.game == 'python' else '/api/prompt/trainer/teams'
+        path += '?limit=50&answers=0'  # what the dashboards poll
+        while True:
+            await self.call('GET', path)
+            await asyncio.sleep(self.args.dashboard_interval)
+
+    async def close(self):
+        try:
+            await self.sio.disconnect()
+        except Exception:
+            pass
+        http = getattr(self.sio.eio, 'http', None)
+        if http is not None and not http.closed:
+            await http.close()
+        await super().close()
+
+
+async def gather_limited(coros, limit):
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(c) for c in coros))
+
+
+async def session(args):
+    recorder = Recorder()
+    # Drop idle connections before gunicorn's 2s keep-alive does, or reuse races show up as errors
+    connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=1)
+    prompt_teams = round(args.teams * args.prompt_share)
+    games = ['python'] * (args.teams - prompt_teams) + ['prompt'] * prompt_teams
+    teams = [SimTeam(args.url, connector, recorder, args, i, game) for i, game in enumerate(games)]
+    trainers = {game: SimTrainer(args.url, connector, recorder, args, game) for game in set(games)}
+    dashboards = []
+
+    try:
+        for trainer in trainers.values():
+            await trainer.connect()
+        if 'python' in trainers:
+            await trainers['python'].call('POST', '/api/trainer/reset_game')
+        if 'prompt' in trainers:
+            await trainers['prompt'].call('POST', '/api/prompt/trainer/reset')
+        dashboards = [asyncio.create_task(t.dashboard_loop()) for t in trainers.values()]
+
+        print(f"joining {len(teams)} teams ({len(teams) - prompt_teams} python, {prompt_teams} prompt)...")
+        joined = await gather_limited([t.join() for t in teams], args.concurrency)
+        teams = [t for t, ok in zip(teams, joined) if ok]
+        await gather_limited([t.connect() for t in teams], args.concurrency)
+
+        python_teams = [t for t in teams if t.game == 'python']
+        if python_teams:
+            print("running the poll...")
+            await trainers['python'].call('POST', '/api/poll/start')
+            _, poll = await trainers['python'].call('GET', '/api/poll/results')
+            await asyncio.gather(*(t.vote(poll['options']) for t in python_teams))
+            await trainers['python'].call('POST', '/api/poll/stop')
+
+        print(f"playing round {args.round} for {args.round_seconds}s...")
+        if 'python' in trainers:
+            await trainers['python'].call('POST', '/api/trainer/start_round', json={'round': args.round})
+        if 'prompt' in trainers:
+            await trainers['prompt'].call('POST', '/api/prompt/trainer/start_round', json={'round': args.round})
+        round_started = time.monotonic()
+        await asyncio.gather(*(t.play_round(args.round, round_started) for t in teams))
+        await asyncio.sleep(args.drain)
+    finally:
+        for task in dashboards:
+            task.cancel()
+        await asyncio.gather(*(t.close() for t in teams), *(t.close() for t in trainers.values()))
+        await connector.close()
+
+    report = recorder.report()
+    report['teams'] = {'requested': args.teams, 'joined': len(teams)}
+    report['trainer_events'] = {e: n for t in trainers.values() for e, n in t.delivered.items()}
+    return report
+
+
+def print_report(report, baseline=None):
+    def delta(section, name, key):
+        if not baseline:
+            return ''
+        old = baseline.get(section, {}).get(name, {}).get(key)
+        new = report[section][name][key]
+        if not old:
+            return ''
+        return f" ({(new - old) / old:+.0%})"
+
+    print(f"\nteams joined: {report['teams']['joined']}/{report['teams']['requested']}")
+    print(f"\n{'endpoint':<36} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in report['endpoints'].items():
+        print(f"{name:<36} {row['count']:>7} {row['error_rate']:>7.1%} {row['p50']:>9.1f} "
+              f"{row['p95']:>9.1f} {row['p99']:>9.1f}{delta('endpoints', name, 'p95')}")
+    print(f"\n{'event (delivery lag)':<36} {'count':>7} {'':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in report['events'].items():
+        print(f"{name:<36} {row['count']:>7} {'':>7} {row['p50']:>9.1f} "
+              f"{row['p95']:>9.1f} {row['p99']:>9.1f}{delta('events', name, 'p95')}")
+    failures = [f"{name}: " + ", ".join(f"{kind} x{count}" for kind, count in row['failures'].items())
+                for name, row in report['endpoints'].items() if row['failures']]
+    if failures:
+        print("\nfailures:\n  " + "\n  ".join(failures))
+    if report['trainer_events']:
+        print("\ntrainer events received: " +
+              ", ".join(f"{name}={count}" for name, count in sorted(report['trainer_events'].items())))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    """Run the production stack (gunicorn + gevent, stub LLM) on a free local port"""
+    port = free_port()
+    env = dict(os.environ, LLM_BACKEND=args.llm, PYTHONUNBUFFERED='1')
+    command = [sys.executable, '-m', 'gunicorn', '-k', 'gevent', '-w', '1',
+               '--worker-connections', '10000', '--timeout', '120',
+               '-b', f'127.0.0.1:{port}', 'wsgi:app']
+    log = open(args.server_log, 'w') if args.server_log else subprocess.DEVNULL
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=log)
+    url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during start-up (see --server-log)")
+        try:
+            with urllib.request.urlopen(url + '/', timeout=2):
+                return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='target a running server instead of starting one')
+    parser.add_argument('--teams', type=int, default=100)
+    parser.add_argument('--prompt-share', type=float, default=0.3, help='fraction of teams in the prompt challenge')
+    parser.add_argument('--round', type=int, default=1)
+    parser.add_argument('--round-seconds', type=float, default=30)
+    parser.add_argument('--burst', type=float, default=0.5, help='share of submissions in the last 10%% of the round')
+    parser.add_argument('--correct-rate', type=float, default=0.7)
+    parser.add_argument('--state-interval', type=float, default=10, help='seconds between game_state re-syncs')
+    parser.add_argument('--dashboard-interval', type=float, default=10)
+    parser.add_argument('--prompt-variants', type=int, default=20, help='distinct prompts per challenge')
+    parser.add_argument('--no-stream', dest='stream', action='store_false', help='use blocking code generation')
+    parser.add_argument('--generate-timeout', type=float, default=30)
+    parser.add_argument('--transport', choices=['websocket', 'polling'], default='websocket')
+    parser.add_argument('--concurrency', type=int, default=200, help='max simultaneous HTTP connections')
+    parser.add_argument('--drain', type=float, default=3, help='seconds to wait for late events')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--llm', default='stub://?latency_ms=800&jitter=0.4&seed=1',
+                        help='LLM_BACKEND for a started server')
+    parser.add_argument('--server-log', help='write the started server\'s output here')
+    parser.add_argument('--json', help='write the report here')
+    parser.add_argument('--baseline', help='earlier --json report to compare p95s against')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    args = parser.parse_args()
+
+    process = None
+    if not args.url:
+        process, args.url = start_server(args)
+        print(f"started server at {args.url} (LLM_BACKEND={args.llm})")
+    try:
+        report = asyncio.run(session(args))
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report['config'] = {k: v for k, v in vars(args).items() if k not in ('json', 'baseline', 'server_log')}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    worst = max((row['error_rate'] for row in report['endpoints'].values()), default=0)
+    return 0 if worst <= args.max_error_rate else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Page weight benchmark
+Counts the response bytes a phone downloads to join a game and a trainer to refresh the
+unified dashboard, with an empty cache and then with a warm one, with and without compression.
+Runs in-process against the app (no server needed) with 100 registered teams; the
+vendored/CDN libraries are left out since the service worker or CDN caches them separately.
+
+    python benchmarks/page_weight.py
+    python benchmarks/page_weight.py --teams 300
+"""
+
+import argparse
+import gzip
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as kia  # noqa: E402
+
+
+ASSET_PATTERN = re.compile(r'"(/assets/[^"]+)"')
+
+
+def decode(response):
+    body = response.get_data()
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'br':
+        import brotli
+        body = brotli.decompress(body)
+    return body.decode()
+
+
+class Browser:
+    """A test client with an HTTP cache: fresh entries are reused, stale ones revalidated"""
+
+    def __init__(self, accept_encoding):
+        self.client = kia.app.test_client()
+        self.accept_encoding = accept_encoding
+        self.cache = {}   # url -> (etag, reusable without asking)
+        self.bytes = 0
+        self.requests = 0
+
+    def get(self, url):
+        etag, fresh = self.cache.get(url, (None, False))
+        if fresh:
+            return None
+        headers = {'Accept-Encoding': self.accept_encoding}
+        if etag:
+            headers['If-None-Match'] = etag
+        response = self.client.get(url, headers=headers)
+        self.requests += 1
+        self.bytes += len(response.data)
+        if response.status_code == 200 and response.headers.get('ETag'):
+            cache_control = response.cache_control
+            self.cache[url] = (response.headers['ETag'],
+                               bool(cache_control.max_age) and not cache_control.no_cache)
+        return response
+
+    def page(self, url):
+        response = self.get(url)
+        html = decode(response) if response is not None else ''
+        for asset in ASSET_PATTERN.findall(html):
+            self.get(asset)
+
+    def measure(self, visit):
+        self.bytes = self.requests = 0
+        visit(self)
+        return self.bytes, self.requests
+
+
+def join(browser):
+    browser.page('/join')
+    browser.client.post('/join', data={'team_name': 'Weight Watchers'},
+                        headers={'Accept-Encoding': browser.accept_encoding})
+    browser.page('/game')
+    browser.get('/api/game_state')
+    version = kia.bank(kia.PYTHON_GAME).version
+    browser.get(f'/api/content/python/1?v={version}')
+    browser.get(f'/api/content/python/2?v={version}')
+
+
+def dashboard(browser):
+    browser.page('/unified-trainer')
+    browser.get('/api/trainer/teams?limit=50&answers=0')
+    browser.get('/api/prompt/trainer/teams?limit=50&answers=0')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teams', type=int, default=100)
+    args = parser.parse_args()
+
+    for i in range(args.teams):
+        kia.store.add_team(kia.PYTHON_GAME, f'bench{i}', f'Team {i}', '')
+        kia.store.add_team(kia.PROMPT_GAME, f'bench{i}', f'Team {i}', '')
+    kia.round_timer.start(kia.PYTHON_GAME, 1, kia.ROUND_TIME_LIMIT, current_round=1, game_started=True)
+
+    print(f"{'flow':<12} {'encoding':<10} {'cold bytes':>11} {'reqs':>5} {'warm bytes':>11} {'reqs':>5}")
+    for name, visit in (('join', join), ('dashboard', dashboard)):
+        for encoding in ('identity', 'gzip', 'gzip, br'):
+            browser = Browser(encoding)
+            cold = browser.measure(visit)
+            browser.client.delete_cookie('session')
+            warm = browser.measure(visit)
+            print(f"{name:<12} {encoding:<10} {cold[0]:>11,} {cold[1]:>5} {warm[0]:>11,} {warm[1]:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Trainer broadcast coalescing
+Trainer-bound updates (joins, score changes, poll results) are merged into one frame per room
+and emitted on a fixed tick from a background task, so request handlers never wait on socket
+fan-out and a round-end burst reaches each dashboard as a handful of frames.
+"""
+
+import logging
+import threading
+import time
+
+
+DEFAULT_TICK = 0.25          # seconds between frames
+MAX_NOTIFICATIONS = 20       # correct-answer toasts kept per frame; the rest are only counted
+
+logger = logging.getLogger(__name__)
+
+
+class TrainerBroadcaster:
+    """Queue of pending trainer frames, flushed every `tick` seconds
+
+    A frame for one room looks like:
+        {'teams': {team_id: {'name', 'score', ...}},   latest fields per team
+         'solved': [{...}, ...], 'solved_count': n,      correct answers this frame
+         'polls': {poll_id: {...}},                      latest results of polls that got votes
+         'server_time': ms}
+    """
+
+    def __init__(self, socketio, tick=DEFAULT_TICK):
+        self.socketio = socketio
+        self.tick = tick
+        self._lock = threading.Lock()
+        self._frames = {}   # (room, event): frame
+        self._started = False
+        self._stats = {'updates': 0, 'frames': 0}
+
+    def _frame(self, room, event):
+        """Pending frame for a room (call with the lock held)"""
+        frame = self._frames.get((room, event))
+        if frame is None:
+            frame = self._frames[(room, event)] = {'teams': {}, 'solved': [], 'solved_count': 0}
+        self._stats['updates'] += 1
+        return frame
+
+    def team(self, room, event, team_id, **fields):
+        """Merge a team's new fields (name, score, ...) into the next frame"""
+        with self._lock:
+            self._frame(room, event)['teams'].setdefault(team_id, {}).update(fields)
+        self._wake()
+
+    def solved(self, room, event, **notification):
+        """Add a correct-answer notification to the next frame"""
+        with self._lock:
+            frame = self._frame(room, event)
+            frame['solved_count'] += 1
+            if len(frame['solved']) < MAX_NOTIFICATIONS:
+                frame['solved'].append(notification)
+        self._wake()
+
+    def update(self, room, event, section, key, value):
+        """Set one entry of a keyed section of the next frame (e.g. one poll's results); the latest value wins"""
+        with self._lock:
+            self._frame(room, event).setdefault(section, {})[key] = value
+        self._wake()
+
+    def discard(self, room, event):
+        """Drop a room's pending frame (after a reset, so removed teams don't reappear)"""
+        with self._lock:
+            self._frames.pop((room, event), None)
+
+    def _wake(self):
+        if self.tick <= 0:
+            self.flush()
+        elif not self._started:
+            with self._lock:
+                if self._started:
+                    return
+                self._started = True
+            self.socketio.start_background_task(self._run)
+
+    def flush(self):
+        """Emit every pending frame now"""
+        with self._lock:
+            frames, self._frames = self._frames, {}
+            self._stats['frames'] += len(frames)
+        for (room, event), frame in frames.items():
+            frame['server_time'] = int(time.time() * 1000)
+            self.socketio.emit(event, frame, room=room)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.tick)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Trainer broadcast failed")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=len(self._frames), tick=self.tick)
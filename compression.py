@@ -0,0 +1,155 @@
+"""
+Response compression and fingerprinted static bundles
+Page CSS and JS live under static/ and are read, hashed and compressed once at startup; pages
+link them by content hash, so browsers keep them for good and an edited file gets a new URL.
+Dynamic HTML and JSON above a size threshold are gzip- or brotli-compressed per response.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import NamedTuple
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+DEFAULT_MIN_SIZE = 1024   # bytes; smaller bodies gain less than the framing costs
+
+# Response types worth compressing on the fly
+COMPRESSIBLE = ('text/html', 'application/json', 'text/javascript', 'text/css', 'text/plain', 'image/svg+xml')
+
+MIMETYPES = {
+    '.js': 'text/javascript',
+    '.css': 'text/css',
+}
+
+
+def available_encodings():
+    """Encodings this process can produce, in order of preference"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encodings, offered=None):
+    """Best encoding among `offered` (default: all available) that the client accepts, or None
+
+    `accept_encodings` is werkzeug's request.accept_encodings.
+    """
+    for encoding in available_encodings():
+        if (offered is None or encoding in offered) and accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding, best=False):
+    """Compress bytes; `best` trades CPU for size (for content compressed once, at startup)"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if best else 5)
+    return gzip.compress(data, compresslevel=9 if best else 6, mtime=0)
+
+
+class Bundle(NamedTuple):
+    """One static file with its precompressed variants"""
+    path: str        # relative to the static directory, '/'-separated
+    digest: str      # content hash, part of the URL
+    mimetype: str
+    variants: dict   # encoding (None for identity) -> bytes
+
+
+class StaticBundles:
+    """Every file under `directory`, fingerprinted and precompressed in memory
+
+    url(path) gives `/assets/<digest>/<path>`; a request for an older digest (a page rendered
+    before a redeploy) still gets the current file, just without the long cache lifetime.
+    """
+
+    def __init__(self, directory=STATIC_DIR, url_prefix='/assets'):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self.bundles = {}
+        self.load()
+
+    def load(self):
+        bundles = {}
+        for root, _, files in os.walk(self.directory):
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    data = f.read()
+                variants = {None: data}
+                for encoding in available_encodings():
+                    packed = compress(data, encoding, best=True)
+                    if len(packed) < len(data):
+                        variants[encoding] = packed
+                mimetype = (MIMETYPES.get(os.path.splitext(name)[1])
+                            or mimetypes.guess_type(name)[0] or 'application/octet-stream')
+                bundles[path] = Bundle(path, hashlib.sha256(data).hexdigest()[:12], mimetype, variants)
+        self.bundles = bundles
+
+    def url(self, path):
+        """Fingerprinted URL of a static file (KeyError for a file that doesn't exist)"""
+        return f'{self.url_prefix}/{self.bundles[path].digest}/{path}'
+
+    def get(self, path):
+        return self.bundles.get(path)
+
+    def stats(self):
+        totals = {'files': len(self.bundles), 'bytes': 0}
+        for bundle in self.bundles.values():
+            for encoding, data in bundle.variants.items():
+                key = 'bytes' if encoding is None else f'{encoding}_bytes'
+                totals[key] = totals.get(key, 0) + len(data)
+        return totals
+
+
+class Compressor:
+    """Compresses text responses of at least `min_size` bytes; call from an after_request hook
+
+    Streamed and file responses, and anything already encoded, pass through untouched. A
+    compressed response's ETag becomes weak, which If-None-Match still matches; responses that
+    need strong ETags (static bundles, round content) are precompressed by their routes instead.
+    """
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, mimetypes=COMPRESSIBLE):
+        self.min_size = min_size
+        self.mimetypes = frozenset(mimetypes)
+        self._lock = threading.Lock()
+        self._stats = {'responses': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def __call__(self, response, accept_encodings):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        packed = compress(data, encoding)
+        response.set_data(packed)
+        response.headers['Content-Encoding'] = encoding
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+        with self._lock:
+            self._stats['responses'] += 1
+            self._stats['bytes_in'] += len(data)
+            self._stats['bytes_out'] += len(packed)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
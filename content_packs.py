@@ -0,0 +1,254 @@
+"""
+Question content packs
+Each game's rounds live under content/<game>/ as one JSON file per round (YAML too, when PyYAML
+is installed). Packs are validated and compiled once into the question index, output matchers
+and per-round client payloads. Edited packs are recompiled and swapped in whole while the app
+keeps running; a pack that fails validation is reported and the previous bank stays live.
+
+    python content_packs.py                      validate every pack and time the compile
+    python content_packs.py --synthetic 5000     time a generated bank of that many questions
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+from typing import NamedTuple
+
+from question_bank import build_question_index, build_round_content, content_version
+
+try:
+    import yaml
+except ImportError:  # JSON packs only
+    yaml = None
+
+
+CONTENT_DIR = os.environ.get('CONTENT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content'))
+DEFAULT_RELOAD_INTERVAL = 2.0   # seconds between checks for edited packs
+
+PACK_SUFFIXES = ('.json', '.yaml', '.yml') if yaml is not None else ('.json',)
+PARSE_ERRORS = (OSError, ValueError) + ((yaml.YAMLError,) if yaml is not None else ())
+
+logger = logging.getLogger(__name__)
+
+
+class ContentPackError(ValueError):
+    """A pack that can't be read or doesn't match its game's schema"""
+
+
+class PackSchema(NamedTuple):
+    items_key: str        # 'questions' or 'challenges'
+    item_fields: dict     # required field -> type
+    hidden_fields: tuple  # left out of client payloads until a team has attempted the item
+
+
+ROUND_FIELDS = {'round': int, 'title': str, 'theme': str}
+OPTIONAL_ROUND_FIELDS = {'time_limit': int}
+
+SCHEMAS = {
+    'python': PackSchema('questions', {
+        'id': str, 'question': str, 'code_template': str, 'solution_code': str,
+        'expected_output': str, 'points': int
+    }, hidden_fields=('solution_code', 'expected_output')),
+    'prompt': PackSchema('challenges', {
+        'id': str, 'title': str, 'scenario': str, 'given_data': str,
+        'expected_output': str, 'hints': list, 'points': int
+    }, hidden_fields=('solution_code',)),
+}
+
+
+class CompiledBank(NamedTuple):
+    """One game's bank as served: replaced as a whole on reload, never modified"""
+    rounds: MappingProxyType    # round number -> round dict, as in the packs (without 'round')
+    index: MappingProxyType     # question ID -> QuestionRecord
+    content: MappingProxyType   # round number -> RoundContent
+    version: str                # changes whenever any client payload does
+    files: tuple                # (name, mtime_ns, size) of each pack it was built from
+
+
+def pack_files(directory):
+    """(name, mtime_ns, size) of every pack in a directory, sorted by name"""
+    if not os.path.isdir(directory):
+        return ()
+    files = []
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.name.endswith(PACK_SUFFIXES) and not entry.name.startswith('.'):
+            stat = entry.stat()
+            files.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(files))
+
+
+def read_pack(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            if path.endswith('.json'):
+                return json.load(f)
+            return yaml.safe_load(f)
+    except PARSE_ERRORS as e:
+        raise ContentPackError(f"{path}: {e}") from e
+
+
+def _check_fields(data, fields, where, optional=False):
+    for field, kind in fields.items():
+        if field not in data:
+            if optional:
+                continue
+            raise ContentPackError(f"{where}: missing '{field}'")
+        value = data[field]
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise ContentPackError(f"{where}: '{field}' should be {kind.__name__}, not {type(value).__name__}")
+
+
+def validate_pack(data, schema, path):
+    """Check one round's pack; returns (round number, round dict without 'round')"""
+    if not isinstance(data, dict):
+        raise ContentPackError(f"{path}: a pack is an object with one round")
+    _check_fields(data, ROUND_FIELDS, path)
+    _check_fields(data, OPTIONAL_ROUND_FIELDS, path, optional=True)
+    if data['round'] < 1:
+        raise ContentPackError(f"{path}: 'round' should be 1 or more")
+    items = data.get(schema.items_key)
+    if not isinstance(items, list) or not items:
+        raise ContentPackError(f"{path}: '{schema.items_key}' should be a non-empty list")
+    for position, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            raise ContentPackError(f"{path}: {schema.items_key} #{position} should be an object")
+        _check_fields(item, schema.item_fields, f"{path}: {item.get('id', f'{schema.items_key} #{position}')}")
+        if item['points'] < 0:
+            raise ContentPackError(f"{path}: {item['id']}: 'points' can't be negative")
+    round_data = {key: value for key, value in data.items() if key != 'round'}
+    return data['round'], round_data
+
+
+def compile_bank(directory, schema):
+    """Read, validate and compile every pack in a directory into a CompiledBank"""
+    files = pack_files(directory)
+    if not files:
+        raise ContentPackError(f"{directory}: no content packs ({', '.join(PACK_SUFFIXES)})")
+    rounds = {}
+    for name, _, _ in files:
+        path = os.path.join(directory, name)
+        round_num, round_data = validate_pack(read_pack(path), schema, path)
+        if round_num in rounds:
+            raise ContentPackError(f"{path}: round {round_num} is defined twice")
+        rounds[round_num] = round_data
+    rounds = dict(sorted(rounds.items()))
+    try:
+        index = build_question_index(rounds, schema.items_key)
+    except ValueError as e:
+        raise ContentPackError(f"{directory}: {e}") from e
+    content = build_round_content(rounds, schema.items_key, hidden_fields=schema.hidden_fields)
+    return CompiledBank(MappingProxyType(rounds), index, content, content_version(content), files)
+
+
+class QuestionBank:
+    """A game's compiled bank, recompiled when its packs change
+
+    `current` is swapped in a single assignment, so a request that reads it once sees either
+    the old bank or the new one, never a mix of the two.
+    """
+
+    def __init__(self, directory, schema):
+        self.directory = directory
+        self.schema = schema
+        self.current = compile_bank(directory, schema)   # a broken bank at startup is fatal
+        self.reloads = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+
+    def reload(self, force=False):
+        """Recompile if any pack was added, edited or removed; returns whether the bank changed"""
+        with self._lock:
+            return self._reload(force)
+
+    def _reload(self, force):
+        files = pack_files(self.directory)
+        if files == self.current.files and not force:
+            return False
+        try:
+            compiled = compile_bank(self.directory, self.schema)
+        except ContentPackError as e:
+            if str(e) != self.last_error:
+                logger.error("Keeping the previous question bank: %s", e)
+            self.last_error = str(e)
+            return False
+        self.last_error = None
+        if compiled.version == self.current.version and compiled.rounds == self.current.rounds:
+            self.current = compiled   # touched but unchanged: just remember the new file stamps
+            return False
+        self.current = compiled
+        self.reloads += 1
+        logger.info("Reloaded question bank %s (version %s)", self.directory, compiled.version)
+        return True
+
+    def stats(self):
+        return {
+            'rounds': len(self.current.rounds),
+            'questions': len(self.current.index),
+            'reloads': self.reloads,
+            'errors': int(self.last_error is not None)
+        }
+
+
+def watch(banks, socketio, on_reload, interval=DEFAULT_RELOAD_INTERVAL):
+    """Check every bank for edited packs each `interval` seconds; on_reload(game, bank) on a change"""
+    def run():
+        while True:
+            socketio.sleep(interval)
+            for game, bank in banks.items():
+                try:
+                    if bank.reload():
+                        on_reload(game, bank.current)
+                except Exception:
+                    logger.exception("Question bank reload failed")
+    socketio.start_background_task(run)
+
+
+def write_synthetic_packs(directory, game, questions, per_round=50):
+    """Generate a bank of `questions` valid items for load-time checks"""
+    schema = SCHEMAS[game]
+    os.makedirs(directory, exist_ok=True)
+    rounds = (questions + per_round - 1) // per_round
+    for round_num in range(1, rounds + 1):
+        items = []
+        for i in range(min(per_round, questions - (round_num - 1) * per_round)):
+            item = {field: [f'hint {i}'] if kind is list else 100 if kind is int else f'{field} {round_num}.{i}'
+                    for field, kind in schema.item_fields.items()}
+            item['id'] = f'{round_num}.{i + 1}'
+            item['expected_output'] = f'Total: ${round_num * 1000 + i:,}.00\nStatus: OK'
+            item['solution_code'] = (f'total = {round_num * 1000} + {i}\n'
+                                     f'print(f"Total: ${{total:,.2f}}")\nprint("Status: OK")')
+            items.append(item)
+        with open(os.path.join(directory, f'round-{round_num:03d}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'round': round_num, 'title': f'Round {round_num}', 'theme': 'Synthetic',
+                       schema.items_key: items}, f)
+
+
+if __name__ == '__main__':
+    if '--synthetic' in sys.argv:
+        count = int(sys.argv[sys.argv.index('--synthetic') + 1])
+        with tempfile.TemporaryDirectory() as directory:
+            write_synthetic_packs(directory, 'python', count)
+            started = time.perf_counter()
+            bank = compile_bank(directory, SCHEMAS['python'])
+            elapsed = time.perf_counter() - started
+        print(f"{len(bank.index)} questions in {len(bank.rounds)} packs compiled in {elapsed * 1000:.0f} ms")
+        sys.exit(0)
+
+    failed = False
+    for game, schema in SCHEMAS.items():
+        directory = os.path.join(CONTENT_DIR, game)
+        started = time.perf_counter()
+        try:
+            bank = compile_bank(directory, schema)
+        except ContentPackError as e:
+            print(f"{game}: {e}")
+            failed = True
+            continue
+        print(f"{game}: {len(bank.index)} items in {len(bank.rounds)} rounds, version {bank.version}, "
+              f"compiled in {(time.perf_counter() - started) * 1000:.1f} ms")
+    sys.exit(1 if failed else 0)
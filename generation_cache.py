@@ -0,0 +1,105 @@
+"""
+Code generation cache
+LRU + TTL cache of generated code keyed on (challenge ID, normalized prompt, model), with
+single-flight coalescing so identical concurrent requests share one upstream call
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from question_bank import WHITESPACE_PATTERN
+
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 900  # seconds
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace and case so trivially different prompts share a cache entry"""
+    return WHITESPACE_PATTERN.sub(' ', (prompt or '').strip()).lower()
+
+
+class _Flight:
+    """One in-progress computation that other callers can wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class GenerationCache:
+    """Thread-safe LRU cache with per-entry expiry and in-flight request coalescing"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key: (expires_at, value), least recently used first
+        self._inflight = {}            # key: _Flight
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """Return (value, status) where status is 'hit', 'coalesced' or 'miss'
+
+        On a miss `compute()` runs once; concurrent callers with the same key wait for
+        it instead of calling upstream themselves. The value is stored only if
+        `cacheable(value)` is true (default: always).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[1], 'hit'
+                del self._entries[key]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._stats['misses'] += 1
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, 'coalesced'
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if flight.error is None and (cacheable is None or cacheable(flight.value)):
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value, 'miss'
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters plus hit_rate (hits and coalesced waits over all lookups) for the trainer"""
+        with self._lock:
+            stats = dict(self._stats, size=len(self._entries), inflight=len(self._inflight))
+        lookups = stats['hits'] + stats['coalesced'] + stats['misses']
+        stats['hit_rate'] = round((stats['hits'] + stats['coalesced']) / lookups, 3) if lookups else 0.0
+        return stats
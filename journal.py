@@ -0,0 +1,286 @@
+"""
+Write-ahead journal for the in-memory store
+Every state change is appended to a journal file on local disk by one writer thread (written
+and fsynced in batches), and a compact snapshot of the whole store is written every few
+thousand changes. After a restart the store loads the latest snapshot and replays the journal
+written since, so a crash, a gunicorn restart or the dev server's reloader no longer wipes the
+session.
+
+Under gevent (wsgi.py) the writer and snapshot threads are greenlets, so their file writes,
+fsyncs and snapshot encoding run on the hub's threadpool (real OS threads) instead of
+stalling the event loop.
+"""
+
+import glob
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+
+DEFAULT_FSYNC_INTERVAL = 0.05    # seconds between fsyncs of the journal
+DEFAULT_SNAPSHOT_EVERY = 10000   # journal records between snapshots
+
+SNAPSHOT_CHUNK_DEPTH = 5         # snapshot, data, games, game, teams: one encode per team record
+
+logger = logging.getLogger(__name__)
+
+
+def _blocking(function, *args):
+    """Call function(*args) on a real OS thread if gevent has patched threading, else directly
+
+    Only the calling greenlet waits. `function` must not touch gevent or anything it patched
+    (locks, logging), only files and plain data.
+    """
+    monkey = sys.modules.get('gevent.monkey')
+    if monkey is not None and monkey.is_module_patched('threading'):
+        return sys.modules['gevent'].get_hub().threadpool.apply(function, args)
+    return function(*args)
+
+
+def _write_text(file, text):
+    file.write(text)
+    file.flush()
+
+
+def _write_json(file, value, depth):
+    """Write `value` as JSON, encoding dicts `depth` levels deep key by key
+
+    Each piece is one C-encoder call, so other threads (the event loop) get the GIL between
+    pieces instead of waiting for the whole snapshot to encode.
+    """
+    if depth <= 0 or not isinstance(value, dict):
+        file.write(json.dumps(value, separators=(',', ':')))
+        return
+    file.write('{')
+    for position, (key, item) in enumerate(value.items()):
+        file.write(f'{"," if position else ""}{json.dumps(str(key))}:')
+        _write_json(file, item, depth - 1)
+    file.write('}')
+
+
+class Journal:
+    """Append-only JSONL log of store writes in `directory`, with the latest snapshot beside it
+
+    Files:
+      snapshot.json          {'seq': n, 'data': ...}, replaced atomically
+      journal.jsonl          [seq, op, args, kwargs] per line, appended since the last rotation
+      journal-{seq}.jsonl    a segment rotated out for a snapshot, deleted once the snapshot is on disk
+
+    append() only queues a record. One writer thread owns the file: it writes whatever has
+    queued up in a single write (group commit), flushes it to the OS and fsyncs at most every
+    `fsync_interval` seconds, which bounds what a power loss can take. A record reaches the OS
+    within one batch, usually well under a millisecond; a hard kill of the process can lose
+    what is still queued, a clean exit (close()) writes it out.
+    """
+
+    def __init__(self, directory, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.seq = 0            # last sequence number handed out
+        self.written = 0        # last sequence number written to the OS
+        self.synced = 0         # last sequence number fsynced
+        self.batches = 0
+        self._lock = threading.Lock()
+        self._queued = threading.Condition(self._lock)    # the writer waits for work here
+        self._progress = threading.Condition(self._lock)  # sync() waits for the writer here
+        self._pending = []      # (seq, line) in sequence order; (seq, None) rotates after seq
+        self._sync_wanted = 0
+        self._closing = False
+        self._file = None
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _segments(self):
+        """Rotated journal segments, oldest first, then the live journal"""
+        rotated = glob.glob(self._path('journal-*.jsonl'))
+        rotated.sort(key=lambda path: int(os.path.basename(path)[len('journal-'):-len('.jsonl')]))
+        return rotated + [self._path('journal.jsonl')]
+
+    def recover(self):
+        """Return (snapshot data or None, [(op, args, kwargs)] written after it) and open for appending"""
+        snapshot, snapshot_seq = None, 0
+        if os.path.exists(self._path('snapshot.json')):
+            with open(self._path('snapshot.json'), encoding='utf-8') as f:
+                saved = json.load(f)
+            snapshot, snapshot_seq = saved['data'], saved['seq']
+
+        self.seq = snapshot_seq
+        tail = []
+        for path in self._segments():
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb+') as f:
+                end = 0
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Only the last record can be torn (by a crash mid-write); cut it off so
+                        # new records don't get appended to the fragment
+                        logger.warning("Dropping a torn journal record at the end of %s", path)
+                        f.truncate(end)
+                        break
+                    end += len(line)
+                    seq, op, args, kwargs = json.loads(line)
+                    if seq > snapshot_seq:
+                        tail.append((op, args, kwargs))
+                        self.seq = seq
+
+        self._file = open(self._path('journal.jsonl'), 'a', encoding='utf-8')
+        return snapshot, tail
+
+    def append(self, op, args, kwargs):
+        """Queue one record and return its sequence number; call in the order the changes were applied"""
+        line = json.dumps([op, args, kwargs], separators=(',', ':'))
+        with self._lock:
+            self.seq += 1
+            self._pending.append((self.seq, f'[{self.seq},{line[1:]}\n'))
+            self._wake_writer()
+            return self.seq
+
+    def mark_rotation(self):
+        """Queue a rotation right after the last record appended; returns that record's seq
+
+        Call while no changes are being applied, then snapshot the state as of that seq.
+        """
+        with self._lock:
+            self._pending.append((self.seq, None))
+            self._wake_writer()
+            return self.seq
+
+    def _wake_writer(self):
+        if self._writer is None and not self._closing:
+            self._writer = threading.Thread(target=self._write_loop, name='journal-writer', daemon=True)
+            self._writer.start()
+        self._queued.notify()
+
+    def sync(self):
+        """Write and fsync everything appended so far"""
+        with self._lock:
+            target = self._sync_wanted = self.seq
+            if self._writer is None:
+                return
+            self._queued.notify()
+            while self.synced < target and self._writer is not None:
+                self._progress.wait()
+
+    def _write_loop(self):
+        last_sync = time.monotonic()
+        while True:
+            with self._lock:
+                while not (self._pending or self._closing or self._sync_wanted > self.synced):
+                    if self.synced == self.written:
+                        self._queued.wait()
+                        continue
+                    # Written but not yet fsynced: sleep until the fsync is due
+                    due = last_sync + self.fsync_interval - time.monotonic()
+                    if due <= 0:
+                        break
+                    self._queued.wait(due)
+                batch, self._pending = self._pending, []
+                closing = self._closing
+
+            self._write(batch)
+
+            with self._lock:
+                target = self.written
+                fsync = self.synced < target and (
+                    closing or self._sync_wanted > self.synced
+                    or time.monotonic() - last_sync >= self.fsync_interval)
+            if fsync:
+                try:
+                    _blocking(os.fsync, self._file.fileno())
+                except OSError:
+                    logger.exception("Journal fsync failed")
+                last_sync = time.monotonic()
+
+            with self._lock:
+                if fsync:
+                    self.synced = max(self.synced, target)
+                self.batches += bool(batch)
+                self._progress.notify_all()
+                if closing and not self._pending:
+                    self._file.close()
+                    self._writer = None
+                    self._progress.notify_all()
+                    return
+
+    def _write(self, batch):
+        """Write queued records with one write() between rotation markers (group commit)"""
+        lines = []
+        for seq, line in batch:
+            if line is None:
+                self._flush(lines)
+                lines = []
+                self._rotate(seq)
+            else:
+                lines.append((seq, line))
+        self._flush(lines)
+
+    def _flush(self, lines):
+        if not lines:
+            return
+        try:
+            _blocking(_write_text, self._file, ''.join(line for _, line in lines))
+        except OSError:
+            logger.exception("Journal write failed; %d change(s) are only in memory", len(lines))
+        with self._lock:
+            self.written = lines[-1][0]
+
+    def _rotate(self, seq):
+        """Close the live journal as the segment ending at `seq` and start a new one"""
+        try:
+            _blocking(self._close_segment, seq)
+        except OSError:
+            logger.exception("Journal rotation failed")
+        self._file = open(self._path('journal.jsonl'), 'a', encoding='utf-8')
+        with self._lock:
+            self.written = max(self.written, seq)
+            self.synced = max(self.synced, seq)
+
+    def _close_segment(self, seq):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._path('journal.jsonl'), self._path(f'journal-{seq}.jsonl'))
+
+    def write_snapshot(self, seq, data):
+        """Atomically replace the snapshot with `data` (the state as of `seq`) and drop covered segments
+
+        `data` must not change while it is written (MemoryStore.dump() output doesn't).
+        """
+        _blocking(self._write_snapshot, seq, data)
+
+    def _write_snapshot(self, seq, data):
+        temp = self._path('snapshot.json.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            _write_json(f, {'seq': seq, 'saved_at': time.time(), 'data': data}, SNAPSHOT_CHUNK_DEPTH)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self._path('snapshot.json'))
+        if hasattr(os, 'O_DIRECTORY'):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        for path in self._segments()[:-1]:
+            if int(os.path.basename(path)[len('journal-'):-len('.jsonl')]) <= seq:
+                os.remove(path)
+
+    def close(self):
+        """Write and fsync whatever is queued, then close the journal"""
+        with self._lock:
+            self._closing = True
+            writer = self._writer
+            self._queued.notify()
+        if writer is not None:
+            writer.join(timeout=10)
+        elif self._file is not None and not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
@@ -0,0 +1,72 @@
+"""
+Incrementally maintained leaderboard
+Keeps teams ordered by score (highest first) then by when they reached that score (earliest first)
+"""
+
+import threading
+import time
+
+from sortedcontainers import SortedList
+
+
+class Leaderboard:
+    """Sorted index of team rankings with O(log n) updates, rank lookups and page reads
+
+    A page read slices only the requested entries under the lock, so a score
+    change never costs a copy of the whole board.
+    """
+
+    def __init__(self):
+        self._entries = SortedList()  # (-score, reached_at, team_id)
+        self._keys = {}               # team_id: entry in _entries
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, team_id):
+        return team_id in self._keys
+
+    def update(self, team_id, score, reached_at=None):
+        """Insert a team or move it to its new score"""
+        if reached_at is None:
+            reached_at = time.time()
+        with self._lock:
+            old = self._keys.get(team_id)
+            if old is not None:
+                if old[0] == -score:
+                    return
+                self._entries.remove(old)
+            entry = (-score, reached_at, team_id)
+            self._entries.add(entry)
+            self._keys[team_id] = entry
+
+    def remove(self, team_id):
+        with self._lock:
+            entry = self._keys.pop(team_id, None)
+            if entry is not None:
+                self._entries.remove(entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+
+    def entries(self):
+        """[(team_id, score, reached_at)] in rank order, to save the board and restore it with update()"""
+        with self._lock:
+            return [(team_id, -neg_score, reached_at) for neg_score, reached_at, team_id in self._entries]
+
+    def rank(self, team_id):
+        """1-based rank of a team, or None if it isn't on the board"""
+        with self._lock:
+            entry = self._keys.get(team_id)
+            if entry is None:
+                return None
+            return self._entries.index(entry) + 1
+
+    def top(self, limit=None, offset=0):
+        """Return [(team_id, score)] for one page of the leaderboard"""
+        stop = None if limit is None else offset + limit
+        with self._lock:
+            return [(team_id, -neg_score) for neg_score, _, team_id in self._entries.islice(offset, stop)]
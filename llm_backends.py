@@ -0,0 +1,211 @@
+"""
+Code generation backends
+Everything behind generate_code_from_prompt implements generate_text(system, messages, max_tokens, on_text).
+Besides the Claude API client there is a deterministic local stub and a record/replay pair,
+so the prompt challenge can be rehearsed and load-tested offline.
+
+LLM_BACKEND values:
+    anthropic                                   the Claude API (default)
+    stub://?latency_ms=800&jitter=0.4&error_rate=0.02&seed=1
+    record:///recordings.jsonl                  call the API and append every reply to the file
+    replay:///recordings.jsonl?fallback=stub    serve recorded replies, stub (or 503) for unknown prompts
+"""
+
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from llm_client import LLMBusy, LLMClient
+
+
+STREAM_CHUNK_CHARS = 12
+
+
+def request_key(model, system, messages, max_tokens):
+    """Stable digest of one generation request, used to find its recording"""
+    payload = json.dumps([model, system, messages, max_tokens], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _stream_out(text, on_text, duration):
+    """Hand text to on_text in small chunks spread over `duration` seconds"""
+    chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or ['']
+    pause = duration / len(chunks)
+    for chunk in chunks:
+        if pause > 0:
+            time.sleep(pause)
+        on_text(chunk)
+
+
+class _BackendStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0}
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] = self._stats.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class StubLLM:
+    """Deterministic local stand-in: same request, same code; latency and failures are simulated
+
+    Latency is log-normal around `latency_ms` (`jitter` is the spread; 0 = fixed), and
+    `error_rate` of calls fail with LLMBusy as an overloaded API would. When streaming,
+    `first_token` of the latency passes before the first chunk.
+    """
+
+    def __init__(self, model='stub', latency_ms=800, jitter=0.4, error_rate=0.0,
+                 first_token=0.3, seed=None):
+        self.model = model
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.first_token = first_token
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._stats = _BackendStats()
+
+    def _sample(self):
+        with self._random_lock:
+            failed = self._random.random() < self.error_rate
+            latency = self.latency_ms * (math.exp(self._random.gauss(0, self.jitter)) if self.jitter else 1)
+        return failed, latency / 1000
+
+    def reply_for(self, system, messages, max_tokens):
+        """The code the stub answers with (a fenced snippet, like the real model sometimes sends)"""
+        digest = request_key(self.model, system, messages, max_tokens)[:8]
+        return f"```python\n# stub reply {digest}\nresult = {int(digest, 16) % 1000}\nprint(f\"Result: {{result}}\")\n```"
+
+    def generate_text(self, system, messages, max_tokens=1024, on_text=None):
+        self._stats.count('calls')
+        failed, latency = self._sample()
+        if failed:
+            time.sleep(latency * self.first_token)
+            self._stats.count('failures')
+            raise LLMBusy("AI busy - please try again in a few seconds")
+
+        text = self.reply_for(system, messages, max_tokens)
+        if on_text is None:
+            time.sleep(latency)
+        else:
+            time.sleep(latency * self.first_token)
+            _stream_out(text, on_text, latency * (1 - self.first_token))
+        return text
+
+    def stats(self):
+        return dict(self._stats.snapshot(), backend='stub')
+
+
+class RecordingLLM:
+    """Pass-through to a real backend that appends every successful reply to a JSONL file"""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.model = backend.model
+        self.path = path
+        self._lock = threading.Lock()
+
+    def generate_text(self, system, messages, max_tokens=1024, on_text=None):
+        text = self.backend.generate_text(system, messages, max_tokens=max_tokens, on_text=on_text)
+        record = {
+            'key': request_key(self.model, system, messages, max_tokens),
+            'model': self.model,
+            'messages': messages,
+            'text': text,
+            'recorded_at': time.time()
+        }
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return text
+
+    def stats(self):
+        return dict(self.backend.stats(), backend='record', recording=self.path)
+
+
+class ReplayLLM:
+    """Serves replies captured by RecordingLLM; unknown requests go to `fallback` or fail with LLMBusy
+
+    Replies come back after `latency_ms` (streamed in chunks when asked), so a replay
+    keeps the timing shape of a real session without touching the network.
+    """
+
+    def __init__(self, path, model=None, fallback=None, latency_ms=0):
+        self.path = path
+        self.fallback = fallback
+        self.latency_ms = latency_ms
+        self._replies = {}
+        self.model = model
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self._replies[record['key']] = record['text']
+                    self.model = self.model or record.get('model')
+        self.model = self.model or 'replay'
+        self._stats = _BackendStats()
+
+    def generate_text(self, system, messages, max_tokens=1024, on_text=None):
+        text = self._replies.get(request_key(self.model, system, messages, max_tokens))
+        if text is None:
+            self._stats.count('misses')
+            if self.fallback is not None:
+                return self.fallback.generate_text(system, messages, max_tokens=max_tokens, on_text=on_text)
+            raise LLMBusy("No recorded reply for this prompt")
+
+        self._stats.count('calls')
+        latency = self.latency_ms / 1000
+        if on_text is None:
+            time.sleep(latency)
+        else:
+            _stream_out(text, on_text, latency)
+        return text
+
+    def stats(self):
+        return dict(self._stats.snapshot(), backend='replay', recordings=len(self._replies))
+
+
+def _options(query):
+    """Query-string options as numbers where they look like numbers"""
+    options = {}
+    for key, value in parse_qsl(query):
+        try:
+            options[key] = int(value)
+        except ValueError:
+            try:
+                options[key] = float(value)
+            except ValueError:
+                options[key] = value
+    return options
+
+
+def create_llm(url=None, **client_options):
+    """Build the backend named by an LLM_BACKEND URL; client_options go to LLMClient"""
+    url = url or os.environ.get('LLM_BACKEND', 'anthropic')
+    if url == 'anthropic':
+        return LLMClient(**client_options)
+
+    parts = urlsplit(url)
+    options = _options(parts.query)
+    path = parts.path[1:]  # like sqlite:///, three slashes for a relative path and four for an absolute one
+    if url == 'stub' or parts.scheme == 'stub':
+        return StubLLM(model=client_options.get('model', 'stub'), **options)
+    if parts.scheme == 'record':
+        return RecordingLLM(LLMClient(**client_options), path)
+    if parts.scheme == 'replay':
+        fallback = options.pop('fallback', None)
+        if fallback == 'stub':
+            fallback = StubLLM(model=client_options.get('model', 'stub'))
+        elif fallback is not None:
+            raise ValueError(f"Unknown replay fallback {fallback!r}")
+        return ReplayLLM(path, fallback=fallback, **options)
+    raise ValueError(f"Unknown LLM_BACKEND {url!r}")
@@ -0,0 +1,320 @@
+"""
+Shared Claude API client
+One process-wide Anthropic client with a pooled HTTP connection, per-call deadlines,
+jittered retries on 429/5xx and a circuit breaker that fails fast while the API is degraded
+"""
+
+import random
+import threading
+import time
+
+import anthropic
+
+
+DEFAULT_MODEL = "claude-sonnet-4-20250514"
+DEFAULT_TIMEOUT = 20             # seconds per call, across all retries
+DEFAULT_CONNECT_TIMEOUT = 5      # seconds to open a connection
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_BREAKER_THRESHOLD = 5    # consecutive failures that open the breaker
+DEFAULT_BREAKER_RESET = 30       # seconds before a trial call is let through
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8
+
+# The SDK re-exports its HTTP library's Timeout but not its Limits; take that class from the
+# SDK's default limits, so this keeps working whichever HTTP library the SDK is built on
+ConnectionLimits = type(anthropic.DEFAULT_CONNECTION_LIMITS)
+
+
+class LLMBusy(Exception):
+    """Raised when the breaker is open or the API stayed overloaded until the deadline"""
+
+
+def _is_retryable(error):
+    """Rate limits, overloads, server errors and network trouble are worth retrying"""
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def _retry_after(error):
+    """Seconds the API asked us to wait, if it said"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `reset_timeout`
+
+    While open every call is refused immediately; in half-open one trial call is
+    let through and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, reset_timeout=DEFAULT_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._stats = {'opened': 0, 'rejected': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """True if a call may go ahead now"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._stats['rejected'] += 1
+            return False
+
+    def retry_in(self):
+        """Seconds until the breaker lets a trial call through"""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                if self._opened_at is None:
+                    self._stats['opened'] += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """End a call whose outcome says nothing about the API, without changing the state"""
+        with self._lock:
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, state=self._state(), failures=self._failures)
+
+
+class LLMClient:
+    """Thread-safe wrapper that all code generation goes through
+
+    The underlying Anthropic client (and its connection pool) is created on first
+    use and then shared, so requests reuse warm TLS connections.
+    """
+
+    def __init__(self, model=DEFAULT_MODEL, timeout=DEFAULT_TIMEOUT,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 max_connections=DEFAULT_MAX_CONNECTIONS, breaker=None):
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'calls': 0, 'retries': 0, 'failures': 0, 'busy': 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    http_client = anthropic.DefaultHttpxClient(
+                        limits=ConnectionLimits(max_connections=self.max_connections,
+                                                max_keepalive_connections=self.max_connections,
+                                                keepalive_expiry=60),
+                        timeout=anthropic.Timeout(self.timeout, connect=self.connect_timeout)
+                    )
+                    # Retries are done here, inside the breaker and the call deadline
+                    self._client = anthropic.Anthropic(http_client=http_client, max_retries=0)
+        return self._client
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    def _with_retries(self, attempt, timeout=None):
+        """Run attempt(remaining_seconds) under the breaker, deadline and retry policy
+
+        `attempt` returns (result, retryable): retryable=False stops retrying even on a
+        retryable error (e.g. a stream that has already shown text to the team).
+        """
+        if not self.breaker.allow():
+            self._count('busy')
+            raise LLMBusy(f"AI busy - try again in {self.breaker.retry_in():.0f}s")
+
+        self._count('calls')
+        deadline = time.monotonic() + (timeout or self.timeout)
+        retries = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.breaker.record_failure()
+                self._count('failures')
+                raise LLMBusy("AI busy - please try again in a few seconds")
+            state = {'retryable': True}
+            try:
+                result = attempt(remaining, state)
+            except anthropic.APIError as e:
+                if not _is_retryable(e):
+                    # The request itself was bad; the API is fine
+                    self.breaker.record_success()
+                    raise
+                # Full jitter backoff, never past the deadline
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** retries))
+                delay = max(delay, _retry_after(e) or 0)
+                if not state['retryable'] or retries >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self.breaker.record_failure()
+                    self._count('failures')
+                    raise LLMBusy("AI busy - please try again in a few seconds") from e
+                retries += 1
+                self._count('retries')
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # Not the API's doing (e.g. on_text raised), but a half-open trial must not be
+                # left running or the breaker would refuse every call from now on
+                self.breaker.release()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def _timeout(self, remaining):
+        return anthropic.Timeout(remaining, connect=min(remaining, self.connect_timeout))
+
+    def create_message(self, system, messages, max_tokens=1024, timeout=None):
+        """messages.create() with deadline, retries and breaker; raises LLMBusy when degraded"""
+        def attempt(remaining, state):
+            return self.client.messages.create(
+                model=self.model,
+                max_tokens=max_tokens,
+                system=system,
+                messages=messages,
+                timeout=self._timeout(remaining)
+            )
+
+        return self._with_retries(attempt, timeout)
+
+    def stream_text(self, system, messages, on_text, max_tokens=1024, timeout=None):
+        """Stream a reply, calling on_text(chunk) as text arrives; returns the full text
+
+        Failures before the first chunk are retried like create_message(); once text
+        has been handed to on_text a failure is final.
+        """
+        def attempt(remaining, state):
+            parts = []
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=max_tokens,
+                system=system,
+                messages=messages,
+                timeout=self._timeout(remaining)
+            ) as stream:
+                for text in stream.text_stream:
+                    state['retryable'] = False
+                    parts.append(text)
+                    on_text(text)
+            return ''.join(parts)
+
+        return self._with_retries(attempt, timeout)
+
+    def generate_text(self, system, messages, max_tokens=1024, on_text=None):
+        """Reply text for one request, streamed through on_text(chunk) when given
+
+        This is the interface every code-generation backend implements (see llm_backends).
+        """
+        if on_text is None:
+            return self.create_message(system=system, messages=messages, max_tokens=max_tokens).content[0].text
+        return self.stream_text(system=system, messages=messages, on_text=on_text, max_tokens=max_tokens)
+
+    def stats(self):
+        """Call counters and breaker state for the trainer dashboard / metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['breaker'] = self.breaker.stats()
+        return stats
+
+
+FENCE_OPENERS = ("```python", "```")
+FENCE_CLOSER = "```"
+
+
+def strip_code_fences(text):
+    """Remove a markdown code fence the model wrapped its code in, if any"""
+    code = (text or '').strip()
+    for opener in FENCE_OPENERS:
+        if code.startswith(opener):
+            code = code[len(opener):]
+            break
+    if code.endswith(FENCE_CLOSER):
+        code = code[:-len(FENCE_CLOSER)]
+    return code.strip()
+
+
+class FenceStripper:
+    """Incremental strip_code_fences() for streamed text
+
+    feed() returns the part of each chunk that is safe to show: the opening fence
+    is dropped once it can be recognised, and trailing backticks/whitespace are held
+    back until more text proves they aren't the closing fence.
+    """
+
+    def __init__(self):
+        self._head = ''       # text before we know whether it opens with a fence
+        self._opened = False
+        self._started = False  # leading whitespace after the fence is skipped until code shows up
+        self._held = ''       # trailing text that might still be the closing fence
+
+    def feed(self, chunk):
+        if not self._opened:
+            self._head += chunk
+            head = self._head.lstrip()
+            undecided = any(opener.startswith(head) and opener != head for opener in FENCE_OPENERS)
+            if not head or (undecided and '\n' not in head):
+                return ''
+            for opener in FENCE_OPENERS:
+                if head.startswith(opener):
+                    head = head[len(opener):]
+                    break
+            self._opened = True
+            chunk = head
+
+        if not self._started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return ''
+            self._started = True
+
+        text = self._held + chunk
+        keep = len(text) - len(text.rstrip('` \t\r\n'))
+        self._held = text[len(text) - keep:] if keep else ''
+        return text[:len(text) - keep]
@@ -0,0 +1,180 @@
+"""
+Question bank index
+Compiles a round-keyed question bank (see content_packs.py) into frozen records keyed by question
+ID, and into the per-round JSON payloads the game pages fetch
+"""
+
+import hashlib
+import json
+import re
+from types import MappingProxyType
+from typing import NamedTuple, Optional
+
+from compression import available_encodings, compress
+
+
+NUMBER_PATTERN = re.compile(r'[\d,]+\.?\d*')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_output(output):
+    """Normalize output for comparison (strip whitespace, normalize newlines)"""
+    if output is None:
+        return ""
+    # Strip whitespace, normalize line endings to spaces, lowercase
+    text = str(output).strip()
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    return text.lower()
+
+
+def split_output_lines(output):
+    """Non-empty, stripped, lowercased lines of an output"""
+    return tuple(line.strip().lower() for line in (output or '').strip().split('\n') if line.strip())
+
+
+def parse_number(token):
+    """Float value of a NUMBER_PATTERN token ('1,234.50' -> 1234.5), or None"""
+    try:
+        return float(token.replace(',', '').rstrip('.'))
+    except ValueError:
+        return None
+
+
+class OutputMatcher:
+    """Flexible output comparison against one expected output, pre-processed once
+
+    Accepts an exact normalized match, containment either way, all expected
+    lines present, or the last number in each output within `tolerance`.
+    """
+
+    __slots__ = ('expected_output', 'expected_norm', 'expected_lines', 'expected_numbers',
+                 'expected_value', 'tolerance')
+
+    def __init__(self, expected_output, tolerance=1):
+        self.expected_output = expected_output or ''
+        self.expected_norm = normalize_output(self.expected_output)
+        self.expected_lines = split_output_lines(self.expected_output)
+        self.expected_numbers = tuple(NUMBER_PATTERN.findall(self.expected_output))
+        self.expected_value = parse_number(self.expected_numbers[-1]) if self.expected_numbers else None
+        self.tolerance = tolerance
+
+    def matches(self, user_output):
+        return self.match_rule(user_output) is not None
+
+    def match_rule(self, user_output):
+        """Name of the first rule that accepts an output ('exact', 'contains', 'contained',
+        'lines', 'all_lines', 'number'), or None if none does"""
+        if not user_output or not self.expected_output:
+            return None
+
+        user_norm = normalize_output(user_output)
+        expected_norm = self.expected_norm
+
+        # Exact match after normalization
+        if user_norm == expected_norm:
+            return 'exact'
+
+        # Check if expected output is contained in user output (or vice versa)
+        if expected_norm in user_norm:
+            return 'contains'
+        if user_norm in expected_norm:
+            return 'contained'
+
+        # For multi-line outputs, check if all expected lines are present
+        if self.expected_lines:
+            user_lines = split_output_lines(user_output)
+            if user_lines:
+                if self.expected_lines == user_lines:
+                    return 'lines'
+                if all(exp_line in user_norm for exp_line in self.expected_lines):
+                    return 'all_lines'
+
+        # Check if outputs contain the same key numbers
+        if self.expected_value is not None:
+            user_numbers = NUMBER_PATTERN.findall(user_output)
+            if user_numbers:
+                user_val = parse_number(user_numbers[-1])
+                if user_val is not None and abs(user_val - self.expected_value) < self.tolerance:
+                    return 'number'
+
+        return None
+
+    def grade_batch(self, outputs):
+        return [self.matches(output) for output in outputs]
+
+
+class QuestionRecord(NamedTuple):
+    """Immutable, pre-processed view of one question or prompt challenge"""
+    id: str
+    round: int
+    round_title: str
+    round_theme: str
+    time_limit: Optional[int]
+    points: int
+    expected_output: str
+    matcher: OutputMatcher
+    data: MappingProxyType  # the original question dict, read-only
+
+
+def build_question_index(bank, items_key):
+    """Map every question ID in a round-keyed bank to its QuestionRecord
+
+    `items_key` is 'questions' for the Python game and 'challenges' for the prompt game.
+    """
+    index = {}
+    for round_num, round_data in bank.items():
+        for item in round_data.get(items_key, []):
+            question_id = item['id']
+            if question_id in index:
+                raise ValueError(f"Duplicate question id {question_id!r} in round {round_num}")
+            expected_output = item.get('expected_output', '')
+            index[question_id] = QuestionRecord(
+                id=question_id,
+                round=round_num,
+                round_title=round_data.get('title', ''),
+                round_theme=round_data.get('theme', ''),
+                time_limit=round_data.get('time_limit'),
+                points=item.get('points', 0),
+                expected_output=expected_output,
+                matcher=OutputMatcher(expected_output),
+                data=MappingProxyType(item)
+            )
+    return MappingProxyType(index)
+
+
+class RoundContent(NamedTuple):
+    """One round's client payload, serialized and compressed once"""
+    body: bytes      # JSON
+    etag: str        # strong validator: changes whenever the body does
+    variants: dict   # encoding (None for identity) -> bytes
+
+
+def build_round_content(bank, items_key, hidden_fields=()):
+    """Map every round of a bank to its RoundContent, with `hidden_fields` left out of each item
+
+    Hidden fields (solutions) are only handed out per team, after an attempt.
+    """
+    content = {}
+    for round_num, round_data in bank.items():
+        payload = {key: value for key, value in round_data.items() if key != items_key}
+        payload['round'] = round_num
+        payload[items_key] = [{key: value for key, value in item.items() if key not in hidden_fields}
+                              for item in round_data.get(items_key, [])]
+        body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+        variants = {None: body}
+        for encoding in available_encodings():
+            packed = compress(body, encoding, best=True)
+            if len(packed) < len(body):
+                variants[encoding] = packed
+        content[round_num] = RoundContent(body, hashlib.sha256(body).hexdigest()[:32], variants)
+    return MappingProxyType(content)
+
+
+def content_version(*contents):
+    """Short hash over every round's ETag, for versioned (forever-cacheable) content URLs"""
+    digest = hashlib.sha256()
+    for content in contents:
+        for round_num in sorted(content):
+            digest.update(f"{round_num}:{content[round_num].etag}\n".encode())
+    return digest.hexdigest()[:12]
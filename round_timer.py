@@ -0,0 +1,165 @@
+"""
+Server-side round timers
+Each game's round clock is kept in its round state as banked running time plus the moment the
+current running stretch began, so every worker (and a restarted one) agrees on it and a pause
+really stops it. Clients get one anchor (deadline + server time) and count down locally; a
+background task fires the warning and round-end events, and late submissions are refused.
+"""
+
+import logging
+import time
+
+
+WARNINGS = (60, 10)   # seconds left when a warning event goes out
+SUBMIT_GRACE = 2      # seconds past the deadline a submission still counts (sent at 00:00, in flight)
+MAX_SLEEP = 1.0       # the loop re-reads round state at least this often
+
+logger = logging.getLogger(__name__)
+
+# Epoch seconds from the monotonic clock: aligned with wall time once, never jumps afterwards
+_EPOCH_OFFSET = time.time() - time.monotonic()
+
+
+def now():
+    return time.monotonic() + _EPOCH_OFFSET
+
+
+def elapsed(timer, at=None):
+    """Running seconds of a round timer, excluding paused time"""
+    if timer['resumed_at'] is None:
+        return timer['elapsed']
+    return timer['elapsed'] + (now() if at is None else at) - timer['resumed_at']
+
+
+def remaining(timer, at=None):
+    """Seconds left on a round timer"""
+    return max(0.0, timer['limit'] - elapsed(timer, at))
+
+
+def anchor(timer):
+    """What a client needs to run the countdown on its own: deadline and server time in epoch ms"""
+    t = now()
+    left = remaining(timer, t)
+    running = timer['resumed_at'] is not None and left > 0
+    return {
+        'round': timer['round'],
+        'time_limit': timer['limit'],
+        'remaining': round(left, 3),
+        'deadline': int((t + left) * 1000) if running else None,
+        'paused': timer['resumed_at'] is None and timer['ended_at'] is None,
+        'ended': timer['ended_at'] is not None,
+        'server_time': int(t * 1000)
+    }
+
+
+class RoundTimer:
+    """Round clocks for several games, with warning and round-end events fired once per round
+
+    Timers live in each game's 'round_timer' state field; transitions go through
+    store.compare_and_set_state, so with several workers only one of them fires each event.
+    on_warning(game, timer, seconds_left) and on_end(game, timer) do the broadcasting.
+    """
+
+    def __init__(self, store, socketio, games, on_warning, on_end, warnings=WARNINGS):
+        self.store = store
+        self.socketio = socketio
+        self.games = tuple(games)
+        self.on_warning = on_warning
+        self.on_end = on_end
+        self.warnings = tuple(sorted(warnings, reverse=True))
+        self._started = False
+
+    def get(self, game):
+        """The game's current timer (None before the first round), starting the loop if needed"""
+        timer = self.store.get_state(game)['round_timer']
+        if timer is not None and timer['ended_at'] is None:
+            self.ensure_running()
+        return timer
+
+    def start(self, game, round_num, limit, **state):
+        """Start a round's clock (extra state fields are set along with it); returns the timer"""
+        t = now()
+        timer = {
+            'round': round_num,
+            'limit': limit,
+            'started_at': t,
+            'elapsed': 0.0,
+            'resumed_at': t,
+            'ended_at': None,
+            'warned': [w for w in self.warnings if w >= limit]   # no warning louder than the round
+        }
+        self.store.set_state(game, round_timer=timer, game_paused=False, **state)
+        self.ensure_running()
+        return timer
+
+    def pause(self, game, paused):
+        """Stop or restart the clock, banking the running time; returns the timer (or None)"""
+        while True:
+            timer = self.store.get_state(game)['round_timer']
+            if timer is None or timer['ended_at'] is not None or (timer['resumed_at'] is None) == paused:
+                self.store.set_state(game, game_paused=paused)
+                return timer
+            t = now()
+            if paused:
+                updated = dict(timer, elapsed=elapsed(timer, t), resumed_at=None)
+            else:
+                updated = dict(timer, resumed_at=t)
+            if self.store.compare_and_set_state(game, {'round_timer': timer},
+                                                round_timer=updated, game_paused=paused):
+                self.ensure_running()
+                return updated
+
+    def reset(self, game, **state):
+        self.store.set_state(game, round_timer=None, game_paused=False, **state)
+
+    def closed(self, game):
+        """Why a submission can't be accepted right now (None if it can)"""
+        timer = self.store.get_state(game)['round_timer']
+        if timer is None:
+            return None
+        if timer['ended_at'] is not None:
+            late = now() - timer['ended_at']
+        else:
+            late = elapsed(timer) - timer['limit']
+        return 'Time is up for this round' if late > SUBMIT_GRACE else None
+
+    def ensure_running(self):
+        if not self._started:
+            self._started = True
+            self.socketio.start_background_task(self._run)
+
+    def tick(self):
+        """Fire any due warnings and round ends; returns seconds until the next one is due"""
+        next_due = MAX_SLEEP
+        for game in self.games:
+            timer = self.store.get_state(game)['round_timer']
+            if timer is None or timer['ended_at'] is not None or timer['resumed_at'] is None:
+                continue
+            t = now()
+            left = remaining(timer, t)
+            if left <= 0:
+                ended = dict(timer, elapsed=timer['limit'], resumed_at=None,
+                             ended_at=timer['resumed_at'] + timer['limit'] - timer['elapsed'])
+                if self.store.compare_and_set_state(game, {'round_timer': timer}, round_timer=ended):
+                    self.on_end(game, ended)
+                continue
+            crossed = [w for w in self.warnings if w not in timer['warned'] and left <= w]
+            if crossed:
+                # After a restart several may be due at once; only the most urgent is announced
+                warned = dict(timer, warned=timer['warned'] + crossed)
+                if self.store.compare_and_set_state(game, {'round_timer': timer}, round_timer=warned):
+                    self.on_warning(game, warned, min(crossed))
+                next_due = 0
+                continue
+            upcoming = [left - w for w in self.warnings if w not in timer['warned']]
+            next_due = min([next_due, left] + upcoming)
+        return next_due
+
+    def _run(self):
+        while True:
+            try:
+                wait = self.tick()
+            except Exception:
+                logger.exception("Round timer tick failed")
+                wait = MAX_SLEEP
+            self.socketio.sleep(max(0.05, wait))
@@ -0,0 +1,304 @@
+"""
+Sandboxed execution pool for server-side grading
+Runs submitted Python code in a warm pool of isolated worker processes (see sandbox_worker.py)
+with CPU, wall-clock and memory limits. Workers are fresh interpreters started with an empty
+environment, in empty directories of their own, as an unprivileged user when the app runs as
+root, and talk to the pool in size-capped JSON only.
+"""
+
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Pipe
+
+try:
+    import pwd
+except ImportError:  # Windows - workers run as the app's user
+    pwd = None
+
+
+DEFAULT_CPU_TIME_LIMIT = 2       # seconds of CPU per submission
+DEFAULT_WALL_TIME_LIMIT = 5      # seconds of wall clock per submission
+DEFAULT_MEMORY_LIMIT_MB = 256    # address space per worker
+DEFAULT_MAX_OUTPUT = 64 * 1024   # characters of stdout kept per submission
+DEFAULT_MAX_JOBS_PER_WORKER = 200
+DEFAULT_MAX_QUEUE = 512
+DEFAULT_USER = 'nobody'          # workers run as this user when the app runs as root
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py'), encoding='utf-8') as f:
+    WORKER_SOURCE = f.read()     # passed with -c, so the worker user needn't read the app's files
+
+# All a worker inherits: nothing from the app's environment (SECRET_KEY, API keys ...)
+WORKER_ENV = {'PATH': '/usr/bin:/bin', 'LANG': 'C.UTF-8'}
+
+
+class SandboxBusy(Exception):
+    """Raised when the pool queue is full or a worker could not be acquired in time"""
+
+
+class _Worker:
+    """Handle on one worker process: a fresh interpreter in an empty directory of its own"""
+
+    def __init__(self, memory_limit_mb, account):
+        self.workdir = tempfile.mkdtemp(prefix='kia-sandbox-')
+        self.conn, child_conn = Pipe()
+        options = {}
+        if account is not None:
+            os.chown(self.workdir, account.pw_uid, account.pw_gid)
+            options = {'user': account.pw_uid, 'group': account.pw_gid, 'extra_groups': []}
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, '-I', '-S', '-c', WORKER_SOURCE,
+                 str(child_conn.fileno()), str(memory_limit_mb or 0)],
+                env=WORKER_ENV, cwd=self.workdir, pass_fds=(child_conn.fileno(),),
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=True, **options)
+        except BaseException:
+            self.conn.close()
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            raise
+        finally:
+            child_conn.close()
+        self.jobs = 0
+
+    def send(self, code, cpu_time_limit, max_output):
+        self.conn.send_bytes(json.dumps({
+            'code': code, 'cpu_time_limit': cpu_time_limit, 'max_output': max_output
+        }).encode())
+
+    def receive(self, max_output):
+        """The worker's result, checked field by field: the worker runs untrusted code"""
+        result = json.loads(self.conn.recv_bytes(maxlength=max_output * 8 + 4096))
+        stdout, error, elapsed_ms = result['stdout'], result['error'], result['elapsed_ms']
+        if (not isinstance(stdout, str) or not isinstance(error, (str, type(None)))
+                or not isinstance(elapsed_ms, (int, float))):
+            raise ValueError("Malformed worker result")
+        return {
+            'success': error is None,
+            'stdout': stdout[:max_output],
+            'error': error,
+            'elapsed_ms': float(elapsed_ms)
+        }
+
+    def _close(self):
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def kill(self):
+        if self.process.poll() is None:
+            if hasattr(os, 'killpg'):
+                try:
+                    # The worker leads its own session: this also stops the child running the job
+                    os.killpg(self.process.pid, signal.SIGKILL)
+                except OSError:
+                    pass
+            self.process.kill()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            pass
+        self._close()
+
+    def stop(self):
+        try:
+            self.conn.send_bytes(b'null')
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.kill()
+        else:
+            self._close()
+
+
+class SandboxPool:
+    """Warm pool of worker processes that execute untrusted code with resource limits
+
+    Jobs wait for an idle worker; once more than `max_queue` jobs are waiting,
+    new jobs are rejected immediately with SandboxBusy so request threads
+    never pile up behind a saturated pool.
+
+    When the app runs as root, workers run as `user` (None keeps root: don't, outside tests).
+    """
+
+    def __init__(self, workers=None, cpu_time_limit=DEFAULT_CPU_TIME_LIMIT,
+                 wall_time_limit=DEFAULT_WALL_TIME_LIMIT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB,
+                 max_output=DEFAULT_MAX_OUTPUT, max_jobs_per_worker=DEFAULT_MAX_JOBS_PER_WORKER,
+                 max_queue=DEFAULT_MAX_QUEUE, queue_timeout=None, user=DEFAULT_USER):
+        self.size = workers or os.cpu_count() or 2
+        self.cpu_time_limit = cpu_time_limit
+        self.wall_time_limit = wall_time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.max_output = max_output
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout if queue_timeout is not None else wall_time_limit * 2
+        self.user = user
+        self._account = None
+        self._idle = []
+        self._cond = threading.Condition()
+        self._waiting = 0
+        self._started = False
+        self._stats = {'completed': 0, 'timeouts': 0, 'rejected': 0, 'recycled': 0}
+
+    def start(self):
+        """Start all workers up front so the first submissions don't pay start-up cost"""
+        with self._cond:
+            if self._started:
+                return self
+            if self.user and pwd is not None and os.geteuid() == 0:
+                try:
+                    self._account = pwd.getpwnam(self.user)
+                except KeyError:
+                    raise RuntimeError(f"Sandbox user {self.user!r} doesn't exist; "
+                                       "refusing to run submissions as root") from None
+            self._idle = [self._spawn() for _ in range(self.size)]
+            self._started = True
+        return self
+
+    def shutdown(self):
+        """Stop all idle workers (busy workers are stopped when they are released)"""
+        with self._cond:
+            self._started = False
+            workers, self._idle = self._idle, []
+            self._cond.notify_all()
+        for worker in workers:
+            worker.stop()
+
+    def _spawn(self):
+        try:
+            return _Worker(self.memory_limit_mb, self._account)
+        except PermissionError as e:
+            if self._account is None:
+                raise
+            raise RuntimeError(f"Sandbox user {self.user!r} can't start {sys.executable} ({e}); "
+                               "make the interpreter readable by it or pick another user") from e
+
+    def _acquire(self):
+        with self._cond:
+            if not self._started:
+                raise RuntimeError("SandboxPool is not running")
+            if not self._idle and self._waiting >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise SandboxBusy("Grading queue is full")
+            self._waiting += 1
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while not self._idle:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._started:
+                        self._stats['rejected'] += 1
+                        raise SandboxBusy("Timed out waiting for a grading worker")
+                    self._cond.wait(remaining)
+                return self._idle.pop()
+            finally:
+                self._waiting -= 1
+
+    def _release(self, worker, healthy):
+        recycle = not healthy or worker.jobs >= self.max_jobs_per_worker
+        if recycle:
+            if healthy:
+                worker.stop()
+            else:
+                worker.kill()
+            worker = self._spawn() if self._started else None
+        with self._cond:
+            if recycle:
+                self._stats['recycled'] += 1
+            if worker is not None:
+                if self._started:
+                    self._idle.append(worker)
+                    self._cond.notify()
+                else:
+                    worker.stop()
+
+    def run(self, code):
+        """Execute code in a worker and return {success, stdout, error, elapsed_ms}"""
+        worker = self._acquire()
+        healthy = False
+        try:
+            worker.jobs += 1
+            worker.send(code, self.cpu_time_limit, self.max_output)
+            if worker.conn.poll(self.wall_time_limit):
+                result = worker.receive(self.max_output)
+                healthy = True
+            else:
+                with self._cond:
+                    self._stats['timeouts'] += 1
+                result = {
+                    'success': False,
+                    'stdout': '',
+                    'error': f"Time limit exceeded ({self.wall_time_limit}s)",
+                    'elapsed_ms': self.wall_time_limit * 1000
+                }
+        except (EOFError, OSError, ValueError, KeyError):
+            # The worker died mid-job (e.g. the memory limit killed it) or sent back garbage
+            result = {
+                'success': False,
+                'stdout': '',
+                'error': "Execution crashed",
+                'elapsed_ms': 0
+            }
+        finally:
+            self._release(worker, healthy)
+
+        with self._cond:
+            self._stats['completed'] += 1
+        return result
+
+    def stats(self):
+        """Pool counters for the trainer dashboard / metrics"""
+        with self._cond:
+            return dict(self._stats,
+                        workers=self.size,
+                        idle=len(self._idle),
+                        queued=self._waiting)
+
+
+if __name__ == '__main__':
+    # Isolation, then throughput check: python sandbox.py [jobs] [threads]
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    sample = 'principal = 100000000\nrate = 0.08\nprint(f"Final Value: ${principal * (1 + rate) ** 5:.2f}")'
+
+    # A job that rewrites shared modules and classes must not change what later jobs print
+    tamper = ('import json, math, decimal, collections\n'
+              'json.dumps = lambda *args, **kwargs: \'{"stdout": "forged", "error": null, "elapsed_ms": 0}\'\n'
+              'math.sqrt = lambda x: 0\n'
+              'collections.Counter.most_common = lambda self, n=None: []\n'
+              'decimal.getcontext().prec = 2\n')
+    probe = ('import math, decimal, collections\n'
+             'print(math.sqrt(16), collections.Counter("aab").most_common(1), decimal.Decimal(1) / 3)')
+    pool = SandboxPool(workers=1).start()
+    before = pool.run(probe)
+    pool.run(tamper)
+    after = [pool.run(probe), pool.run(sample)]
+    pool.shutdown()
+    leaked = after[0] != dict(before, elapsed_ms=after[0]['elapsed_ms']) or 'Final Value' not in after[1]['stdout']
+    print(f"isolation: {'LEAKED ' + repr(after) if leaked else 'ok'}")
+    if leaked:
+        sys.exit(1)
+
+    pool = SandboxPool().start()
+    pool.run(sample)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(lambda _: pool.run(sample), range(jobs)))
+    elapsed = time.perf_counter() - started
+    pool.shutdown()
+
+    ok = sum(1 for r in results if r['success'])
+    print(f"{jobs} gradings in {elapsed:.2f}s on {pool.size} workers: "
+          f"{jobs / elapsed:.0f}/s ({ok} ok)")
@@ -0,0 +1,280 @@
+"""
+Sandbox worker process
+Started by sandbox.SandboxPool as a clean `python -I -S` interpreter: no inherited memory, an
+empty environment, an empty working directory and, when the app runs as root, an unprivileged
+user. It imports the allowed standard library modules, locks itself down, then runs each
+submission in a child forked for it, so nothing a submission changes (a module attribute, a
+class, the random state) is left for the next one. Standard library only; it is passed to the
+interpreter as source.
+
+Lock-down, outermost first:
+- rlimits: no new file descriptors (so no files, sockets or /proc), no file writes, caps on
+  CPU time and address space, and no child processes once a submission runs
+- imports limited to ALLOWED_MODULES, all loaded before file access is cut off
+- restricted builtins (no open, eval, exec, compile, input, globals, vars ...)
+- submissions may not touch underscore or frame/traceback attributes, the usual ways out of
+  restricted builtins
+
+The in-interpreter checks alone are not a security boundary; the rlimits and the clean,
+secret-free, unprivileged process are what keep a submission that gets past them contained.
+"""
+
+import ast
+import builtins
+import contextlib
+import gc
+import importlib
+import io
+import json
+import os
+import random
+import signal
+import sys
+import time
+from multiprocessing.connection import Connection
+
+try:
+    import resource
+except ImportError:  # Windows - limits are only enforced by the wall clock
+    resource = None
+
+
+WORKER_FD = 3   # the pool connection; 0-2 are /dev/null
+
+# Modules a submission may import (with their submodules). Left out on purpose: anything that
+# reaches the OS, and modules that look up attributes or evaluate strings on the caller's
+# behalf (operator.attrgetter, string.Formatter, typing.get_type_hints ...)
+ALLOWED_MODULES = (
+    'math', 'cmath', 'statistics', 'random', 'decimal', 'fractions', 'datetime', 'calendar',
+    'time', 'itertools', 'functools', 'collections', 'collections.abc', 'heapq', 'bisect',
+    'json', 're', 'textwrap', 'copy', 'pprint',
+)
+
+REMOVED_BUILTINS = (
+    'open', 'input', 'eval', 'exec', 'compile', 'breakpoint', 'help', 'globals', 'locals', 'vars',
+    'memoryview', 'exit', 'quit', 'copyright', 'credits', 'license',
+)
+
+SAFE_DUNDERS = frozenset({
+    '__name__', '__doc__', '__qualname__', '__init__', '__str__', '__repr__', '__len__',
+    '__iter__', '__next__', '__enter__', '__exit__', '__eq__', '__lt__', '__add__',
+})
+
+# Frame, code and traceback attributes lead back to the harness's globals and real builtins
+BLOCKED_ATTRIBUTES = frozenset({
+    'gi_frame', 'gi_code', 'gi_yieldfrom', 'cr_frame', 'cr_code', 'cr_await', 'ag_frame', 'ag_code',
+    'f_back', 'f_globals', 'f_locals', 'f_builtins', 'f_code', 'tb_frame', 'tb_next',
+})
+
+
+class _CpuLimitExceeded(BaseException):
+    """Raised when SIGXCPU fires (BaseException so user code can't swallow it)"""
+
+
+class _OutputLimitExceeded(BaseException):
+    """Raised when the submission prints too much"""
+
+
+class _CappedStringIO(io.StringIO):
+    """StringIO that stops the program once it has printed more than max_chars"""
+
+    def __init__(self, max_chars):
+        super().__init__()
+        self.max_chars = max_chars
+        self.size = 0
+
+    def write(self, s):
+        self.size += len(s)
+        if self.size > self.max_chars:
+            raise _OutputLimitExceeded()
+        return super().write(s)
+
+
+def _allowed_attribute(name):
+    return not (name in BLOCKED_ATTRIBUTES or (name.startswith('_') and name not in SAFE_DUNDERS))
+
+
+def check_source(tree):
+    """Reject attribute access (and dunder names) that could reach outside the restricted builtins"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and not _allowed_attribute(node.attr):
+            raise PermissionError(f"access to '.{node.attr}' is not allowed (line {node.lineno})")
+        if isinstance(node, ast.Name) and node.id.startswith('__') and node.id not in SAFE_DUNDERS:
+            raise PermissionError(f"'{node.id}' is not allowed (line {node.lineno})")
+
+
+def _guarded_import(name, globals=None, locals=None, fromlist=(), level=0):
+    if level or not any(name == allowed or name.startswith(f'{allowed}.') for allowed in ALLOWED_MODULES):
+        raise ImportError(f"import of '{name}' is not allowed")
+    for attribute in fromlist or ():
+        if attribute != '*' and not _allowed_attribute(attribute):
+            raise ImportError(f"import of '{name}.{attribute}' is not allowed")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+
+def _guarded_getattr(obj, name, *default):
+    if not _allowed_attribute(name):
+        raise PermissionError(f"access to '.{name}' is not allowed")
+    return getattr(obj, name, *default)
+
+
+def _guarded_hasattr(obj, name):
+    return _allowed_attribute(name) and hasattr(obj, name)
+
+
+def _guarded_setattr(obj, name, value):
+    if not _allowed_attribute(name):
+        raise PermissionError(f"access to '.{name}' is not allowed")
+    setattr(obj, name, value)
+
+
+def _guarded_delattr(obj, name):
+    if not _allowed_attribute(name):
+        raise PermissionError(f"access to '.{name}' is not allowed")
+    delattr(obj, name)
+
+
+def restricted_builtins():
+    names = {name: value for name, value in vars(builtins).items()
+             if name not in REMOVED_BUILTINS and not name.startswith('_')}
+    names.update(__import__=_guarded_import, __build_class__=builtins.__build_class__,
+                 getattr=_guarded_getattr, hasattr=_guarded_hasattr,
+                 setattr=_guarded_setattr, delattr=_guarded_delattr)
+    return names
+
+
+def _on_sigxcpu(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _set_cpu_limit(seconds):
+    """Set the soft CPU limit to `seconds` beyond what this worker has already used"""
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(used + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+def _clear_cpu_limit():
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def execute(code, cpu_time_limit, max_output, allowed_builtins):
+    """Execute code in a fresh namespace and capture its stdout"""
+    stdout = _CappedStringIO(max_output)
+    namespace = {'__name__': '__main__', '__builtins__': dict(allowed_builtins)}
+    error = None
+    started = time.perf_counter()
+
+    _set_cpu_limit(cpu_time_limit)
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            sys.stdin = io.StringIO()
+            tree = ast.parse(code, '<submission>')
+            check_source(tree)
+            exec(compile(tree, '<submission>', 'exec'), namespace)
+    except _CpuLimitExceeded:
+        error = f"CPU time limit exceeded ({cpu_time_limit}s)"
+    except _OutputLimitExceeded:
+        error = f"Output limit exceeded ({max_output} characters)"
+    except MemoryError:
+        error = "Memory limit exceeded"
+    except SystemExit:
+        pass
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        _clear_cpu_limit()
+        sys.stdin = sys.__stdin__
+
+    return {
+        'success': error is None,
+        'stdout': stdout.getvalue(),
+        'error': error,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def _setrlimit(limit, value):
+    try:
+        resource.setrlimit(limit, (value, value))
+    except (ValueError, OSError):
+        pass
+
+
+def lock_down(memory_limit_mb):
+    """Irreversibly cut this process off from files, sockets and child processes"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if resource is None:
+        return
+    signal.signal(signal.SIGXCPU, _on_sigxcpu)
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)   # writes fail with EFBIG instead
+    os.closerange(WORKER_FD + 1, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+    _setrlimit(resource.RLIMIT_NOFILE, WORKER_FD + 1)   # every descriptor slot is taken
+    _setrlimit(resource.RLIMIT_FSIZE, 0)
+    _setrlimit(resource.RLIMIT_CORE, 0)
+    if memory_limit_mb:
+        _setrlimit(resource.RLIMIT_AS, memory_limit_mb * 1024 * 1024)
+
+
+def run_job(conn, job, allowed_builtins):
+    """Run one job in a forked child that sends the result itself and exits; returns when it has"""
+    if not hasattr(os, 'fork'):   # Windows - jobs share the worker
+        conn.send_bytes(json.dumps(execute(
+            job['code'], job['cpu_time_limit'], job['max_output'], allowed_builtins)).encode())
+        return
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            if resource is not None:
+                _setrlimit(resource.RLIMIT_NPROC, 0)
+            random.seed()   # or every job would draw the same numbers
+            result = execute(job['code'], job['cpu_time_limit'], job['max_output'], allowed_builtins)
+            conn.send_bytes(json.dumps(result).encode())
+            status = 0
+        finally:
+            os._exit(status)
+    _, status = os.waitpid(pid, 0)
+    if status != 0:
+        # Killed before it could answer (e.g. by the hard CPU limit)
+        conn.send_bytes(json.dumps({
+            'success': False, 'stdout': '', 'error': "Execution crashed", 'elapsed_ms': 0
+        }).encode())
+
+
+def main(fd, memory_limit_mb):
+    """Worker loop: receive a JSON job {code, cpu_time_limit, max_output}, send back a JSON result"""
+    if fd != WORKER_FD:
+        os.dup2(fd, WORKER_FD)
+        os.close(fd)
+    conn = Connection(WORKER_FD)
+    for name in ALLOWED_MODULES:
+        importlib.import_module(name)
+    allowed_builtins = restricted_builtins()
+    lock_down(memory_limit_mb)
+    gc.freeze()   # keeps the collector from touching, and so copying, every page in each child
+
+    while True:
+        try:
+            job = json.loads(conn.recv_bytes())
+        except (EOFError, OSError, ValueError):
+            break
+        if job is None:
+            break
+        try:
+            run_job(conn, job, allowed_builtins)
+        except OSError:
+            break
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]), int(sys.argv[2]))
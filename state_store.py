@@ -0,0 +1,1155 @@
+"""
+Game state storage backends
+Every read and write of teams, scores, answers, polls and round state goes through a GameStore,
+so the state can live in-process (one worker) or in Redis / SQLite (shared by many workers).
+
+Games are namespaced by name ('python', 'prompt'); each has its own round state, teams and rankings.
+"""
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, parse_qsl
+
+from journal import Journal, DEFAULT_FSYNC_INTERVAL, DEFAULT_SNAPSHOT_EVERY
+from leaderboard import Leaderboard
+
+
+logger = logging.getLogger(__name__)
+
+
+# Round state fields and their values after a reset
+DEFAULT_ROUND_STATE = {
+    'current_round': 0,
+    'round_timer': None,
+    'game_started': False,
+    'game_paused': False,
+    'poll_active': False,
+    'active_poll': None,
+    'game_mode': 'speed',
+    'trainer_connected': False
+}
+
+
+class GameStore:
+    """Interface shared by all backends
+
+    Teams are returned as {'name', 'score', 'joined_at', 'version', 'answers'} where
+    answers maps question/challenge ID to the last recorded answer dict.
+    """
+
+    # ---- round state ----
+    def get_state(self, game):
+        """All round state fields for a game, plus its 'version'"""
+        raise NotImplementedError
+
+    def set_state(self, game, **fields):
+        raise NotImplementedError
+
+    def compare_and_set_state(self, game, expected, **fields):
+        """Set fields only if every field in `expected` still has that value; True if they were set"""
+        raise NotImplementedError
+
+    def bump_version(self, game):
+        """Atomically increment and return the game's broadcast version"""
+        raise NotImplementedError
+
+    # ---- teams ----
+    def add_team(self, game, team_id, name, joined_at):
+        raise NotImplementedError
+
+    def has_team(self, game, team_id):
+        raise NotImplementedError
+
+    def get_team(self, game, team_id):
+        """Team dict with answers, or None"""
+        raise NotImplementedError
+
+    def get_teams(self, game, team_ids):
+        """{team_id: team} for the given IDs that still exist"""
+        teams = {}
+        for team_id in team_ids:
+            team = self.get_team(game, team_id)
+            if team is not None:
+                teams[team_id] = team
+        return teams
+
+    def team_count(self, game):
+        raise NotImplementedError
+
+    def add_score(self, game, team_id, points):
+        """Atomically add points and re-rank the team; returns the new score"""
+        raise NotImplementedError
+
+    def get_answer(self, game, team_id, question_id):
+        raise NotImplementedError
+
+    def set_answer(self, game, team_id, question_id, answer):
+        raise NotImplementedError
+
+    def claim_solve(self, game, team_id, question_id):
+        """Mark a question solved; True only for the first caller, so points are awarded once"""
+        raise NotImplementedError
+
+    def record_attempt(self, game, team_id, question_id, answer):
+        """Atomically store an attempt as the answer unless the question is solved
+
+        The stored answer gets 'attempts': the count of attempts recorded so far, including this
+        one. Returns that count, or None (and stores nothing) once claim_solve has succeeded, so
+        a request racing the one that solved it can't overwrite the solved answer.
+        """
+        raise NotImplementedError
+
+    def bump_team_version(self, game, team_id):
+        raise NotImplementedError
+
+    # ---- rankings ----
+    def top(self, game, limit=None, offset=0):
+        """[(team_id, score)] ordered by score desc, then earliest to reach it"""
+        raise NotImplementedError
+
+    def rank(self, game, team_id):
+        """1-based rank, or None"""
+        raise NotImplementedError
+
+    # ---- polls ----
+    def create_poll(self, poll_id, question, options):
+        """Define (or redefine) a poll; it starts inactive with every count at zero"""
+        raise NotImplementedError
+
+    def get_poll(self, poll_id):
+        """{'question', 'options', 'active'}, or None"""
+        raise NotImplementedError
+
+    def list_polls(self):
+        """{poll_id: poll} for every defined poll"""
+        raise NotImplementedError
+
+    def set_poll_active(self, poll_id, active):
+        raise NotImplementedError
+
+    def delete_poll(self, poll_id):
+        raise NotImplementedError
+
+    def vote(self, poll_id, team_id, options):
+        """Replace a team's selection and return the poll's tally (None if there is no such poll)
+
+        Counters move by the difference between the team's previous and new selection,
+        so a vote costs the same however many teams have already voted.
+        """
+        raise NotImplementedError
+
+    def tally(self, poll_id):
+        """{'counts': {option: votes}, 'voters': teams that voted}, or None"""
+        raise NotImplementedError
+
+    def clear_votes(self, poll_id):
+        raise NotImplementedError
+
+    # ---- lifecycle ----
+    def reset(self, game):
+        """Drop every team, answer and ranking (round state is left to the caller)"""
+        raise NotImplementedError
+
+
+class _TeamSlot:
+    """Holder for one team's current record; writers swap in a new dict, readers take it lock-free"""
+
+    __slots__ = ('record', 'solved')
+
+    def __init__(self, record):
+        self.record = record
+        self.solved = set()  # question IDs already awarded, guarded by the team's stripe
+
+
+class _Poll:
+    """One poll's definition and running tally, guarded by its own lock"""
+
+    def __init__(self, question, options):
+        self.question = question
+        self.options = list(options)
+        self.active = False
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.counts = dict.fromkeys(self.options, 0)
+        self.selections = {}  # team_id: options
+
+    def info(self):
+        return {'question': self.question, 'options': list(self.options), 'active': self.active}
+
+    def tally(self):
+        return {'counts': dict(self.counts), 'voters': len(self.selections)}
+
+
+class MemoryStore(GameStore):
+    """In-process store (the default): fast, but only visible to one worker process
+
+    Concurrency model:
+      - Score, answer and version updates take one of LOCK_STRIPES locks chosen by
+        team, so submissions from different teams rarely contend.
+      - Team records are copy-on-write: a writer builds a new dict and swaps it into
+        the team's slot, so readers grab a consistent record without locking.
+      - Joins and resets replace the whole team mapping under the game lock, so a
+        reader holding the old mapping can never see it change size mid-iteration.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, lock_stripes=LOCK_STRIPES):
+        self._lock = threading.RLock()
+        self._stripes = [threading.Lock() for _ in range(lock_stripes)]
+        self._games = {}
+        self._polls = {}  # poll_id: _Poll
+
+    def _game(self, game):
+        data = self._games.get(game)
+        if data is None:
+            with self._lock:
+                data = self._games.get(game)
+                if data is None:
+                    data = self._games[game] = {
+                        'state': dict(DEFAULT_ROUND_STATE, version=0),
+                        'teams': {},  # team_id: _TeamSlot, replaced (never mutated) on join/reset
+                        'leaderboard': Leaderboard()
+                    }
+        return data
+
+    def _stripe(self, game, team_id):
+        return self._stripes[hash((game, team_id)) % len(self._stripes)]
+
+    def _update_team(self, game, team_id, **changes):
+        """Swap in a copy of the team's record with `changes` applied; returns it (None if gone)"""
+        slot = self._game(game)['teams'].get(team_id)
+        if slot is None:
+            return None
+        with self._stripe(game, team_id):
+            record = dict(slot.record)
+            for field, change in changes.items():
+                record[field] = change(record[field])
+            slot.record = record
+        return record
+
+    def get_state(self, game):
+        return dict(self._game(game)['state'])
+
+    def set_state(self, game, **fields):
+        data = self._game(game)
+        with self._lock:
+            data['state'] = dict(data['state'], **fields)
+
+    def compare_and_set_state(self, game, expected, **fields):
+        data = self._game(game)
+        with self._lock:
+            if any(data['state'][field] != value for field, value in expected.items()):
+                return False
+            data['state'] = dict(data['state'], **fields)
+            return True
+
+    def bump_version(self, game):
+        data = self._game(game)
+        with self._lock:
+            version = data['state']['version'] + 1
+            data['state'] = dict(data['state'], version=version)
+            return version
+
+    def add_team(self, game, team_id, name, joined_at):
+        data = self._game(game)
+        slot = _TeamSlot({
+            'name': name,
+            'score': 0,
+            'joined_at': joined_at,
+            'version': 0,
+            'answers': {}
+        })
+        with self._lock:
+            teams = dict(data['teams'])
+            teams[team_id] = slot
+            data['teams'] = teams
+            data['leaderboard'].update(team_id, 0)
+
+    def has_team(self, game, team_id):
+        return team_id is not None and team_id in self._game(game)['teams']
+
+    def get_team(self, game, team_id):
+        slot = self._game(game)['teams'].get(team_id)
+        return dict(slot.record) if slot is not None else None
+
+    def get_teams(self, game, team_ids):
+        teams = self._game(game)['teams']
+        return {team_id: dict(teams[team_id].record) for team_id in team_ids if team_id in teams}
+
+    def team_count(self, game):
+        return len(self._game(game)['teams'])
+
+    def add_score(self, game, team_id, points):
+        data = self._game(game)
+        slot = data['teams'].get(team_id)
+        if slot is None:
+            return None
+        # The leaderboard update stays inside the team's stripe so rankings apply in score order
+        with self._stripe(game, team_id):
+            score = slot.record['score'] + points
+            slot.record = dict(slot.record, score=score)
+            data['leaderboard'].update(team_id, score)
+        return score
+
+    def get_answer(self, game, team_id, question_id):
+        slot = self._game(game)['teams'].get(team_id)
+        return slot.record['answers'].get(question_id) if slot is not None else None
+
+    def set_answer(self, game, team_id, question_id, answer):
+        self._update_team(game, team_id, answers=lambda answers: dict(answers, **{question_id: answer}))
+
+    def claim_solve(self, game, team_id, question_id):
+        slot = self._game(game)['teams'].get(team_id)
+        if slot is None:
+            return False
+        with self._stripe(game, team_id):
+            if question_id in slot.solved:
+                return False
+            slot.solved.add(question_id)
+            return True
+
+    def record_attempt(self, game, team_id, question_id, answer):
+        slot = self._game(game)['teams'].get(team_id)
+        if slot is None:
+            return None
+        with self._stripe(game, team_id):
+            if question_id in slot.solved:
+                return None
+            answers = slot.record['answers']
+            attempts = (answers.get(question_id) or {}).get('attempts', 0) + 1
+            slot.record = dict(slot.record, answers=dict(answers, **{question_id: dict(answer, attempts=attempts)}))
+        return attempts
+
+    def bump_team_version(self, game, team_id):
+        record = self._update_team(game, team_id, version=lambda version: version + 1)
+        return record['version'] if record is not None else None
+
+    def top(self, game, limit=None, offset=0):
+        return self._game(game)['leaderboard'].top(limit, offset)
+
+    def rank(self, game, team_id):
+        return self._game(game)['leaderboard'].rank(team_id)
+
+    def create_poll(self, poll_id, question, options):
+        with self._lock:
+            self._polls[poll_id] = _Poll(question, options)
+
+    def get_poll(self, poll_id):
+        poll = self._polls.get(poll_id)
+        return poll.info() if poll is not None else None
+
+    def list_polls(self):
+        return {poll_id: poll.info() for poll_id, poll in list(self._polls.items())}
+
+    def set_poll_active(self, poll_id, active):
+        poll = self._polls.get(poll_id)
+        if poll is not None:
+            poll.active = active
+
+    def delete_poll(self, poll_id):
+        with self._lock:
+            self._polls.pop(poll_id, None)
+
+    def vote(self, poll_id, team_id, options):
+        poll = self._polls.get(poll_id)
+        if poll is None:
+            return None
+        with poll.lock:
+            for option in poll.selections.get(team_id, ()):
+                poll.counts[option] -= 1
+            poll.selections[team_id] = list(options)
+            for option in options:
+                poll.counts[option] += 1
+            return poll.tally()
+
+    def tally(self, poll_id):
+        poll = self._polls.get(poll_id)
+        if poll is None:
+            return None
+        with poll.lock:
+            return poll.tally()
+
+    def clear_votes(self, poll_id):
+        poll = self._polls.get(poll_id)
+        if poll is not None:
+            with poll.lock:
+                poll.clear()
+
+    def reset(self, game):
+        data = self._game(game)
+        with self._lock:
+            data['teams'] = {}
+            data['leaderboard'].clear()
+
+    def dump(self):
+        """The whole store as JSON-ready data, for load()
+
+        Records are copy-on-write, so the result stays consistent after the caller stops writers.
+        """
+        games = {}
+        for game, data in list(self._games.items()):
+            games[game] = {
+                'state': data['state'],
+                'teams': {team_id: dict(slot.record, solved=sorted(slot.solved))
+                          for team_id, slot in data['teams'].items()},
+                'ranking': data['leaderboard'].entries()
+            }
+        polls = {}
+        for poll_id, poll in list(self._polls.items()):
+            with poll.lock:
+                polls[poll_id] = dict(poll.info(), counts=dict(poll.counts), selections=dict(poll.selections))
+        return {'games': games, 'polls': polls}
+
+    def load(self, dump):
+        """Replace everything in the store with the output of dump()"""
+        with self._lock:
+            self._games = {}
+            for game, saved in dump['games'].items():
+                data = self._game(game)
+                data['state'] = dict(DEFAULT_ROUND_STATE, **saved['state'])
+                teams = {}
+                for team_id, record in saved['teams'].items():
+                    record = dict(record)
+                    slot = teams[team_id] = _TeamSlot(record)
+                    slot.solved = set(record.pop('solved'))
+                data['teams'] = teams
+                for team_id, score, reached_at in saved['ranking']:
+                    data['leaderboard'].update(team_id, score, reached_at)
+
+            self._polls = {}
+            for poll_id, saved in dump['polls'].items():
+                poll = self._polls[poll_id] = _Poll(saved['question'], saved['options'])
+                poll.active = saved['active']
+                poll.counts = dict(saved['counts'])
+                poll.selections = dict(saved['selections'])
+
+
+def _journaled(name, key):
+    """MemoryStore method `name`, applied and journaled as one step under its key's journal lock
+
+    `key` maps the call's arguments to what the change touches (a team, a game's round state,
+    a poll), or None for changes to a game's whole team list. Changes under different keys
+    commute, so only changes under the same key need to reach the journal in the order they
+    were applied.
+    """
+    apply = getattr(MemoryStore, name)
+
+    def write(self, *args, **kwargs):
+        with self._journal_lock(key(*args, **kwargs)):
+            result = apply(self, *args, **kwargs)
+            self.journal.append(name, args, kwargs)
+        self._changed()
+        return result
+
+    write.__name__ = name
+    write.__doc__ = apply.__doc__ or getattr(GameStore, name).__doc__
+    return write
+
+
+def _team_key(game, team_id, *args, **kwargs):
+    return (game, team_id)
+
+
+def _state_key(game, *args, **kwargs):
+    return ('state', game)
+
+
+def _poll_key(poll_id, *args, **kwargs):
+    return ('poll', poll_id)
+
+
+def _all_teams_key(*args, **kwargs):
+    return None
+
+
+class JournaledStore(MemoryStore):
+    """MemoryStore that journals every change to local disk and recovers it after a restart (one worker)
+
+    A change is applied and queued for the journal under a lock striped by what it touches,
+    the same way MemoryStore stripes its own locks, so submissions from different teams don't
+    wait on each other; one writer thread group-commits the queue to disk (see Journal). Joins
+    and resets, which change a game's whole team list, take every stripe. Reads are unaffected.
+
+    A snapshot replaces the journal every `snapshot_every` changes, which bounds recovery to
+    one snapshot load plus a short replay. It is taken on a background thread: all stripes are
+    held only while dump() copies references to the copy-on-write records, and serializing and
+    writing happen after they are released.
+    """
+
+    WRITES = {
+        'set_state': _state_key, 'compare_and_set_state': _state_key, 'bump_version': _state_key,
+        'add_team': _all_teams_key, 'reset': _all_teams_key,
+        'add_score': _team_key, 'set_answer': _team_key, 'claim_solve': _team_key,
+        'record_attempt': _team_key, 'bump_team_version': _team_key,
+        'create_poll': _poll_key, 'set_poll_active': _poll_key, 'delete_poll': _poll_key,
+        'vote': _poll_key, 'clear_votes': _poll_key,
+    }
+
+    def __init__(self, directory, fsync_ms=DEFAULT_FSYNC_INTERVAL * 1000, snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        super().__init__()
+        self.journal = Journal(directory, fsync_interval=fsync_ms / 1000)
+        self.snapshot_every = snapshot_every
+        self._journal_stripes = [threading.Lock() for _ in range(len(self._stripes))]
+        self._counter_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self.snapshots = 0
+
+        started = time.perf_counter()
+        snapshot, tail = self.journal.recover()
+        if snapshot is not None:
+            self.load(snapshot)
+        for op, args, kwargs in tail:
+            getattr(MemoryStore, op)(self, *args, **kwargs)
+        self._since_snapshot = len(tail)
+        self.recovery = {
+            'snapshot': snapshot is not None,
+            'replayed': len(tail),
+            'seconds': round(time.perf_counter() - started, 3)
+        }
+        atexit.register(self.journal.close)
+
+    @contextlib.contextmanager
+    def _journal_lock(self, key):
+        if key is not None:
+            with self._journal_stripes[hash(key) % len(self._journal_stripes)]:
+                yield
+            return
+        with contextlib.ExitStack() as stack:
+            for lock in self._journal_stripes:   # always in the same order
+                stack.enter_context(lock)
+            yield
+
+    def _changed(self):
+        with self._counter_lock:
+            self._since_snapshot += 1
+            due = self._since_snapshot >= self.snapshot_every and not self._snapshot_lock.locked()
+        if due:
+            threading.Thread(target=self.snapshot, name='journal-snapshot', daemon=True).start()
+
+    def stats(self):
+        return {
+            'seq': self.journal.seq,
+            'since_snapshot': self._since_snapshot,
+            'snapshots': self.snapshots,
+            'write_batches': self.journal.batches,
+            'recovered_changes': self.recovery['replayed'],
+            'recovery_seconds': self.recovery['seconds']
+        }
+
+    def snapshot(self):
+        """Write a snapshot of the current state and retire the journal it covers"""
+        if not self._snapshot_lock.acquire(blocking=False):
+            return  # another thread is already writing one
+        try:
+            with self._journal_lock(None):
+                data = self.dump()
+                seq = self.journal.mark_rotation()
+                with self._counter_lock:
+                    self._since_snapshot = 0
+            self.journal.write_snapshot(seq, data)
+            self.snapshots += 1
+        except Exception:
+            logger.exception("Snapshot failed; the journal still holds every change")
+        finally:
+            self._snapshot_lock.release()
+
+
+for _name, _key in JournaledStore.WRITES.items():
+    setattr(JournaledStore, _name, _journaled(_name, _key))
+del _name, _key
+
+
+def _ranking_score(score, reached_at):
+    """Single float that sorts ascending by score desc, then reached_at asc (for Redis sorted sets)"""
+    return -score * 1e10 + reached_at
+
+
+# record_attempt for Redis: check the solved set and update the answer in one atomic step
+# KEYS: solved set, the team's answers hash; ARGV: "team_id|question_id", question_id, answer JSON
+_RECORD_ATTEMPT_SCRIPT = """
+if redis.call('SISMEMBER', KEYS[1], ARGV[1]) == 1 then
+    return false
+end
+local previous = redis.call('HGET', KEYS[2], ARGV[2])
+local attempts = 1
+if previous then
+    attempts = (cjson.decode(previous)['attempts'] or 0) + 1
+end
+local answer = cjson.decode(ARGV[3])
+answer['attempts'] = attempts
+redis.call('HSET', KEYS[2], ARGV[2], cjson.encode(answer))
+return attempts
+"""
+
+
+class RedisStore(GameStore):
+    """Shared store on any Redis-protocol server, so every worker sees the same game
+
+    Keys (prefix defaults to 'kia'):
+      {p}:{game}:state          hash of JSON-encoded round state fields (+ 'version' counter)
+      {p}:{game}:team:{id}      hash name/score/joined_at/version
+      {p}:{game}:answers:{id}   hash question_id -> JSON answer
+      {p}:{game}:solved         set of "team_id|question_id"
+      {p}:{game}:ranking        sorted set team_id -> _ranking_score
+      {p}:polls                 set of poll IDs
+      {p}:poll:{id}             hash question / JSON options / JSON active
+      {p}:poll:{id}:votes       hash team_id -> JSON options
+      {p}:poll:{id}:counts      hash option -> votes
+    """
+
+    def __init__(self, url=None, client=None, prefix='kia'):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("STATE_BACKEND=redis:// needs the 'redis' package (pip install redis)")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self.redis = client
+        self.prefix = prefix
+        self._record_attempt = client.register_script(_RECORD_ATTEMPT_SCRIPT)
+
+    def _key(self, game, *parts):
+        return ':'.join((self.prefix, game) + parts)
+
+    @staticmethod
+    def _decode(value):
+        return value.decode() if isinstance(value, bytes) else value
+
+    def get_state(self, game):
+        raw = self.redis.hgetall(self._key(game, 'state'))
+        state = dict(DEFAULT_ROUND_STATE, version=0)
+        for field, value in raw.items():
+            field = self._decode(field)
+            state[field] = int(value) if field == 'version' else json.loads(value)
+        return state
+
+    def set_state(self, game, **fields):
+        if fields:
+            self.redis.hset(self._key(game, 'state'),
+                            mapping={k: json.dumps(v) for k, v in fields.items()})
+
+    def compare_and_set_state(self, game, expected, **fields):
+        key = self._key(game, 'state')
+        swapped = []
+
+        def swap(pipe):
+            current = pipe.hmget(key, list(expected))
+            swapped.clear()
+            if any((json.loads(raw) if raw is not None else DEFAULT_ROUND_STATE.get(field)) != value
+                   for field, value, raw in zip(expected, expected.values(), current)):
+                return
+            pipe.multi()
+            pipe.hset(key, mapping={k: json.dumps(v) for k, v in fields.items()})
+            swapped.append(True)
+
+        self.redis.transaction(swap, key)
+        return bool(swapped)
+
+    def bump_version(self, game):
+        return self.redis.hincrby(self._key(game, 'state'), 'version', 1)
+
+    def add_team(self, game, team_id, name, joined_at):
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key(game, 'team', team_id),
+                  mapping={'name': name, 'score': 0, 'joined_at': joined_at, 'version': 0})
+        pipe.zadd(self._key(game, 'ranking'), {team_id: _ranking_score(0, time.time())})
+        pipe.execute()
+
+    def has_team(self, game, team_id):
+        return team_id is not None and bool(self.redis.exists(self._key(game, 'team', team_id)))
+
+    def get_team(self, game, team_id):
+        pipe = self.redis.pipeline()
+        pipe.hgetall(self._key(game, 'team', team_id))
+        pipe.hgetall(self._key(game, 'answers', team_id))
+        return self._team_from_hashes(*pipe.execute())
+
+    def _team_from_hashes(self, raw, answers):
+        if not raw:
+            return None
+        raw = {self._decode(k): self._decode(v) for k, v in raw.items()}
+        return {
+            'name': raw['name'],
+            'score': int(raw['score']),
+            'joined_at': raw['joined_at'],
+            'version': int(raw['version']),
+            'answers': {self._decode(k): json.loads(v) for k, v in answers.items()}
+        }
+
+    def get_teams(self, game, team_ids):
+        team_ids = list(team_ids)
+        pipe = self.redis.pipeline()
+        for team_id in team_ids:
+            pipe.hgetall(self._key(game, 'team', team_id))
+            pipe.hgetall(self._key(game, 'answers', team_id))
+        results = pipe.execute()
+        teams = {}
+        for i, team_id in enumerate(team_ids):
+            team = self._team_from_hashes(results[2 * i], results[2 * i + 1])
+            if team is not None:
+                teams[team_id] = team
+        return teams
+
+    def team_count(self, game):
+        return self.redis.zcard(self._key(game, 'ranking'))
+
+    def add_score(self, game, team_id, points):
+        score = self.redis.hincrby(self._key(game, 'team', team_id), 'score', points)
+        # LT keeps the ranking on the highest score even if concurrent updates land out of order
+        self.redis.zadd(self._key(game, 'ranking'), {team_id: _ranking_score(score, time.time())}, lt=True)
+        return score
+
+    def get_answer(self, game, team_id, question_id):
+        value = self.redis.hget(self._key(game, 'answers', team_id), question_id)
+        return json.loads(value) if value is not None else None
+
+    def set_answer(self, game, team_id, question_id, answer):
+        self.redis.hset(self._key(game, 'answers', team_id), question_id, json.dumps(answer))
+
+    def claim_solve(self, game, team_id, question_id):
+        return bool(self.redis.sadd(self._key(game, 'solved'), f"{team_id}|{question_id}"))
+
+    def record_attempt(self, game, team_id, question_id, answer):
+        attempts = self._record_attempt(
+            keys=[self._key(game, 'solved'), self._key(game, 'answers', team_id)],
+            args=[f"{team_id}|{question_id}", question_id, json.dumps(answer)])
+        return int(attempts) if attempts is not None else None
+
+    def bump_team_version(self, game, team_id):
+        return self.redis.hincrby(self._key(game, 'team', team_id), 'version', 1)
+
+    def top(self, game, limit=None, offset=0):
+        stop = -1 if limit is None else offset + limit - 1
+        if limit == 0:
+            return []
+        team_ids = [self._decode(t) for t in self.redis.zrange(self._key(game, 'ranking'), offset, stop)]
+        if not team_ids:
+            return []
+        pipe = self.redis.pipeline()
+        for team_id in team_ids:
+            pipe.hget(self._key(game, 'team', team_id), 'score')
+        scores = pipe.execute()
+        return [(team_id, int(score)) for team_id, score in zip(team_ids, scores) if score is not None]
+
+    def rank(self, game, team_id):
+        position = self.redis.zrank(self._key(game, 'ranking'), team_id)
+        return None if position is None else position + 1
+
+    def _poll_key(self, poll_id, *parts):
+        return ':'.join((self.prefix, 'poll', poll_id) + parts)
+
+    def _poll_from_hash(self, raw):
+        if not raw:
+            return None
+        raw = {self._decode(k): self._decode(v) for k, v in raw.items()}
+        return {'question': raw['question'], 'options': json.loads(raw['options']),
+                'active': json.loads(raw['active'])}
+
+    def _tally_from(self, options, counts, voters):
+        counts = {self._decode(k): int(v) for k, v in counts.items()}
+        return {'counts': {option: counts.get(option, 0) for option in options}, 'voters': voters}
+
+    def create_poll(self, poll_id, question, options):
+        pipe = self.redis.pipeline()
+        pipe.delete(self._poll_key(poll_id), self._poll_key(poll_id, 'votes'), self._poll_key(poll_id, 'counts'))
+        pipe.hset(self._poll_key(poll_id), mapping={
+            'question': question, 'options': json.dumps(list(options)), 'active': json.dumps(False)})
+        pipe.sadd(f"{self.prefix}:polls", poll_id)
+        pipe.execute()
+
+    def get_poll(self, poll_id):
+        return self._poll_from_hash(self.redis.hgetall(self._poll_key(poll_id)))
+
+    def list_polls(self):
+        poll_ids = sorted(self._decode(p) for p in self.redis.smembers(f"{self.prefix}:polls"))
+        pipe = self.redis.pipeline()
+        for poll_id in poll_ids:
+            pipe.hgetall(self._poll_key(poll_id))
+        polls = {poll_id: self._poll_from_hash(raw) for poll_id, raw in zip(poll_ids, pipe.execute())}
+        return {poll_id: poll for poll_id, poll in polls.items() if poll is not None}
+
+    def set_poll_active(self, poll_id, active):
+        if self.redis.exists(self._poll_key(poll_id)):
+            self.redis.hset(self._poll_key(poll_id), 'active', json.dumps(active))
+
+    def delete_poll(self, poll_id):
+        pipe = self.redis.pipeline()
+        pipe.delete(self._poll_key(poll_id), self._poll_key(poll_id, 'votes'), self._poll_key(poll_id, 'counts'))
+        pipe.srem(f"{self.prefix}:polls", poll_id)
+        pipe.execute()
+
+    def vote(self, poll_id, team_id, options):
+        poll_options = self.redis.hget(self._poll_key(poll_id), 'options')
+        if poll_options is None:
+            return None
+        votes_key, counts_key = self._poll_key(poll_id, 'votes'), self._poll_key(poll_id, 'counts')
+
+        def swap_selection(pipe):
+            # Runs under WATCH on the poll's votes, so a concurrent vote makes this one retry
+            previous = pipe.hget(votes_key, team_id)
+            previous = json.loads(previous) if previous is not None else []
+            pipe.multi()
+            pipe.hset(votes_key, team_id, json.dumps(list(options)))
+            for option in previous:
+                pipe.hincrby(counts_key, option, -1)
+            for option in options:
+                pipe.hincrby(counts_key, option, 1)
+            pipe.hgetall(counts_key)
+            pipe.hlen(votes_key)
+
+        replies = self.redis.transaction(swap_selection, votes_key)
+        return self._tally_from(json.loads(poll_options), replies[-2], replies[-1])
+
+    def tally(self, poll_id):
+        pipe = self.redis.pipeline()
+        pipe.hget(self._poll_key(poll_id), 'options')
+        pipe.hgetall(self._poll_key(poll_id, 'counts'))
+        pipe.hlen(self._poll_key(poll_id, 'votes'))
+        options, counts, voters = pipe.execute()
+        return self._tally_from(json.loads(options), counts, voters) if options is not None else None
+
+    def clear_votes(self, poll_id):
+        self.redis.delete(self._poll_key(poll_id, 'votes'), self._poll_key(poll_id, 'counts'))
+
+    def reset(self, game):
+        team_ids = [self._decode(t) for t in self.redis.zrange(self._key(game, 'ranking'), 0, -1)]
+        pipe = self.redis.pipeline()
+        for team_id in team_ids:
+            pipe.delete(self._key(game, 'team', team_id), self._key(game, 'answers', team_id))
+        pipe.delete(self._key(game, 'ranking'), self._key(game, 'solved'))
+        pipe.execute()
+
+
+class SQLiteStore(GameStore):
+    """Shared store in a local SQLite file, for several workers on one host without Redis"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS state (
+            game TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL,
+            PRIMARY KEY (game, field));
+        CREATE TABLE IF NOT EXISTS teams (
+            game TEXT NOT NULL, team_id TEXT NOT NULL, name TEXT NOT NULL,
+            score INTEGER NOT NULL DEFAULT 0, reached_at REAL NOT NULL,
+            joined_at TEXT NOT NULL, version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (game, team_id));
+        CREATE INDEX IF NOT EXISTS teams_ranking ON teams (game, score DESC, reached_at);
+        CREATE TABLE IF NOT EXISTS answers (
+            game TEXT NOT NULL, team_id TEXT NOT NULL, question_id TEXT NOT NULL,
+            answer TEXT, solved INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (game, team_id, question_id));
+        CREATE TABLE IF NOT EXISTS polls (
+            poll_id TEXT PRIMARY KEY, question TEXT NOT NULL, options TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS poll_votes (
+            poll_id TEXT NOT NULL, team_id TEXT NOT NULL, options TEXT NOT NULL,
+            PRIMARY KEY (poll_id, team_id));
+        CREATE TABLE IF NOT EXISTS poll_counts (
+            poll_id TEXT NOT NULL, option TEXT NOT NULL, votes INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (poll_id, option));
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self.db.executescript(self.SCHEMA)
+
+    @property
+    def db(self):
+        # One connection per thread; WAL lets readers run alongside a writer
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+        return db
+
+    @contextlib.contextmanager
+    def _tx(self):
+        """Write transaction that takes the database lock up front"""
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def get_state(self, game):
+        state = dict(DEFAULT_ROUND_STATE, version=0)
+        for field, value in self.db.execute('SELECT field, value FROM state WHERE game = ?', (game,)):
+            state[field] = json.loads(value)
+        return state
+
+    def set_state(self, game, **fields):
+        with self._tx() as db:
+            db.executemany('INSERT OR REPLACE INTO state (game, field, value) VALUES (?, ?, ?)',
+                           [(game, k, json.dumps(v)) for k, v in fields.items()])
+
+    def compare_and_set_state(self, game, expected, **fields):
+        with self._tx() as db:
+            for field, value in expected.items():
+                row = db.execute('SELECT value FROM state WHERE game = ? AND field = ?', (game, field)).fetchone()
+                if (json.loads(row[0]) if row else DEFAULT_ROUND_STATE.get(field)) != value:
+                    return False
+            db.executemany('INSERT OR REPLACE INTO state (game, field, value) VALUES (?, ?, ?)',
+                           [(game, k, json.dumps(v)) for k, v in fields.items()])
+            return True
+
+    def bump_version(self, game):
+        with self._tx() as db:
+            row = db.execute("SELECT value FROM state WHERE game = ? AND field = 'version'", (game,)).fetchone()
+            version = (json.loads(row[0]) if row else 0) + 1
+            db.execute("INSERT OR REPLACE INTO state (game, field, value) VALUES (?, 'version', ?)",
+                       (game, json.dumps(version)))
+            return version
+
+    def add_team(self, game, team_id, name, joined_at):
+        with self._tx() as db:
+            db.execute('INSERT OR REPLACE INTO teams (game, team_id, name, score, reached_at, joined_at, version) '
+                       'VALUES (?, ?, ?, 0, ?, ?, 0)', (game, team_id, name, time.time(), joined_at))
+
+    def has_team(self, game, team_id):
+        return team_id is not None and self.db.execute(
+            'SELECT 1 FROM teams WHERE game = ? AND team_id = ?', (game, team_id)).fetchone() is not None
+
+    def get_team(self, game, team_id):
+        row = self.db.execute('SELECT name, score, joined_at, version FROM teams WHERE game = ? AND team_id = ?',
+                              (game, team_id)).fetchone()
+        if row is None:
+            return None
+        answers = self.db.execute('SELECT question_id, answer FROM answers '
+                                  'WHERE game = ? AND team_id = ? AND answer IS NOT NULL', (game, team_id))
+        return {
+            'name': row[0],
+            'score': row[1],
+            'joined_at': row[2],
+            'version': row[3],
+            'answers': {question_id: json.loads(answer) for question_id, answer in answers}
+        }
+
+    def team_count(self, game):
+        return self.db.execute('SELECT COUNT(*) FROM teams WHERE game = ?', (game,)).fetchone()[0]
+
+    def add_score(self, game, team_id, points):
+        with self._tx() as db:
+            db.execute('UPDATE teams SET score = score + ?, reached_at = ? WHERE game = ? AND team_id = ?',
+                       (points, time.time(), game, team_id))
+            return db.execute('SELECT score FROM teams WHERE game = ? AND team_id = ?',
+                              (game, team_id)).fetchone()[0]
+
+    def get_answer(self, game, team_id, question_id):
+        row = self.db.execute('SELECT answer FROM answers WHERE game = ? AND team_id = ? AND question_id = ?',
+                              (game, team_id, question_id)).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def set_answer(self, game, team_id, question_id, answer):
+        with self._tx() as db:
+            db.execute('INSERT INTO answers (game, team_id, question_id, answer) VALUES (?, ?, ?, ?) '
+                       'ON CONFLICT (game, team_id, question_id) DO UPDATE SET answer = excluded.answer',
+                       (game, team_id, question_id, json.dumps(answer)))
+
+    def claim_solve(self, game, team_id, question_id):
+        with self._tx() as db:
+            db.execute('INSERT OR IGNORE INTO answers (game, team_id, question_id) VALUES (?, ?, ?)',
+                       (game, team_id, question_id))
+            cursor = db.execute('UPDATE answers SET solved = 1 '
+                                'WHERE game = ? AND team_id = ? AND question_id = ? AND solved = 0',
+                                (game, team_id, question_id))
+            return cursor.rowcount == 1
+
+    def record_attempt(self, game, team_id, question_id, answer):
+        with self._tx() as db:
+            row = db.execute('SELECT answer, solved FROM answers WHERE game = ? AND team_id = ? AND question_id = ?',
+                             (game, team_id, question_id)).fetchone()
+            if row is not None and row[1]:
+                return None
+            attempts = (json.loads(row[0]).get('attempts', 0) if row and row[0] is not None else 0) + 1
+            db.execute('INSERT INTO answers (game, team_id, question_id, answer) VALUES (?, ?, ?, ?) '
+                       'ON CONFLICT (game, team_id, question_id) DO UPDATE SET answer = excluded.answer',
+                       (game, team_id, question_id, json.dumps(dict(answer, attempts=attempts))))
+            return attempts
+
+    def bump_team_version(self, game, team_id):
+        with self._tx() as db:
+            db.execute('UPDATE teams SET version = version + 1 WHERE game = ? AND team_id = ?', (game, team_id))
+            return db.execute('SELECT version FROM teams WHERE game = ? AND team_id = ?',
+                              (game, team_id)).fetchone()[0]
+
+    def top(self, game, limit=None, offset=0):
+        rows = self.db.execute('SELECT team_id, score FROM teams WHERE game = ? '
+                               'ORDER BY score DESC, reached_at LIMIT ? OFFSET ?',
+                               (game, -1 if limit is None else limit, offset))
+        return [(team_id, score) for team_id, score in rows]
+
+    def rank(self, game, team_id):
+        row = self.db.execute('SELECT score, reached_at FROM teams WHERE game = ? AND team_id = ?',
+                              (game, team_id)).fetchone()
+        if row is None:
+            return None
+        ahead = self.db.execute('SELECT COUNT(*) FROM teams WHERE game = ? AND '
+                                '(score > ? OR (score = ? AND reached_at < ?))',
+                                (game, row[0], row[0], row[1])).fetchone()[0]
+        return ahead + 1
+
+    def create_poll(self, poll_id, question, options):
+        with self._tx() as db:
+            self._delete_poll(db, poll_id)
+            db.execute('INSERT INTO polls (poll_id, question, options) VALUES (?, ?, ?)',
+                       (poll_id, question, json.dumps(list(options))))
+            db.executemany('INSERT INTO poll_counts (poll_id, option) VALUES (?, ?)',
+                           [(poll_id, option) for option in options])
+
+    def get_poll(self, poll_id):
+        row = self.db.execute('SELECT question, options, active FROM polls WHERE poll_id = ?', (poll_id,)).fetchone()
+        return {'question': row[0], 'options': json.loads(row[1]), 'active': bool(row[2])} if row else None
+
+    def list_polls(self):
+        rows = self.db.execute('SELECT poll_id, question, options, active FROM polls ORDER BY poll_id')
+        return {poll_id: {'question': question, 'options': json.loads(options), 'active': bool(active)}
+                for poll_id, question, options, active in rows}
+
+    def set_poll_active(self, poll_id, active):
+        with self._tx() as db:
+            db.execute('UPDATE polls SET active = ? WHERE poll_id = ?', (int(active), poll_id))
+
+    @staticmethod
+    def _delete_poll(db, poll_id):
+        for table in ('polls', 'poll_votes', 'poll_counts'):
+            db.execute(f'DELETE FROM {table} WHERE poll_id = ?', (poll_id,))
+
+    def delete_poll(self, poll_id):
+        with self._tx() as db:
+            self._delete_poll(db, poll_id)
+
+    def _tally(self, db, poll_id):
+        row = db.execute('SELECT options FROM polls WHERE poll_id = ?', (poll_id,)).fetchone()
+        if row is None:
+            return None
+        counts = dict(db.execute('SELECT option, votes FROM poll_counts WHERE poll_id = ?', (poll_id,)))
+        voters = db.execute('SELECT COUNT(*) FROM poll_votes WHERE poll_id = ?', (poll_id,)).fetchone()[0]
+        return {'counts': {option: counts.get(option, 0) for option in json.loads(row[0])}, 'voters': voters}
+
+    def vote(self, poll_id, team_id, options):
+        with self._tx() as db:
+            if db.execute('SELECT 1 FROM polls WHERE poll_id = ?', (poll_id,)).fetchone() is None:
+                return None
+            row = db.execute('SELECT options FROM poll_votes WHERE poll_id = ? AND team_id = ?',
+                             (poll_id, team_id)).fetchone()
+            changes = [(-1, option) for option in (json.loads(row[0]) if row else [])]
+            changes += [(1, option) for option in options]
+            db.execute('INSERT OR REPLACE INTO poll_votes (poll_id, team_id, options) VALUES (?, ?, ?)',
+                       (poll_id, team_id, json.dumps(list(options))))
+            db.executemany('UPDATE poll_counts SET votes = votes + ? WHERE poll_id = ? AND option = ?',
+                           [(change, poll_id, option) for change, option in changes])
+            return self._tally(db, poll_id)
+
+    def tally(self, poll_id):
+        return self._tally(self.db, poll_id)
+
+    def clear_votes(self, poll_id):
+        with self._tx() as db:
+            db.execute('DELETE FROM poll_votes WHERE poll_id = ?', (poll_id,))
+            db.execute('UPDATE poll_counts SET votes = 0 WHERE poll_id = ?', (poll_id,))
+
+    def reset(self, game):
+        with self._tx() as db:
+            db.execute('DELETE FROM teams WHERE game = ?', (game,))
+            db.execute('DELETE FROM answers WHERE game = ?', (game,))
+
+
+def create_store(url=None):
+    """Build a store from a STATE_BACKEND URL: 'memory' (default), 'journal:///dir', 'redis://...', or 'sqlite:///path.db'"""
+    url = url or os.environ.get('STATE_BACKEND', 'memory')
+    if url == 'memory':
+        return MemoryStore()
+    if url.startswith('journal:///'):
+        parts = urlsplit(url)
+        options = {key: float(value) if key == 'fsync_ms' else int(value) for key, value in parse_qsl(parts.query)}
+        return JournaledStore(parts.path[1:], **options)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url)
+    if url.startswith('sqlite:///'):
+        return SQLiteStore(url[len('sqlite:///'):])
+    raise ValueError(f"Unknown STATE_BACKEND {url!r}")
+
+
+if __name__ == '__main__':
+    # Stress check: python state_store.py [threads] [submissions] [STATE_BACKEND]
+    import random
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    submissions = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    store = create_store(sys.argv[3] if len(sys.argv) > 3 else 'memory')
+    teams = [f"T{i:04d}" for i in range(200)]
+    questions = [f"q{i}" for i in range(100)]
+    options = [f"option {i}" for i in range(5)]
+    store.reset('stress')
+    store.create_poll('stress', 'Stress poll', options)
+    for team_id in teams:
+        store.add_team('stress', team_id, team_id, '')
+
+    def submit(_):
+        team_id, question_id = random.choice(teams), random.choice(questions)
+        if store.claim_solve('stress', team_id, question_id):
+            store.add_score('stress', team_id, 10)
+            store.set_answer('stress', team_id, question_id, {'correct': True, 'points': 10})
+            store.bump_team_version('stress', team_id)
+            return 10
+        return 0
+
+    def vote(_):
+        store.vote('stress', random.choice(teams), random.sample(options, random.randint(1, 3)))
+
+    def read(_):
+        ranking = store.top('stress', 50)
+        store.get_teams('stress', [team_id for team_id, _ in ranking])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        readers = executor.map(read, range(submissions // 10))
+        votes = executor.map(vote, range(submissions // 10))
+        awarded = sum(executor.map(submit, range(submissions)))
+        list(readers)
+        list(votes)
+    elapsed = time.perf_counter() - started
+
+    recorded = store.get_teams('stress', teams)
+    total = sum(team['score'] for team in recorded.values())
+    answered = sum(10 * len(team['answers']) for team in recorded.values())
+    ranking = dict(store.top('stress'))
+    lost = awarded - total
+    misranked = sum(1 for team_id, team in recorded.items() if ranking.get(team_id) != team['score'])
+    # Every team re-votes for the first two options: any count the storm left wrong stays wrong
+    for team_id in teams:
+        store.vote('stress', team_id, options[:2])
+    tally = store.tally('stress')
+    expected = dict.fromkeys(options, 0)
+    expected.update(dict.fromkeys(options[:2], tally['voters']))
+    drifted = sum(abs(tally['counts'][option] - expected[option]) for option in options)
+    if isinstance(store, JournaledStore):
+        # Recover a second copy from the journal and compare it with the live one
+        store.journal.sync()
+        recovered = create_store(sys.argv[3])
+        drifted += recovered.tally('stress') != tally
+        lost += sum(1 for team_id, team in recovered.get_teams('stress', teams).items() if team != recorded[team_id])
+        print(f"recovered from journal in {recovered.recovery['seconds']}s "
+              f"({recovered.recovery['replayed']} changes replayed after the snapshot)")
+    store.reset('stress')
+    store.delete_poll('stress')
+    print(f"{submissions} submissions on {threads} threads in {elapsed:.2f}s: "
+          f"{awarded} points awarded, {total} recorded, {answered} in answers, "
+          f"{lost} lost, {misranked} misranked, {drifted} poll votes drifted")
+    sys.exit(1 if lost or misranked or drifted or answered != total else 0)
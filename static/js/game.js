@@ -0,0 +1,646 @@
+// Utility function to escape HTML
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Socket connection - transports come from SOCKETIO_TRANSPORTS (WebSocket first by default)
+const socket = io({
+    transports: SOCKETIO_TRANSPORTS,
+    reconnection: true,
+    reconnectionAttempts: 5,
+    reconnectionDelay: 2000
+});
+
+// Some venue networks block WebSockets - fall back to long-polling and upgrade later
+socket.on('connect_error', function() {
+    if (socket.io.opts.transports[0] === 'websocket') {
+        socket.io.opts.transports = ['polling', 'websocket'];
+    }
+    console.log('Socket connection error, will resync on reconnect');
+});
+
+socket.on('connect', function() {
+    console.log('Socket connected!', socket.id);
+    socket.emit('join_team_room', { team_id: teamId });
+    // We may have missed deltas while disconnected
+    if (stateVersion !== null) resyncGameState();
+});
+
+// Versioned state: every broadcast event carries `v` and every team delta `tv`.
+// Deltas arrive in order, so a gap means we missed one and need a single resync.
+let stateVersion = null;
+let teamVersion = null;
+let resyncing = false;
+let currentPoll = null;  // the poll shown in the overlay
+
+function acceptStateVersion(v) {
+    if (v === undefined || stateVersion === null) {
+        if (v !== undefined) stateVersion = v;
+        return true;
+    }
+    if (v <= stateVersion) return false;  // already applied by a resync
+    if (v !== stateVersion + 1) {
+        resyncGameState();
+        return false;
+    }
+    stateVersion = v;
+    return true;
+}
+
+async function resyncGameState() {
+    if (resyncing) return;
+    resyncing = true;
+    try {
+        const response = await fetch('/api/game_state');
+        const data = await response.json();
+        stateVersion = data.version;
+        teamVersion = data.team_version;
+
+        answeredQuestions = data.your_answers || {};
+        totalScore = data.your_score;
+        document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+
+        // Check if round changed
+        if (data.current_round > 0 && data.current_round !== currentRound && data.game_started) {
+            currentRound = data.current_round;
+            document.getElementById('waitingScreen').style.display = 'none';
+            document.getElementById('gameContent').style.display = 'block';
+            loadRound(data.current_round);
+        }
+        if (data.game_started) setClock(data.timer);
+
+        // Check poll status
+        if (data.poll_active && (document.getElementById('pollOverlay').style.display === 'none' || data.active_poll !== currentPoll)) {
+            const pollResp = await fetch(`/api/polls/${data.active_poll}/results`);
+            const pollData = await pollResp.json();
+            showPoll(pollData);
+        } else if (!data.poll_active && document.getElementById('pollOverlay').style.display === 'flex') {
+            document.getElementById('pollOverlay').style.display = 'none';
+        }
+
+        // Update pause state
+        document.getElementById('pausedOverlay').classList.toggle('show', data.game_paused);
+    } catch (e) {
+        console.log('Resync error:', e);
+    } finally {
+        resyncing = false;
+    }
+}
+
+// This team's own score/answer changes (e.g. from another device)
+socket.on('team_delta', function(delta) {
+    if (teamVersion !== null && delta.tv > teamVersion + 1) {
+        resyncGameState();
+        return;
+    }
+    if (teamVersion !== null && delta.tv <= teamVersion) return;
+    teamVersion = delta.tv;
+    Object.keys(delta.answers).forEach(id => {
+        answeredQuestions[id] = Object.assign(answeredQuestions[id] || {}, delta.answers[id]);
+    });
+    totalScore = delta.score;
+    document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+});
+
+function showPoll(data) {
+    currentPoll = data.poll_id;
+    document.getElementById('pollQuestion').textContent = data.question;
+    let optionsHtml = '';
+    data.options.forEach((option) => {
+        optionsHtml += `
+            <label style="display:block; background:rgba(255,255,255,0.1); padding:15px 20px; border-radius:10px; margin-bottom:10px; cursor:pointer;">
+                <input type="checkbox" name="poll_option" value="${option}" style="margin-right:15px; transform:scale(1.3);" onchange="limitPollSelection(this)">
+                ${option}
+            </label>
+        `;
+    });
+    document.getElementById('pollOptions').innerHTML = optionsHtml;
+    document.getElementById('pollSubmitted').style.display = 'none';
+    document.getElementById('pollOverlay').style.display = 'flex';
+}
+
+function limitPollSelection(checkbox) {
+    const checkboxes = document.querySelectorAll('input[name="poll_option"]');
+    const checked = document.querySelectorAll('input[name="poll_option"]:checked');
+
+    if (checked.length > 2) {
+        checkbox.checked = false;
+        alert('You can only select up to 2 options!');
+        return;
+    }
+
+    // Visual feedback - disable unchecked boxes when 2 are selected
+    if (checked.length >= 2) {
+        checkboxes.forEach(cb => {
+            if (!cb.checked) {
+                cb.disabled = true;
+                cb.parentElement.style.opacity = '0.5';
+            }
+        });
+    } else {
+        checkboxes.forEach(cb => {
+            cb.disabled = false;
+            cb.parentElement.style.opacity = '1';
+        });
+    }
+}
+
+let answeredQuestions = {};
+let pythonRunner = null;
+let timerInterval = null;
+let timeRemaining = 300; // 5 minutes in seconds
+let clock = null;        // latest round clock anchor from the server
+let clockOffset = 0;     // server time minus local time, in ms
+let roundActive = false;
+
+// Round questions are fetched per round (without answers) and cached by the browser;
+// the versioned URL changes whenever the question bank does
+const roundContent = {};   // round number -> promise of its payload
+let shownRound = null;
+
+function fetchRound(roundNum) {
+    if (!roundContent[roundNum]) {
+        roundContent[roundNum] = fetch(`/api/content/python/${roundNum}?v=${CONTENT_VERSION}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`Round ${roundNum}: HTTP ${response.status}`);
+                return response.json();
+            })
+            .catch(error => {
+                delete roundContent[roundNum];
+                throw error;
+            });
+    }
+    return roundContent[roundNum];
+}
+
+// Answers are only released for questions this team has already attempted
+async function showExpectedOutput(questionId) {
+    try {
+        const response = await fetch(`/api/solution/${encodeURIComponent(questionId)}`);
+        if (!response.ok) return;
+        const data = await response.json();
+        const el = document.getElementById(`expected-${questionId}`);
+        if (el) el.textContent = data.expected_output || '';
+    } catch (e) {
+        console.log('Solution fetch error:', e);
+    }
+}
+
+// Team code runs in a Web Worker (templates/pyodide_worker.js). A run that goes past
+// the time limit gets its worker terminated; a fresh one starts loading straight away.
+
+class PythonRunner {
+    constructor() {
+        this.queue = Promise.resolve();
+        this.nextId = 0;
+        this.spawn();
+    }
+
+    spawn() {
+        this.worker = new Worker('/pyodide_worker.js');
+        this.pending = null;
+        this.ready = new Promise((resolve, reject) => {
+            this.worker.onmessage = event => {
+                const msg = event.data;
+                if (msg.type === 'ready') resolve();
+                else if (msg.type === 'failed') reject(new Error(msg.error));
+                else if (this.pending && msg.id === this.pending.id) this.finish(msg);
+            };
+            this.worker.onerror = event => {
+                event.preventDefault();
+                reject(new Error(event.message || 'Python worker failed to start'));
+                if (this.pending) this.restart('Python crashed: ' + (event.message || 'unknown error'));
+            };
+        });
+        this.ready.catch(() => {});
+    }
+
+    restart(error) {
+        this.worker.terminate();
+        const pending = this.pending;
+        this.spawn();
+        if (pending) {
+            clearTimeout(pending.timer);
+            pending.resolve({ output: '', error });
+        }
+    }
+
+    finish(msg) {
+        clearTimeout(this.pending.timer);
+        this.pending.resolve({ output: msg.output, error: msg.error });
+        this.pending = null;
+    }
+
+    // One run at a time; the clock only starts once the interpreter is loaded
+    run(code) {
+        const result = this.queue.then(() => this.ready).then(() => new Promise(resolve => {
+            const id = ++this.nextId;
+            const timer = setTimeout(() => this.restart(
+                `Stopped after ${RUN_TIMEOUT_MS / 1000} seconds - check for an endless loop`
+            ), RUN_TIMEOUT_MS);
+            this.pending = { id, resolve, timer };
+            this.worker.postMessage({ id, code });
+        }), error => {
+            this.restart();   // the interpreter failed to load; try again on the next run
+            return { output: '', error: error.message };
+        });
+        this.queue = result;
+        return result;
+    }
+}
+
+// Initialize Pyodide (Python in browser)
+async function initPyodide() {
+    try {
+        pythonRunner = new PythonRunner();
+        await pythonRunner.ready;
+        document.getElementById('loadingScreen').style.display = 'none';
+
+        // Check game state after loading
+        const response = await fetch('/api/game_state');
+        const data = await response.json();
+        stateVersion = data.version;
+        teamVersion = data.team_version;
+
+        answeredQuestions = data.your_answers || {};
+        totalScore = data.your_score;
+        document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+
+        if (data.game_started && data.current_round > 0) {
+            document.getElementById('waitingScreen').style.display = 'none';
+            document.getElementById('gameContent').style.display = 'block';
+            loadRound(data.current_round);
+            setClock(data.timer);
+        } else {
+            document.getElementById('waitingScreen').style.display = 'block';
+        }
+
+        if (data.game_paused) {
+            document.getElementById('pausedOverlay').classList.add('show');
+        }
+    } catch (error) {
+        console.error("Failed to load Pyodide:", error);
+        document.getElementById('loadingScreen').innerHTML = `
+            <div class="icon">❌</div>
+            <h2>Error Loading Python</h2>
+            <p>Please refresh the page to try again</p>
+        `;
+    }
+}
+
+// Round clock: the server sends one anchor (deadline + its own time) and the countdown
+// runs locally from it; pauses, resumes and the round end arrive as new anchors
+function setClock(anchor) {
+    if (!anchor) return;
+    clock = anchor;
+    clockOffset = anchor.server_time - Date.now();
+    if (timerInterval) clearInterval(timerInterval);
+    roundActive = !anchor.ended;
+    document.getElementById('timeUpOverlay').classList.remove('show');
+    renderClock();
+    if (anchor.deadline) timerInterval = setInterval(renderClock, 250);
+}
+
+function renderClock() {
+    timeRemaining = clock.deadline
+        ? Math.max(0, Math.ceil((clock.deadline - (Date.now() + clockOffset)) / 1000))
+        : Math.ceil(clock.remaining);
+    updateTimerDisplay();
+
+    if (timeRemaining <= 0) {
+        clearInterval(timerInterval);
+        roundActive = false;
+        document.getElementById('timeUpOverlay').classList.add('show');
+        disableAllInputs();
+    }
+}
+
+// Update timer display
+function updateTimerDisplay() {
+    const minutes = Math.floor(timeRemaining / 60);
+    const seconds = timeRemaining % 60;
+    const display = `${String(minutes).padStart(2, '0')}:${String(seconds).padStart(2, '0')}`;
+    const timerEl = document.getElementById('timerDisplay');
+    timerEl.textContent = display;
+
+    // Add warning class when less than 1 minute
+    if (timeRemaining <= 60) {
+        timerEl.classList.add('warning');
+    } else {
+        timerEl.classList.remove('warning');
+    }
+}
+
+// Disable all inputs when time is up
+function disableAllInputs() {
+    document.querySelectorAll('textarea').forEach(el => el.disabled = true);
+    document.querySelectorAll('.btn-run').forEach(el => el.disabled = true);
+}
+
+// Run Python code in the worker
+async function runPythonCode(code) {
+    if (!pythonRunner) {
+        return { output: '', error: 'Python environment not loaded' };
+    }
+    return pythonRunner.run(code);
+}
+
+// Handle round started
+socket.on('round_started', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    currentRound = data.round;
+
+    document.getElementById('waitingScreen').style.display = 'none';
+    document.getElementById('gameContent').style.display = 'block';
+    document.getElementById('timeUpOverlay').classList.remove('show');
+
+    loadRound(data.round);
+    setClock(data.timer);
+});
+
+// Handle game paused
+socket.on('game_paused', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    document.getElementById('pausedOverlay').classList.toggle('show', data.paused);
+    setClock(data.timer);
+});
+
+socket.on('round_warning', function(data) {
+    setClock(data.timer);
+});
+
+socket.on('round_ended', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    setClock(data.timer);
+});
+
+// Handle game reset
+socket.on('game_reset', function() {
+    window.location.reload();
+});
+
+// The question bank was edited on the server: rounds not on screen yet come from the new version
+socket.on('content_updated', function(data) {
+    CONTENT_VERSION = data.version;
+    Object.keys(roundContent).forEach(roundNum => {
+        if (Number(roundNum) !== shownRound) delete roundContent[roundNum];
+    });
+});
+
+// Poll handlers
+socket.on('poll_started', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    currentPoll = data.poll_id;
+    document.getElementById('pollQuestion').textContent = data.question;
+
+    let optionsHtml = '';
+    data.options.forEach((option, index) => {
+        optionsHtml += `
+            <label style="display:block; background:rgba(255,255,255,0.1); padding:15px 20px; border-radius:10px; margin-bottom:10px; cursor:pointer; transition:all 0.3s;">
+                <input type="checkbox" name="poll_option" value="${option}" style="margin-right:15px; transform:scale(1.3);">
+                ${option}
+            </label>
+        `;
+    });
+    document.getElementById('pollOptions').innerHTML = optionsHtml;
+    document.getElementById('pollSubmitted').style.display = 'none';
+    document.getElementById('pollOverlay').style.display = 'flex';
+});
+
+socket.on('poll_stopped', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    if (data.poll_id !== currentPoll) return;
+    document.getElementById('pollOverlay').style.display = 'none';
+});
+
+function submitPollVote() {
+    const checkboxes = document.querySelectorAll('input[name="poll_option"]:checked');
+    const selectedOptions = Array.from(checkboxes).map(cb => cb.value);
+
+    if (selectedOptions.length === 0) {
+        alert('Please select at least one option!');
+        return;
+    }
+
+    fetch(`/api/polls/${currentPoll}/vote`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ options: selectedOptions })
+    }).then(() => {
+        document.getElementById('pollSubmitted').style.display = 'block';
+        document.querySelectorAll('input[name="poll_option"]').forEach(cb => cb.disabled = true);
+    });
+}
+
+async function loadRound(roundNum) {
+    shownRound = roundNum;
+    let round;
+    try {
+        round = await fetchRound(roundNum);
+    } catch (error) {
+        console.log('Round load error:', error);
+        setTimeout(() => { if (shownRound === roundNum) loadRound(roundNum); }, 2000);
+        return;
+    }
+    if (shownRound !== roundNum) return;  // a newer round started while this one loaded
+
+    document.getElementById('roundTitle').textContent = `Round ${roundNum}`;
+    document.getElementById('roundTheme').textContent = round.theme;
+
+    const container = document.getElementById('questionsContainer');
+    let html = '';
+
+    round.questions.forEach(q => {
+        const isBonus = q.id.endsWith('.3');
+        const answered = answeredQuestions[q.id];
+        const cardClass = answered ? (answered.correct ? 'answered correct' : 'answered incorrect') : '';
+
+        html += `
+            <div class="question-card ${cardClass}" id="card-${q.id}">
+                <span class="question-id ${isBonus ? 'bonus' : ''}">
+                    ${isBonus ? '⭐ BONUS ' : ''}Question ${q.id}
+                </span>
+                <span class="points-badge ${answered && answered.correct ? 'earned' : ''}" id="points-${q.id}">
+                    ${answered && answered.correct ? '✓ ' + q.points + ' pts' : q.points + ' pts'}
+                </span>
+
+                <p class="question-text">${q.question}</p>
+
+                <div class="code-editor">
+                    <textarea
+                        id="code-${q.id}"
+                        placeholder="Write your Python code here..."
+                        ${answered ? 'disabled' : ''}
+                    >${answered ? answered.code || q.code_template : q.code_template}</textarea>
+                </div>
+
+                <button class="btn-run"
+                        id="btn-${q.id}"
+                        onclick="runAndSubmit('${q.id}')"
+                        ${answered ? 'disabled' : ''}>
+                    ▶ Run Code
+                </button>
+
+                <div class="output-section ${answered ? 'show' : ''}" id="output-${q.id}">
+                    <div class="output-box">
+                        <div class="output-label">Your Output:</div>
+                        <div class="output-content" id="userOutput-${q.id}">${answered ? answered.output || '' : ''}</div>
+                    </div>
+
+                    ${answered ? `
+                        <div class="result-badge ${answered.correct ? 'correct' : 'incorrect'}">
+                            ${answered.correct ? '✓ CORRECT! +' + answered.points + ' points' : '✗ INCORRECT'}
+                        </div>
+                        ${!answered.correct ? `
+                            <div class="correct-answer-box">
+                                <h5>Expected Output:</h5>
+                                <pre id="expected-${q.id}"></pre>
+                            </div>
+                        ` : ''}
+                    ` : ''}
+                </div>
+            </div>
+        `;
+    });
+
+    container.innerHTML = html;
+
+    round.questions.forEach(q => {
+        if (answeredQuestions[q.id] && !answeredQuestions[q.id].correct) showExpectedOutput(q.id);
+    });
+
+    // Warm the cache so the next round appears instantly when it starts
+    if (ROUND_NUMBERS.includes(roundNum + 1)) fetchRound(roundNum + 1).catch(() => {});
+}
+
+async function runAndSubmit(questionId) {
+    if (!roundActive) {
+        alert("Time's up! You cannot submit answers.");
+        return;
+    }
+
+    const codeEl = document.getElementById(`code-${questionId}`);
+    const code = codeEl.value;
+    const btn = document.getElementById(`btn-${questionId}`);
+    const outputSection = document.getElementById(`output-${questionId}`);
+    const userOutputEl = document.getElementById(`userOutput-${questionId}`);
+
+    if (!code.trim()) {
+        alert('Please write some code first!');
+        return;
+    }
+
+    btn.disabled = true;
+    btn.innerHTML = '⏳ Running...';
+
+    // Run the code
+    const result = await runPythonCode(code);
+
+    // Show output section
+    outputSection.classList.add('show');
+
+    if (result.error) {
+        userOutputEl.className = 'output-content error';
+        userOutputEl.textContent = 'Error: ' + result.error;
+        btn.disabled = false;
+        btn.innerHTML = '▶ Run Code';
+        return;
+    }
+
+    userOutputEl.className = 'output-content';
+    userOutputEl.textContent = result.output || '(no output)';
+
+    // Submit to server for scoring
+    try {
+        const response = await fetch('/api/submit_answer', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                question_id: questionId,
+                code: code,
+                output: result.output
+            })
+        });
+
+        const data = await response.json();
+        if (data.round_over) {
+            document.getElementById('timeUpOverlay').classList.add('show');
+            disableAllInputs();
+            return;
+        }
+
+        answeredQuestions[questionId] = {
+            code: code,
+            output: result.output,
+            correct: data.correct,
+            points: data.points_earned
+        };
+
+        const card = document.getElementById(`card-${questionId}`);
+        const pointsBadge = document.getElementById(`points-${questionId}`);
+
+        card.classList.add('answered');
+        codeEl.disabled = true;
+
+        // Add result badge
+        let resultHtml = '';
+        if (data.correct) {
+            card.classList.add('correct');
+            btn.innerHTML = '✓ Correct!';
+            resultHtml = `<div class="result-badge correct">✓ CORRECT! +${data.points_earned} points</div>`;
+            pointsBadge.classList.add('earned');
+            pointsBadge.textContent = '✓ ' + data.points_earned + ' pts';
+
+            // Update score
+            totalScore = data.total_score;
+            document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+            showScorePopup(`+${data.points_earned} pts!`);
+        } else {
+            card.classList.add('incorrect');
+            btn.innerHTML = '✗ Try Again';
+            btn.disabled = false; // Allow retry for incorrect answers
+            card.classList.remove('answered'); // Allow editing
+            codeEl.disabled = false;
+
+            resultHtml = `
+                <div class="result-badge incorrect">✗ INCORRECT - Try Again!</div>
+                <div class="correct-answer-box">
+                    <h5>📤 Expected Output:</h5>
+                    <pre>${data.expected_output || 'N/A'}</pre>
+                </div>
+                <div class="correct-answer-box" style="border-color: #17a2b8; margin-top: 15px;">
+                    <h5 style="color: #17a2b8;">💡 Correct Code:</h5>
+                    <pre>${escapeHtml(data.solution_code || 'N/A')}</pre>
+                </div>
+            `;
+        }
+
+        outputSection.innerHTML = `
+            <div class="output-box">
+                <div class="output-label">Your Output:</div>
+                <div class="output-content">${result.output || '(no output)'}</div>
+            </div>
+            ${resultHtml}
+        `;
+
+    } catch (error) {
+        console.error('Error submitting:', error);
+        btn.disabled = false;
+        btn.innerHTML = '▶ Run Code';
+    }
+}
+
+function showScorePopup(text) {
+    const popup = document.getElementById('scorePopup');
+    popup.textContent = text;
+    popup.style.display = 'block';
+
+    setTimeout(() => {
+        popup.style.display = 'none';
+    }, 1500);
+}
+
+// Initialize when page loads
+initPyodide();
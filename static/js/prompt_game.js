@@ -0,0 +1,633 @@
+const socket = io({
+    transports: SOCKETIO_TRANSPORTS,
+    reconnection: true,
+    reconnectionAttempts: 5,
+    reconnectionDelay: 2000
+});
+
+// Some venue networks block WebSockets - fall back to long-polling and upgrade later
+socket.on('connect_error', function() {
+    if (socket.io.opts.transports[0] === 'websocket') {
+        socket.io.opts.transports = ['polling', 'websocket'];
+    }
+});
+
+let solvedChallenges = {};
+let pythonRunner = null;
+let timerInterval = null;
+let timeRemaining = 180;
+let roundActive = false;
+let clock = null;        // latest round clock anchor from the server
+let clockOffset = 0;     // server time minus local time, in ms
+
+// Round challenges are fetched per round and cached by the browser; the versioned URL
+// changes whenever the challenge bank does
+const roundContent = {};   // round number -> promise of its payload
+let shownRound = null;
+
+function fetchRound(roundNum) {
+    if (!roundContent[roundNum]) {
+        roundContent[roundNum] = fetch(`/api/content/prompt/${roundNum}?v=${CONTENT_VERSION}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`Round ${roundNum}: HTTP ${response.status}`);
+                return response.json();
+            })
+            .catch(error => {
+                delete roundContent[roundNum];
+                throw error;
+            });
+    }
+    return roundContent[roundNum];
+}
+
+socket.on('connect', function() {
+    socket.emit('join_prompt_team', { team_id: teamId });
+    // We may have missed deltas while disconnected
+    if (stateVersion !== null) resyncGameState();
+});
+
+// Versioned state: every broadcast event carries `v` and every team delta `tv`.
+// Deltas arrive in order, so a gap means we missed one and need a single resync.
+let stateVersion = null;
+let teamVersion = null;
+let resyncing = false;
+
+function acceptStateVersion(v) {
+    if (v === undefined || stateVersion === null) {
+        if (v !== undefined) stateVersion = v;
+        return true;
+    }
+    if (v <= stateVersion) return false;  // already applied by a resync
+    if (v !== stateVersion + 1) {
+        resyncGameState();
+        return false;
+    }
+    stateVersion = v;
+    return true;
+}
+
+async function resyncGameState() {
+    if (resyncing) return;
+    resyncing = true;
+    try {
+        const response = await fetch('/api/prompt/game_state');
+        const data = await response.json();
+        stateVersion = data.version;
+        teamVersion = data.team_version;
+
+        solvedChallenges = data.your_attempts || {};
+        totalScore = data.your_score;
+        document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+
+        if (data.current_round > 0 && data.current_round !== currentRound && data.game_started) {
+            currentRound = data.current_round;
+            document.getElementById('waitingScreen').style.display = 'none';
+            document.getElementById('gameContent').style.display = 'block';
+            loadRound(data.current_round);
+        }
+        if (data.game_started) setClock(data.timer);
+
+        document.getElementById('pausedOverlay').classList.toggle('show', data.game_paused);
+    } catch (e) {
+        console.log('Resync error:', e);
+    } finally {
+        resyncing = false;
+    }
+}
+
+// This team's own score/attempt changes (e.g. from another device)
+socket.on('prompt_team_delta', function(delta) {
+    if (teamVersion !== null && delta.tv > teamVersion + 1) {
+        resyncGameState();
+        return;
+    }
+    if (teamVersion !== null && delta.tv <= teamVersion) return;
+    teamVersion = delta.tv;
+    Object.keys(delta.attempts).forEach(id => {
+        solvedChallenges[id] = Object.assign(solvedChallenges[id] || {}, delta.attempts[id]);
+    });
+    totalScore = delta.score;
+    document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+});
+
+// Team code runs in a Web Worker (templates/pyodide_worker.js). A run that goes past
+// the time limit gets its worker terminated; a fresh one starts loading straight away.
+
+class PythonRunner {
+    constructor() {
+        this.queue = Promise.resolve();
+        this.nextId = 0;
+        this.spawn();
+    }
+
+    spawn() {
+        this.worker = new Worker('/pyodide_worker.js');
+        this.pending = null;
+        this.ready = new Promise((resolve, reject) => {
+            this.worker.onmessage = event => {
+                const msg = event.data;
+                if (msg.type === 'ready') resolve();
+                else if (msg.type === 'failed') reject(new Error(msg.error));
+                else if (this.pending && msg.id === this.pending.id) this.finish(msg);
+            };
+            this.worker.onerror = event => {
+                event.preventDefault();
+                reject(new Error(event.message || 'Python worker failed to start'));
+                if (this.pending) this.restart('Python crashed: ' + (event.message || 'unknown error'));
+            };
+        });
+        this.ready.catch(() => {});
+    }
+
+    restart(error) {
+        this.worker.terminate();
+        const pending = this.pending;
+        this.spawn();
+        if (pending) {
+            clearTimeout(pending.timer);
+            pending.resolve({ output: '', error });
+        }
+    }
+
+    finish(msg) {
+        clearTimeout(this.pending.timer);
+        this.pending.resolve({ output: msg.output, error: msg.error });
+        this.pending = null;
+    }
+
+    // One run at a time; the clock only starts once the interpreter is loaded
+    run(code) {
+        const result = this.queue.then(() => this.ready).then(() => new Promise(resolve => {
+            const id = ++this.nextId;
+            const timer = setTimeout(() => this.restart(
+                `Stopped after ${RUN_TIMEOUT_MS / 1000} seconds - check for an endless loop`
+            ), RUN_TIMEOUT_MS);
+            this.pending = { id, resolve, timer };
+            this.worker.postMessage({ id, code });
+        }), error => {
+            this.restart();   // the interpreter failed to load; try again on the next run
+            return { output: '', error: error.message };
+        });
+        this.queue = result;
+        return result;
+    }
+}
+
+async function initPyodide() {
+    try {
+        pythonRunner = new PythonRunner();
+        await pythonRunner.ready;
+        document.getElementById('loadingScreen').style.display = 'none';
+
+        const response = await fetch('/api/prompt/game_state');
+        const data = await response.json();
+        stateVersion = data.version;
+        teamVersion = data.team_version;
+
+        solvedChallenges = data.your_attempts || {};
+        totalScore = data.your_score;
+        document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+
+        if (data.game_started && data.current_round > 0) {
+            document.getElementById('waitingScreen').style.display = 'none';
+            document.getElementById('gameContent').style.display = 'block';
+            loadRound(data.current_round);
+            setClock(data.timer);
+        } else {
+            document.getElementById('waitingScreen').style.display = 'block';
+        }
+
+        if (data.game_paused) {
+            document.getElementById('pausedOverlay').classList.add('show');
+        }
+    } catch (error) {
+        console.error("Failed to load Pyodide:", error);
+        document.getElementById('loadingScreen').innerHTML = `
+            <div class="icon">❌</div>
+            <h2>Error Loading Python</h2>
+            <p>Please refresh the page</p>
+        `;
+    }
+}
+
+// Round clock: the server sends one anchor (deadline + its own time) and the countdown
+// runs locally from it; pauses, resumes and the round end arrive as new anchors
+function setClock(anchor) {
+    if (!anchor) return;
+    clock = anchor;
+    clockOffset = anchor.server_time - Date.now();
+    if (timerInterval) clearInterval(timerInterval);
+    roundActive = !anchor.ended;
+    renderClock();
+    if (anchor.deadline) timerInterval = setInterval(renderClock, 250);
+}
+
+function renderClock() {
+    timeRemaining = clock.deadline
+        ? Math.max(0, Math.ceil((clock.deadline - (Date.now() + clockOffset)) / 1000))
+        : Math.ceil(clock.remaining);
+    updateTimerDisplay();
+
+    if (timeRemaining <= 0) {
+        clearInterval(timerInterval);
+        roundActive = false;
+        disableAllInputs();
+    }
+}
+
+function updateTimerDisplay() {
+    const minutes = Math.floor(timeRemaining / 60);
+    const seconds = timeRemaining % 60;
+    const display = `${String(minutes).padStart(2, '0')}:${String(seconds).padStart(2, '0')}`;
+    const timerEl = document.getElementById('timerDisplay');
+    timerEl.textContent = display;
+
+    if (timeRemaining <= 60) {
+        timerEl.classList.add('warning');
+    } else {
+        timerEl.classList.remove('warning');
+    }
+}
+
+function disableAllInputs() {
+    document.querySelectorAll('textarea').forEach(el => el.disabled = true);
+    document.querySelectorAll('button').forEach(el => el.disabled = true);
+}
+
+async function runPythonCode(code) {
+    if (!pythonRunner) {
+        return { output: '', error: 'Python environment not loaded' };
+    }
+    return pythonRunner.run(code);
+}
+
+socket.on('prompt_round_started', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    currentRound = data.round;
+
+    document.getElementById('waitingScreen').style.display = 'none';
+    document.getElementById('gameContent').style.display = 'block';
+
+    loadRound(data.round);
+    setClock(data.timer);
+});
+
+socket.on('prompt_game_paused', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    document.getElementById('pausedOverlay').classList.toggle('show', data.paused);
+    setClock(data.timer);
+});
+
+socket.on('prompt_round_warning', function(data) {
+    setClock(data.timer);
+});
+
+socket.on('prompt_round_ended', function(data) {
+    if (!acceptStateVersion(data.v)) return;
+    setClock(data.timer);
+});
+
+socket.on('prompt_game_reset', function() {
+    window.location.reload();
+});
+
+// The question bank was edited on the server: rounds not on screen yet come from the new version
+socket.on('prompt_content_updated', function(data) {
+    CONTENT_VERSION = data.version;
+    Object.keys(roundContent).forEach(roundNum => {
+        if (Number(roundNum) !== shownRound) delete roundContent[roundNum];
+    });
+});
+
+async function loadRound(roundNum) {
+    shownRound = roundNum;
+    let round;
+    try {
+        round = await fetchRound(roundNum);
+    } catch (error) {
+        console.log('Round load error:', error);
+        setTimeout(() => { if (shownRound === roundNum) loadRound(roundNum); }, 2000);
+        return;
+    }
+    if (shownRound !== roundNum) return;  // a newer round started while this one loaded
+
+    document.getElementById('roundTitle').textContent = `Round ${roundNum}: ${round.title}`;
+    document.getElementById('roundTheme').textContent = round.theme;
+
+    const container = document.getElementById('challengesContainer');
+    let html = '';
+
+    round.challenges.forEach(c => {
+        const solved = solvedChallenges[c.id];
+        const isBonus = c.is_bonus;
+        const isBoss = c.is_boss;
+        const cardClass = solved && solved.correct ? 'solved' : '';
+        const badgeClass = isBoss ? 'boss' : (isBonus ? 'bonus' : '');
+
+        html += `
+            <div class="challenge-card ${cardClass}" id="card-${c.id}">
+                <span class="challenge-id ${badgeClass}">
+                    ${isBoss ? '👑 BOSS: ' : (isBonus ? '⭐ BONUS: ' : '')}${c.title}
+                </span>
+                <span class="points-badge ${solved && solved.correct ? 'earned' : ''}" id="points-${c.id}">
+                    ${solved && solved.correct ? '✓ ' + solved.points + ' pts' : c.points + ' pts'}
+                </span>
+
+                <div class="scenario-box">
+                    <h5 style="color:#ffd700; margin-bottom:10px;">📋 Scenario</h5>
+                    <p style="white-space:pre-wrap;">${c.scenario}</p>
+                </div>
+
+                <div class="given-data-box">
+                    <div style="color:#888; font-size:0.8rem; margin-bottom:5px;">📥 GIVEN DATA:</div>
+                    <pre style="margin:0; color:#98c379;">${escapeHtml(c.given_data)}</pre>
+                </div>
+
+                <div class="expected-output-box" style="background:rgba(100,100,100,0.1); border-color:#666;">
+                    <div style="color:#888; font-size:0.8rem; margin-bottom:5px;">📤 EXPECTED OUTPUT:</div>
+                    <pre style="margin:0; color:#61afef;">${escapeHtml(c.expected_output)}</pre>
+                </div>
+
+                <div style="margin-top:20px;">
+                    <label style="display:block; margin-bottom:10px; color:#da70d6;">
+                        ✍️ Write your prompt to generate Python code:
+                    </label>
+                    <textarea class="prompt-input" id="prompt-${c.id}"
+                        placeholder="Write a clear prompt describing what Python code you need...
+
+Example: Write Python code that:
+1. Calculates the compound interest using the formula...
+2. Formats the output with 2 decimal places...
+3. Prints the result as..."
+                        ${solved && solved.correct ? 'disabled' : ''}
+                    >${solved ? solved.prompt || '' : ''}</textarea>
+                </div>
+
+                <div class="tips-box">
+                    <h5>💡 Hints</h5>
+                    <ul>
+                        ${c.hints.map(h => `<li>${h}</li>`).join('')}
+                    </ul>
+                </div>
+
+                <div style="margin-top:20px;">
+                    <button class="btn-generate" id="btnGen-${c.id}" onclick="generateCode('${c.id}')"
+                        ${solved && solved.correct ? 'disabled' : ''}>
+                        🤖 Generate Code
+                    </button>
+                    <button class="btn-run" id="btnRun-${c.id}" onclick="runCode('${c.id}')"
+                        style="display:none;">
+                        ▶️ Run Code
+                    </button>
+                    <button class="btn-submit" id="btnSubmit-${c.id}" onclick="submitAnswer('${c.id}')"
+                        style="display:none;">
+                        ✅ Submit Answer
+                    </button>
+                </div>
+
+                <div id="codeSection-${c.id}" style="display:none; margin-top:20px;">
+                    <div style="color:#888; font-size:0.8rem; margin-bottom:5px;">🤖 AI GENERATED CODE:</div>
+                    <div class="code-display" id="code-${c.id}"></div>
+                </div>
+
+                <div id="outputSection-${c.id}" style="display:none; margin-top:20px;">
+                    <div class="output-box">
+                        <div class="output-label">Your Output:</div>
+                        <div class="output-content" id="output-${c.id}"></div>
+                    </div>
+                </div>
+
+                <div id="result-${c.id}" style="margin-top:15px;"></div>
+            </div>
+        `;
+    });
+
+    container.innerHTML = html;
+
+    // Warm the cache so the next round appears instantly when it starts
+    if (ROUND_NUMBERS.includes(roundNum + 1)) fetchRound(roundNum + 1).catch(() => {});
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
+// Streamed generations in progress: request_id -> challengeId
+const pendingGenerations = {};
+
+async function generateCode(challengeId) {
+    const promptEl = document.getElementById(`prompt-${challengeId}`);
+    const prompt = promptEl.value.trim();
+
+    if (!prompt) {
+        alert('Please write a prompt first!');
+        return;
+    }
+
+    const btn = document.getElementById(`btnGen-${challengeId}`);
+    btn.disabled = true;
+    btn.innerHTML = '⏳ Generating...';
+
+    // Stream the code over the socket when connected; otherwise wait for the whole reply
+    const stream = socket.connected;
+    const requestId = `${teamId}-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+    if (stream) {
+        pendingGenerations[requestId] = challengeId;
+        document.getElementById(`codeSection-${challengeId}`).style.display = 'block';
+        document.getElementById(`code-${challengeId}`).textContent = '';
+        document.getElementById(`btnRun-${challengeId}`).style.display = 'none';
+    }
+
+    try {
+        const response = await fetch('/api/prompt/generate', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                prompt: prompt,
+                challenge_id: challengeId,
+                stream: stream,
+                request_id: requestId
+            })
+        });
+
+        const data = await response.json();
+
+        if (data.streaming) {
+            return;  // prompt_code_chunk / prompt_code_complete finish the job
+        }
+        delete pendingGenerations[requestId];
+        showGeneratedCode(challengeId, data);
+    } catch (error) {
+        delete pendingGenerations[requestId];
+        alert('Error generating code: ' + error.message);
+        btn.disabled = false;
+        btn.innerHTML = '🤖 Generate Code';
+    }
+}
+
+function showGeneratedCode(challengeId, data) {
+    const btn = document.getElementById(`btnGen-${challengeId}`);
+
+    if (data.success) {
+        document.getElementById(`codeSection-${challengeId}`).style.display = 'block';
+        document.getElementById(`code-${challengeId}`).textContent = data.code;
+        document.getElementById(`btnRun-${challengeId}`).style.display = 'inline-block';
+
+        // Show prompt quality feedback
+        if (data.prompt_quality) {
+            const qualityHtml = `
+                <div class="prompt-quality">
+                    <strong>📊 Prompt Quality:</strong> +${data.prompt_quality.bonus_points} bonus pts
+                    <br><small>${data.prompt_quality.feedback.join(' | ') || 'Keep refining your prompt!'}</small>
+                </div>
+            `;
+            document.getElementById(`result-${challengeId}`).innerHTML = qualityHtml;
+        }
+
+        btn.innerHTML = '🤖 Regenerate';
+    } else {
+        alert('Error: ' + data.error);
+        btn.innerHTML = '🤖 Generate Code';
+    }
+
+    btn.disabled = false;
+}
+
+socket.on('prompt_code_chunk', function(data) {
+    const challengeId = pendingGenerations[data.request_id];
+    if (!challengeId) return;
+    document.getElementById(`code-${challengeId}`).textContent += data.code;
+});
+
+socket.on('disconnect', function() {
+    // Streamed replies in flight are lost with the connection; let the team generate again
+    Object.entries(pendingGenerations).forEach(([requestId, challengeId]) => {
+        delete pendingGenerations[requestId];
+        const btn = document.getElementById(`btnGen-${challengeId}`);
+        btn.disabled = false;
+        btn.innerHTML = '🤖 Generate Code';
+    });
+});
+
+socket.on('prompt_code_complete', function(data) {
+    const challengeId = pendingGenerations[data.request_id];
+    if (!challengeId) return;
+    delete pendingGenerations[data.request_id];
+    showGeneratedCode(challengeId, data);
+});
+
+async function runCode(challengeId) {
+    const code = document.getElementById(`code-${challengeId}`).textContent;
+    const btn = document.getElementById(`btnRun-${challengeId}`);
+
+    btn.disabled = true;
+    btn.innerHTML = '⏳ Running...';
+
+    const result = await runPythonCode(code);
+
+    document.getElementById(`outputSection-${challengeId}`).style.display = 'block';
+    const outputEl = document.getElementById(`output-${challengeId}`);
+
+    if (result.error) {
+        outputEl.className = 'output-content error';
+        outputEl.textContent = 'Error: ' + result.error;
+    } else {
+        outputEl.className = 'output-content';
+        outputEl.textContent = result.output || '(no output)';
+        document.getElementById(`btnSubmit-${challengeId}`).style.display = 'inline-block';
+    }
+
+    btn.disabled = false;
+    btn.innerHTML = '▶️ Run Code';
+}
+
+async function submitAnswer(challengeId) {
+    if (!roundActive) {
+        alert("Time's up!");
+        return;
+    }
+
+    const prompt = document.getElementById(`prompt-${challengeId}`).value;
+    const code = document.getElementById(`code-${challengeId}`).textContent;
+    const output = document.getElementById(`output-${challengeId}`).textContent;
+    const btn = document.getElementById(`btnSubmit-${challengeId}`);
+
+    btn.disabled = true;
+    btn.innerHTML = '⏳ Submitting...';
+
+    try {
+        const response = await fetch('/api/prompt/submit', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                challenge_id: challengeId,
+                prompt: prompt,
+                generated_code: code,
+                output: output
+            })
+        });
+
+        const data = await response.json();
+        if (data.round_over) {
+            roundActive = false;
+            disableAllInputs();
+            return;
+        }
+
+        const card = document.getElementById(`card-${challengeId}`);
+        const pointsBadge = document.getElementById(`points-${challengeId}`);
+        const resultDiv = document.getElementById(`result-${challengeId}`);
+
+        if (data.correct) {
+            card.classList.add('solved');
+            pointsBadge.classList.add('earned');
+            pointsBadge.textContent = '✓ ' + data.points_earned + ' pts';
+
+            solvedChallenges[challengeId] = { correct: true, points: data.points_earned };
+
+            totalScore = data.total_score;
+            document.getElementById('scoreDisplay').textContent = totalScore + ' pts';
+
+            resultDiv.innerHTML = `
+                <div class="result-badge correct">✓ CORRECT! +${data.points_earned} pts</div>
+                ${data.prompt_bonus > 0 ? `<div style="color:#28a745; margin-top:10px;">Prompt Quality Bonus: +${data.prompt_bonus} pts</div>` : ''}
+            `;
+
+            showScorePopup(`+${data.points_earned} pts!`);
+
+            document.getElementById(`prompt-${challengeId}`).disabled = true;
+            document.getElementById(`btnGen-${challengeId}`).disabled = true;
+            document.getElementById(`btnRun-${challengeId}`).disabled = true;
+            btn.style.display = 'none';
+        } else {
+            resultDiv.innerHTML = `
+                <div class="result-badge incorrect">✗ INCORRECT - Try Again!</div>
+                <div class="expected-output-box" style="margin-top:15px;">
+                    <h5 style="color:#28a745;">Expected Output:</h5>
+                    <pre style="color:#98c379;">${escapeHtml(data.expected_output || '')}</pre>
+                </div>
+                <p style="margin-top:10px; opacity:0.7;">Attempt ${data.attempt_number}/3 - Refine your prompt and try again!</p>
+            `;
+            btn.innerHTML = '✅ Submit Answer';
+            btn.disabled = false;
+        }
+    } catch (error) {
+        alert('Error submitting: ' + error.message);
+        btn.disabled = false;
+        btn.innerHTML = '✅ Submit Answer';
+    }
+}
+
+function showScorePopup(text) {
+    const popup = document.getElementById('scorePopup');
+    popup.textContent = text;
+    popup.style.display = 'block';
+
+    setTimeout(() => {
+        popup.style.display = 'none';
+    }, 1500);
+}
+
+initPyodide();
@@ -0,0 +1,225 @@
+const socket = io({
+    transports: SOCKETIO_TRANSPORTS,
+    reconnection: true,
+    reconnectionAttempts: 5,
+    reconnectionDelay: 2000
+});
+
+// Some venue networks block WebSockets - fall back to long-polling and upgrade later
+socket.on('connect_error', function() {
+    if (socket.io.opts.transports[0] === 'websocket') {
+        socket.io.opts.transports = ['polling', 'websocket'];
+    }
+});
+
+let teams = {};
+let isPaused = false;
+
+socket.on('connect', function() {
+    socket.emit('join_prompt_trainer');
+});
+
+// Re-sync teams every 10 seconds in case a frame was missed
+setInterval(function() {
+    fetch('/api/prompt/trainer/teams')
+        .then(response => response.json())
+        .then(data => {
+            data.teams.forEach(team => {
+                teams[team.id] = {
+                    name: team.name,
+                    score: team.score,
+                    attempts: team.attempts
+                };
+            });
+            updateScoreboard();
+            document.getElementById('currentRound').textContent = data.current_round;
+            updateCacheStats(data.generation_cache);
+        })
+        .catch(e => console.log('Polling error:', e));
+}, 10000);
+
+function updateCacheStats(stats) {
+    if (!stats) return;
+    const lookups = stats.hits + stats.coalesced + stats.misses;
+    document.getElementById('cacheHitRate').textContent = lookups
+        ? `${Math.round(stats.hit_rate * 100)}% (${stats.hits + stats.coalesced} of ${lookups} generations)`
+        : '-';
+}
+
+// Joins and score changes arrive merged into one frame per tick
+socket.on('prompt_trainer_frame', function(frame) {
+    Object.entries(frame.teams).forEach(([teamId, team]) => {
+        teams[teamId] = Object.assign(teams[teamId] || { attempts: {} }, team);
+    });
+    updateScoreboard();
+
+    frame.solved.forEach(s => showNotification(`${s.team_name} solved ${s.challenge_id}! +${s.points} pts`));
+    if (frame.solved_count > frame.solved.length) {
+        showNotification(`...and ${frame.solved_count - frame.solved.length} more solutions`);
+    }
+});
+
+socket.on('prompt_round_started', function(data) {
+    document.getElementById('currentRound').textContent = data.round;
+    currentRound = data.round;
+    updateRoundButtons();
+    updateRoundInfo(data.round);
+});
+
+socket.on('prompt_game_paused', function(data) {
+    isPaused = data.paused;
+    document.getElementById('pauseText').textContent = isPaused ? '▶ Resume' : '⏸ Pause';
+});
+
+socket.on('prompt_game_reset', function() {
+    teams = {};
+    updateScoreboard();
+    document.getElementById('currentRound').textContent = '0';
+});
+
+function updateScoreboard() {
+    const container = document.getElementById('teamsContainer');
+
+    const teamArray = Object.entries(teams).map(([id, data]) => ({
+        id: id,
+        name: data.name,
+        score: data.score,
+        attempts: data.attempts || {}
+    })).sort((a, b) => b.score - a.score);
+
+    if (teamArray.length === 0) {
+        container.innerHTML = `
+            <div class="no-teams">
+                <div class="icon">🤖</div>
+                <p>Waiting for teams to join...</p>
+                <p>Share the QR code with participants</p>
+            </div>
+        `;
+        return;
+    }
+
+    let html = '';
+    teamArray.forEach((team, index) => {
+        const rankClass = index === 0 ? 'first' : index === 1 ? 'second' : index === 2 ? 'third' : '';
+        const medal = index === 0 ? '🥇' : index === 1 ? '🥈' : index === 2 ? '🥉' : `#${index + 1}`;
+
+        const solvedCount = Object.values(team.attempts).filter(a => a.correct).length;
+
+        html += `
+            <div class="team-card ${rankClass}">
+                <div class="team-rank">${medal}</div>
+                <div class="team-info">
+                    <div class="team-name">${team.name}</div>
+                    <small style="opacity:0.7;">Solved: ${solvedCount} challenges</small>
+                </div>
+                <div class="team-score">${team.score} pts</div>
+            </div>
+        `;
+    });
+
+    container.innerHTML = html;
+}
+
+function startRound(round) {
+    fetch('/api/prompt/trainer/start_round', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ round: round })
+    }).then(() => {
+        currentRound = round;
+        updateRoundButtons();
+        updateChallengePreview(round);
+        updateRoundInfo(round);
+    });
+}
+
+function updateRoundButtons() {
+    for (let i = 1; i <= TOTAL_ROUNDS; i++) {
+        const btn = document.getElementById(`roundBtn${i}`);
+        if (btn) {
+            btn.classList.toggle('active', i === currentRound);
+        }
+    }
+}
+
+function updateChallengePreview(round) {
+    const preview = document.getElementById('challengePreview');
+    const roundData = challenges[round];
+
+    if (!roundData) {
+        preview.innerHTML = '<h5>📋 Round Challenges</h5><p>No data</p>';
+        return;
+    }
+
+    let html = `<h5>📋 ${roundData.title}</h5>`;
+    html += `<p style="opacity:0.7; margin-bottom:10px;">Theme: ${roundData.theme} | Time: ${Math.floor(roundData.time_limit/60)} min</p>`;
+
+    roundData.challenges.forEach(c => {
+        const extraClass = c.is_boss ? 'boss' : (c.is_bonus ? 'bonus' : '');
+        const badge = c.is_boss ? '👑' : (c.is_bonus ? '⭐' : '📝');
+
+        html += `
+            <div class="challenge-item ${extraClass}">
+                <span>${badge} ${c.title}</span>
+                <span style="color:#ffd700;">${c.points} pts</span>
+            </div>
+        `;
+    });
+
+    preview.innerHTML = html;
+}
+
+function updateRoundInfo(round) {
+    const roundData = challenges[round];
+    if (!roundData) return;
+
+    const infoDiv = document.getElementById('roundInfo');
+    infoDiv.innerHTML = `
+        <h4 style="color:#ffd700;">Round ${round}: ${roundData.title}</h4>
+        <p style="font-size:1.2rem;">${roundData.theme}</p>
+        <p>Time Limit: ${Math.floor(roundData.time_limit/60)} minutes</p>
+        <p>${roundData.challenges.length} challenges</p>
+    `;
+}
+
+function togglePause() {
+    fetch('/api/prompt/trainer/pause', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+function resetGame() {
+    if (confirm('Reset game? All scores will be lost.')) {
+        fetch('/api/prompt/trainer/reset', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
+function showNotification(message) {
+    console.log('Notification:', message);
+}
+
+// Initial team load
+fetch('/api/prompt/trainer/teams')
+    .then(response => response.json())
+    .then(data => {
+        data.teams.forEach(team => {
+            teams[team.id] = {
+                name: team.name,
+                score: team.score,
+                attempts: team.attempts
+            };
+        });
+        updateScoreboard();
+        document.getElementById('currentRound').textContent = data.current_round;
+
+        if (data.current_round > 0) {
+            currentRound = data.current_round;
+            updateRoundButtons();
+            updateChallengePreview(data.current_round);
+            updateRoundInfo(data.current_round);
+        }
+    });
@@ -0,0 +1,213 @@
+const socket = io({
+    transports: SOCKETIO_TRANSPORTS,
+    reconnection: true,
+    reconnectionAttempts: 5,
+    reconnectionDelay: 2000
+});
+
+// Some venue networks block WebSockets - fall back to long-polling and upgrade later
+socket.on('connect_error', function() {
+    if (socket.io.opts.transports[0] === 'websocket') {
+        socket.io.opts.transports = ['polling', 'websocket'];
+        console.log('Socket connection error, retrying with HTTP polling');
+    }
+});
+const SCOREBOARD_SIZE = 50;  // teams shown; frames may add more until the next re-sync
+let teams = {};
+let isPaused = false;
+let shownPoll = 'icebreaker';  // the poll whose results are on the dashboard
+
+// Connect to trainer room on socket connect
+socket.on('connect', function() {
+    console.log('Trainer socket connected!', socket.id);
+    socket.emit('join_trainer');
+});
+
+// Replace the scoreboard with the server's top teams (names and scores only)
+function syncTeams() {
+    return fetch(`/api/trainer/teams?limit=${SCOREBOARD_SIZE}&answers=0`)
+        .then(response => response.json())
+        .then(data => {
+            teams = {};
+            data.teams.forEach(team => {
+                teams[team.id] = {
+                    name: team.name,
+                    score: team.score
+                };
+            });
+            updateScoreboard();
+            document.getElementById('currentRound').textContent = data.current_round;
+        });
+}
+
+// Re-sync from the server every 10 seconds in case a frame was missed
+setInterval(function() {
+    syncTeams().catch(e => console.log('Polling error:', e));
+
+    // Also poll for poll results if active
+    fetch(`/api/polls/${shownPoll}/results`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.active) showPollResults(data);
+        })
+        .catch(e => {});
+}, 10000);
+
+// Joins, score changes and poll results arrive merged into one frame per tick
+socket.on('trainer_frame', function(frame) {
+    Object.entries(frame.teams).forEach(([teamId, team]) => {
+        teams[teamId] = Object.assign(teams[teamId] || {}, team);
+    });
+    updateScoreboard();
+
+    frame.solved.forEach(s => showNotification(`${s.team_name} answered correctly! +${s.points} pts`));
+    if (frame.solved_count > frame.solved.length) {
+        showNotification(`...and ${frame.solved_count - frame.solved.length} more correct answers`);
+    }
+
+    if (frame.polls && frame.polls[shownPoll]) {
+        showPollResults(frame.polls[shownPoll]);
+    }
+});
+
+// Follow whichever poll was started last (from this dashboard or the polls API)
+socket.on('poll_started', function(data) {
+    shownPoll = data.poll_id;
+    document.getElementById('pollResults').style.display = 'block';
+    showPollResults({options: data.options, results: {}, total_votes: 0});
+});
+
+// Handle round started
+socket.on('round_started', function(data) {
+    document.getElementById('currentRound').textContent = data.round;
+    showNotification(`Round ${data.round} started: ${data.title}`);
+});
+
+// Handle game paused
+socket.on('game_paused', function(data) {
+    isPaused = data.paused;
+    document.getElementById('pauseText').textContent = isPaused ? '▶ Resume' : '⏸ Pause';
+});
+
+// Handle game reset
+socket.on('game_reset', function() {
+    teams = {};
+    updateScoreboard();
+    document.getElementById('currentRound').textContent = '0';
+    showNotification('Game has been reset');
+});
+
+function updateScoreboard() {
+    const container = document.getElementById('teamsContainer');
+
+    // Convert to array and sort by score
+    const teamArray = Object.entries(teams).map(([id, data]) => ({
+        id: id,
+        name: data.name,
+        score: data.score
+    })).sort((a, b) => b.score - a.score).slice(0, SCOREBOARD_SIZE);
+
+    if (teamArray.length === 0) {
+        container.innerHTML = `
+            <div class="no-teams">
+                <div class="icon">👥</div>
+                <p>Waiting for teams to join...</p>
+                <p>Share the QR code or URL with participants</p>
+            </div>
+        `;
+        return;
+    }
+
+    let html = '';
+    teamArray.forEach((team, index) => {
+        const rankClass = index === 0 ? 'first' : index === 1 ? 'second' : index === 2 ? 'third' : '';
+        const medal = index === 0 ? '🥇' : index === 1 ? '🥈' : index === 2 ? '🥉' : `#${index + 1}`;
+
+        html += `
+            <div class="team-card ${rankClass}">
+                <div class="team-rank">${medal}</div>
+                <div class="team-info">
+                    <div class="team-name">${team.name}</div>
+                </div>
+                <div class="team-score" id="score-${team.id}">${team.score} pts</div>
+            </div>
+        `;
+    });
+
+    container.innerHTML = html;
+}
+
+function startRound(round) {
+    fetch('/api/trainer/start_round', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ round: round })
+    });
+}
+
+function togglePause() {
+    fetch('/api/trainer/pause_game', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+function resetGame() {
+    if (confirm('Are you sure you want to reset the game? All scores will be lost.')) {
+        fetch('/api/trainer/reset_game', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
+function showNotification(message) {
+    // Simple console notification for now
+    console.log('Notification:', message);
+}
+
+// Poll functions
+function startPoll() {
+    fetch('/api/poll/start', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    }).then(() => {
+        document.getElementById('pollStartBtn').style.display = 'none';
+        document.getElementById('pollStopBtn').style.display = 'inline-block';
+        document.getElementById('pollResults').style.display = 'block';
+    });
+}
+
+function stopPoll() {
+    fetch('/api/poll/stop', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    }).then(() => {
+        document.getElementById('pollStartBtn').style.display = 'inline-block';
+        document.getElementById('pollStopBtn').style.display = 'none';
+    });
+}
+
+function showPollResults(poll) {
+    document.getElementById('pollVoteCount').textContent = poll.total_votes;
+
+    let html = '';
+    poll.options.forEach(option => {
+        const percent = poll.results[option] || 0;
+        html += `
+            <div style="margin-bottom:10px;">
+                <div style="display:flex; justify-content:space-between; margin-bottom:5px;">
+                    <span style="font-size:0.85rem;">${option}</span>
+                    <span style="font-weight:bold;">${percent}%</span>
+                </div>
+                <div style="background:rgba(255,255,255,0.1); border-radius:10px; height:20px; overflow:hidden;">
+                    <div style="background:linear-gradient(135deg, #ffd700, #c9a227); height:100%; width:${percent}%; transition:width 0.5s;"></div>
+                </div>
+            </div>
+        `;
+    });
+    document.getElementById('pollBars').innerHTML = html;
+}
+
+// Initial load of teams
+syncTeams();
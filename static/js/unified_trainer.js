@@ -0,0 +1,234 @@
+const socket = io({
+    transports: SOCKETIO_TRANSPORTS,
+    reconnection: true,
+    reconnectionAttempts: 5,
+    reconnectionDelay: 2000
+});
+
+// Some venue networks block WebSockets - fall back to long-polling and upgrade later
+socket.on('connect_error', function() {
+    if (socket.io.opts.transports[0] === 'websocket') {
+        socket.io.opts.transports = ['polling', 'websocket'];
+    }
+});
+
+const SCOREBOARD_SIZE = 50;  // teams shown per game; frames may add more until the next re-sync
+let pythonTeams = {};
+let promptTeams = {};
+let pythonPaused = false;
+let promptPaused = false;
+
+// Connect to both trainer rooms
+socket.on('connect', function() {
+    socket.emit('join_trainer');
+    socket.emit('join_prompt_trainer');
+});
+
+// Switch between game panels
+function switchGame(game) {
+    document.querySelectorAll('.game-tab').forEach(t => t.classList.remove('active'));
+    document.querySelectorAll('.game-panel').forEach(p => p.classList.remove('active'));
+
+    if (game === 'python') {
+        document.querySelector('.game-tab.python').classList.add('active');
+        document.getElementById('pythonPanel').classList.add('active');
+    } else {
+        document.querySelector('.game-tab.prompt').classList.add('active');
+        document.getElementById('promptPanel').classList.add('active');
+    }
+}
+
+// Re-sync both games every 10 seconds in case a frame was missed
+setInterval(function() {
+    // Python game
+    fetch(`/api/trainer/teams?limit=${SCOREBOARD_SIZE}&answers=0`)
+        .then(r => r.json())
+        .then(data => {
+            pythonTeams = {};
+            data.teams.forEach(t => {
+                pythonTeams[t.id] = { name: t.name, score: t.score };
+            });
+            updatePythonScoreboard();
+            document.getElementById('pythonCurrentRound').textContent = data.current_round;
+        }).catch(() => {});
+
+    // Prompt game
+    fetch(`/api/prompt/trainer/teams?limit=${SCOREBOARD_SIZE}&answers=0`)
+        .then(r => r.json())
+        .then(data => {
+            promptTeams = {};
+            data.teams.forEach(t => {
+                promptTeams[t.id] = { name: t.name, score: t.score };
+            });
+            updatePromptScoreboard();
+            document.getElementById('promptCurrentRound').textContent = data.current_round;
+        }).catch(() => {});
+}, 10000);
+
+// Socket events for Python game
+socket.on('trainer_frame', function(frame) {
+    Object.entries(frame.teams).forEach(([teamId, team]) => {
+        pythonTeams[teamId] = Object.assign(pythonTeams[teamId] || {}, team);
+    });
+    updatePythonScoreboard();
+});
+
+socket.on('game_paused', function(data) {
+    pythonPaused = data.paused;
+    document.getElementById('pythonPauseText').textContent = pythonPaused ? '▶ Resume' : '⏸ Pause';
+});
+
+socket.on('game_reset', function() {
+    pythonTeams = {};
+    updatePythonScoreboard();
+});
+
+// Socket events for Prompt game
+socket.on('prompt_trainer_frame', function(frame) {
+    Object.entries(frame.teams).forEach(([teamId, team]) => {
+        promptTeams[teamId] = Object.assign(promptTeams[teamId] || {}, team);
+    });
+    updatePromptScoreboard();
+});
+
+socket.on('prompt_game_paused', function(data) {
+    promptPaused = data.paused;
+    document.getElementById('promptPauseText').textContent = promptPaused ? '▶ Resume' : '⏸ Pause';
+});
+
+socket.on('prompt_game_reset', function() {
+    promptTeams = {};
+    updatePromptScoreboard();
+});
+
+function updatePythonScoreboard() {
+    const container = document.getElementById('pythonTeamsContainer');
+    const teamArray = Object.entries(pythonTeams)
+        .map(([id, data]) => ({ id, name: data.name, score: data.score }))
+        .sort((a, b) => b.score - a.score)
+        .slice(0, SCOREBOARD_SIZE);
+
+    if (teamArray.length === 0) {
+        container.innerHTML = '<div class="no-teams"><div class="icon">👥</div><p>Waiting for teams...</p></div>';
+        return;
+    }
+
+    container.innerHTML = teamArray.map((team, i) => {
+        const rankClass = i === 0 ? 'first' : i === 1 ? 'second' : i === 2 ? 'third' : '';
+        const medal = i === 0 ? '🥇' : i === 1 ? '🥈' : i === 2 ? '🥉' : `#${i+1}`;
+        return `
+            <div class="team-card ${rankClass}">
+                <div class="team-rank">${medal}</div>
+                <div class="team-info"><div class="team-name">${team.name}</div></div>
+                <div class="team-score">${team.score} pts</div>
+            </div>
+        `;
+    }).join('');
+}
+
+function updatePromptScoreboard() {
+    const container = document.getElementById('promptTeamsContainer');
+    const teamArray = Object.entries(promptTeams)
+        .map(([id, data]) => ({ id, name: data.name, score: data.score }))
+        .sort((a, b) => b.score - a.score)
+        .slice(0, SCOREBOARD_SIZE);
+
+    if (teamArray.length === 0) {
+        container.innerHTML = '<div class="no-teams"><div class="icon">🤖</div><p>Waiting for teams...</p></div>';
+        return;
+    }
+
+    container.innerHTML = teamArray.map((team, i) => {
+        const rankClass = i === 0 ? 'first' : i === 1 ? 'second' : i === 2 ? 'third' : '';
+        const medal = i === 0 ? '🥇' : i === 1 ? '🥈' : i === 2 ? '🥉' : `#${i+1}`;
+        return `
+            <div class="team-card ${rankClass}">
+                <div class="team-rank">${medal}</div>
+                <div class="team-info"><div class="team-name">${team.name}</div></div>
+                <div class="team-score">${team.score} pts</div>
+            </div>
+        `;
+    }).join('');
+}
+
+// Python game controls
+function startPythonRound(round) {
+    fetch('/api/trainer/start_round', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ round: round })
+    });
+}
+
+function togglePythonPause() {
+    fetch('/api/trainer/pause_game', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+function resetPythonGame() {
+    if (confirm('Reset Python game? All scores will be lost.')) {
+        fetch('/api/trainer/reset_game', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
+// Prompt game controls
+function startPromptRound(round) {
+    fetch('/api/prompt/trainer/start_round', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ round: round })
+    });
+}
+
+function togglePromptPause() {
+    fetch('/api/prompt/trainer/pause', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    });
+}
+
+function resetPromptGame() {
+    if (confirm('Reset AI Prompt game? All scores will be lost.')) {
+        fetch('/api/prompt/trainer/reset', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' }
+        });
+    }
+}
+
+// Poll controls
+function startPoll() {
+    fetch('/api/poll/start', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    }).then(() => {
+        document.getElementById('pollStartBtn').style.display = 'none';
+        document.getElementById('pollStopBtn').style.display = 'inline-block';
+    });
+}
+
+function stopPoll() {
+    fetch('/api/poll/stop', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' }
+    }).then(() => {
+        document.getElementById('pollStartBtn').style.display = 'inline-block';
+        document.getElementById('pollStopBtn').style.display = 'none';
+    });
+}
+
+// Initial load
+fetch(`/api/trainer/teams?limit=${SCOREBOARD_SIZE}&answers=0`).then(r => r.json()).then(data => {
+    data.teams.forEach(t => { pythonTeams[t.id] = { name: t.name, score: t.score }; });
+    updatePythonScoreboard();
+}).catch(() => {});
+
+fetch(`/api/prompt/trainer/teams?limit=${SCOREBOARD_SIZE}&answers=0`).then(r => r.json()).then(data => {
+    data.teams.forEach(t => { promptTeams[t.id] = { name: t.name, score: t.score }; });
+    updatePromptScoreboard();
+}).catch(() => {});
@@ -0,0 +1,48 @@
+// Runs team code off the page's main thread, so an endless loop can't freeze the UI, the
+// Socket.IO connection or the round clock; the page terminates this worker on a timeout
+importScripts('{{ vendor_url('pyodide', 'pyodide.js') }}');
+
+// Each run gets a fresh __main__ namespace and its own stdout/stderr buffer
+const HARNESS = `
+import contextlib
+import io
+import traceback
+
+def _kia_run(code):
+    output = io.StringIO()
+    namespace = {'__name__': '__main__', '__builtins__': __builtins__}
+    try:
+        with contextlib.redirect_stdout(output):
+            exec(compile(code, '<exec>', 'exec'), namespace)
+    except BaseException as e:
+        # Drop this harness's own frame from the traceback
+        error = ''.join(traceback.format_exception(type(e), e, e.__traceback__.tb_next))
+        return output.getvalue(), error.strip()
+    return output.getvalue(), None
+`;
+
+const ready = loadPyodide({ indexURL: new URL('{{ vendor_base_url('pyodide') }}', self.location).href })
+    .then(pyodide => {
+        pyodide.runPython(HARNESS);
+        return pyodide.globals.get('_kia_run');
+    });
+
+ready.then(
+    () => self.postMessage({ type: 'ready' }),
+    error => self.postMessage({ type: 'failed', error: String(error) })
+);
+
+self.onmessage = async event => {
+    const { id, code } = event.data;
+    const run = await ready;
+    let result;
+    try {
+        const returned = run(code);
+        const [output, error] = returned.toJs();
+        returned.destroy();
+        result = { output: output.trim(), error: error === undefined ? null : error };
+    } catch (error) {
+        result = { output: '', error: String(error && error.message || error) };
+    }
+    self.postMessage({ type: 'result', id, ...result });
+};
@@ -0,0 +1,36 @@
+// Keeps the self-hosted Python interpreter and client libraries on the phone, so the first
+// round starts without anyone downloading megabytes over the venue network.
+const CACHE = 'kia-vendor-{{ cache_version }}';
+const ASSETS = {{ assets | tojson }};
+
+self.addEventListener('install', event => {
+    event.waitUntil(
+        caches.open(CACHE)
+            .then(cache => cache.addAll(ASSETS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', event => {
+    // Versions are part of the URLs, so anything in an older cache is no longer referenced
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys
+                .filter(key => key.startsWith('kia-vendor-') && key !== CACHE)
+                .map(key => caches.delete(key))))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const url = new URL(event.request.url);
+    if (event.request.method !== 'GET' || url.origin !== self.location.origin || !url.pathname.startsWith('/vendor/')) {
+        return;
+    }
+    event.respondWith(
+        caches.open(CACHE).then(cache => cache.match(event.request).then(hit => hit || fetch(event.request).then(response => {
+            if (response.ok) cache.put(event.request, response.clone());
+            return response;
+        })))
+    );
+});
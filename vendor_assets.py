@@ -0,0 +1,132 @@
+"""
+Self-hosted client libraries
+Pyodide, the Socket.IO client and Bootstrap are downloaded once (at build time) into VENDOR_DIR,
+with brotli and gzip copies next to each file, and served from versioned /vendor/ URLs with
+immutable cache headers. Phones then load the interpreter from the venue server instead of
+the internet, and the session works on a LAN with no uplink at all.
+
+    python vendor_assets.py          download anything missing and precompress it
+"""
+
+import gzip
+import hashlib
+import os
+import shutil
+import sys
+import urllib.request
+
+try:
+    import brotli
+except ImportError:  # gzip variants only
+    brotli = None
+
+
+VENDOR_DIR = os.environ.get('VENDOR_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vendor'))
+
+# name: (version, CDN base URL, files); files are served at /vendor/<name>/<version>/<file>
+ASSETS = {
+    'pyodide': ('0.24.1', 'https://cdn.jsdelivr.net/pyodide/v{version}/full/',
+                ('pyodide.js', 'pyodide.asm.js', 'pyodide.asm.wasm', 'python_stdlib.zip', 'pyodide-lock.json')),
+    'socket.io': ('4.0.0', 'https://cdn.socket.io/{version}/', ('socket.io.min.js',)),
+    'bootstrap': ('5.3.0', 'https://cdn.jsdelivr.net/npm/bootstrap@{version}/dist/css/', ('bootstrap.min.css',)),
+}
+
+# Encodings with a precompressed copy on disk, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+MIMETYPES = {
+    '.js': 'text/javascript',
+    '.css': 'text/css',
+    '.wasm': 'application/wasm',   # required for streaming compilation
+    '.json': 'application/json',
+    '.zip': 'application/zip',
+}
+
+
+def local_path(name, filename):
+    version = ASSETS[name][0]
+    return os.path.join(VENDOR_DIR, name, version, filename)
+
+
+def is_vendored(name, filename):
+    return os.path.exists(local_path(name, filename))
+
+
+def url_for_asset(name, filename):
+    """Versioned local URL when the file has been downloaded, otherwise the CDN"""
+    version, cdn, _ = ASSETS[name]
+    if is_vendored(name, filename):
+        return f'/vendor/{name}/{version}/{filename}'
+    return cdn.format(version=version) + filename
+
+
+def base_url(name):
+    """Directory URL for a whole asset set (e.g. Pyodide's indexURL): local only if every file is"""
+    version, cdn, files = ASSETS[name]
+    if all(is_vendored(name, filename) for filename in files):
+        return f'/vendor/{name}/{version}/'
+    return cdn.format(version=version)
+
+
+def precache_urls():
+    """Local URLs of every downloaded file, for the service worker to precache"""
+    return [f'/vendor/{name}/{version}/{filename}'
+            for name, (version, _, files) in ASSETS.items()
+            for filename in files if is_vendored(name, filename)]
+
+
+def cache_version():
+    """Changes whenever the set of vendored files or their versions does"""
+    return hashlib.sha256('\n'.join(precache_urls()).encode()).hexdigest()[:12]
+
+
+def resolve(name, version, filename, accept_encoding):
+    """(path, content encoding or None, mimetype) of the best variant for a request, or None
+
+    `accept_encoding` is a callable giving the client's quality for an encoding name.
+    """
+    if name not in ASSETS or ASSETS[name][0] != version or filename not in ASSETS[name][2]:
+        return None
+    path = local_path(name, filename)
+    if not os.path.exists(path):
+        return None
+    mimetype = MIMETYPES.get(os.path.splitext(filename)[1], 'application/octet-stream')
+    for encoding, suffix in ENCODINGS:
+        if accept_encoding(encoding) and os.path.exists(path + suffix):
+            return path + suffix, encoding, mimetype
+    return path, None, mimetype
+
+
+def compress(path):
+    """Write gzip (and brotli, if installed) copies of a file next to it"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def download(force=False):
+    """Fetch every asset that isn't on disk yet and precompress it"""
+    for name, (version, cdn, files) in ASSETS.items():
+        for filename in files:
+            path = local_path(name, filename)
+            if os.path.exists(path) and not force:
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            url = cdn.format(version=version) + filename
+            print(f"downloading {url}")
+            with urllib.request.urlopen(url, timeout=120) as response, open(path + '.part', 'wb') as f:
+                shutil.copyfileobj(response, f)
+            os.replace(path + '.part', path)
+            compress(path)
+
+
+if __name__ == '__main__':
+    download(force='--force' in sys.argv)
+    if brotli is None:
+        print("brotli is not installed: only gzip copies were written (pip install brotli)")
+    for url in precache_urls():
+        print(url)
@@ -0,0 +1,253 @@
+"""
+Question bank verifier
+Runs every Python solution and prompt reference answer (`solution_code`) in the sandbox pool
+and grades its output with the same matcher that grades teams. Each matcher is also probed
+with plausible wrong answers (stray prints, single lines, a truncated or altered output,
+sibling questions' outputs), to find questions whose loose rules would accept them.
+
+    python verify_bank.py                      verify every pack under CONTENT_DIR
+    python verify_bank.py --json report.json   also write the per-question report
+    python verify_bank.py --workers 8          sandbox worker processes (default: CPU count)
+    python verify_bank.py --strict             also fail on loose matches and ambiguous matchers
+    python verify_bank.py --synthetic 5000     time a generated bank of that many questions
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional
+
+from content_packs import CONTENT_DIR, SCHEMAS, ContentPackError, compile_bank, write_synthetic_packs
+from question_bank import NUMBER_PATTERN, normalize_output, split_output_lines
+from sandbox import SandboxPool, SandboxBusy
+
+logger = logging.getLogger(__name__)
+
+
+# Rules that only accept the expected output itself; any other rule accepting a reference
+# answer means the pack's expected output is off and only the matcher's slack hides it
+STRICT_RULES = ('exact', 'lines')
+
+# What a team's half-finished code commonly prints
+STRAY_OUTPUTS = ('0', '1', 'None', 'True', 'False', 'Error')
+
+SIBLINGS = 4   # neighbouring questions in the same round whose outputs are tried as wrong answers
+
+BUSY_RETRIES = 5     # times a job is retried when the pool rejects it as busy
+BUSY_BACKOFF = 0.5   # seconds, growing linearly per retry
+
+FAILED = ('mismatch', 'error', 'timeout')   # statuses that fail verification
+WARNINGS = ('loose', 'missing')             # statuses that only fail with --strict
+
+
+class QuestionResult(NamedTuple):
+    id: str
+    round: int
+    status: str                 # 'ok', 'loose', 'missing', or one of FAILED
+    rule: Optional[str]         # matcher rule that accepted the reference output
+    elapsed_ms: float           # sandbox execution time
+    output: str
+    error: Optional[str]
+    accepted_wrong: tuple       # (rule, wrong answer) pairs the matcher accepts
+
+
+class Report(NamedTuple):
+    game: str
+    results: tuple              # QuestionResult per question, in bank order
+    elapsed_ms: float           # wall clock for the whole bank
+
+    def counts(self):
+        counts = {'questions': len(self.results), 'ambiguous': 0}
+        for result in self.results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+            counts['ambiguous'] += bool(result.accepted_wrong)
+        return counts
+
+    def failed(self, strict=False):
+        statuses = FAILED + WARNINGS if strict else FAILED
+        return any(r.status in statuses or (strict and r.accepted_wrong) for r in self.results)
+
+    def problems(self):
+        return [r for r in self.results if r.status != 'ok' or r.accepted_wrong]
+
+
+def wrong_answers(record, siblings=()):
+    """Plausible wrong outputs for a question: none of them should pass its matcher"""
+    expected = record.expected_output.strip()
+    lines = [line.strip() for line in expected.split('\n') if line.strip()]
+    candidates = list(STRAY_OUTPUTS)
+    if len(lines) > 1:
+        candidates.extend(lines)                        # a single line of the answer
+        candidates.append('\n'.join(lines[:-1]))        # everything but the last line
+    numbers = list(NUMBER_PATTERN.finditer(expected))
+    if numbers:
+        last = numbers[-1]
+        digits = last.group()
+        whole, dot, fraction = digits.partition('.')
+        # The last number ten times too big ('100' -> '1000'), still matching its prefix
+        candidates.append(f"{expected[:last.start()]}{whole}0{dot}{fraction}{expected[last.end():]}")
+    candidates.extend(sibling.expected_output for sibling in siblings)
+    return candidates
+
+
+def probe(record, siblings=()):
+    """(rule, wrong answer) for every wrong answer the question's matcher accepts"""
+    expected_norm = record.matcher.expected_norm
+    expected_lines = record.matcher.expected_lines
+    accepted = []
+    seen = set()
+    for candidate in wrong_answers(record, siblings):
+        norm = normalize_output(candidate)
+        if not norm or norm in seen or norm == expected_norm or split_output_lines(candidate) == expected_lines:
+            continue
+        seen.add(norm)
+        rule = record.matcher.match_rule(candidate)
+        if rule is not None:
+            accepted.append((rule, candidate))
+    return tuple(accepted)
+
+
+def check(record, result, siblings=()):
+    """Grade one sandbox result (None when the question has no reference answer)"""
+    accepted_wrong = probe(record, siblings)
+    if result is None:
+        return QuestionResult(record.id, record.round, 'missing', None, 0, '', None, accepted_wrong)
+    output = result['stdout']
+    error = result['error']
+    if error and error.startswith(('Time limit exceeded', 'CPU time limit exceeded')):
+        status, rule = 'timeout', None
+    elif error:
+        status, rule = 'error', None
+    else:
+        rule = record.matcher.match_rule(output)
+        status = 'mismatch' if rule is None else 'ok' if rule in STRICT_RULES else 'loose'
+    return QuestionResult(record.id, record.round, status, rule, result['elapsed_ms'],
+                          output, error, accepted_wrong)
+
+
+def _run(pool, code):
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return pool.run(code)
+        except SandboxBusy as e:
+            error = str(e)
+            time.sleep(BUSY_BACKOFF * (attempt + 1))   # a shared pool is busy grading; let it drain
+    return {'success': False, 'stdout': '', 'error': error, 'elapsed_ms': 0}
+
+
+def verify(compiled, pool, game='', workers=None):
+    """Run every reference answer in a CompiledBank on a started SandboxPool; returns a Report
+
+    At most `workers` answers run at once (default: the pool size), so a pool shared with
+    grading keeps the rest of its workers for teams.
+    """
+    started = time.perf_counter()
+    records = list(compiled.index.values())
+    by_round = {}
+    for record in records:
+        by_round.setdefault(record.round, []).append(record)
+    siblings = {}
+    for round_records in by_round.values():
+        for position, record in enumerate(round_records):
+            start = max(0, min(position - SIBLINGS // 2, len(round_records) - SIBLINGS - 1))
+            siblings[record.id] = [r for r in round_records[start:start + SIBLINGS + 1] if r is not record]
+
+    with ThreadPoolExecutor(max_workers=min(workers or pool.size, pool.size)) as executor:
+        futures = [executor.submit(_run, pool, record.data['solution_code'])
+                   if record.data.get('solution_code') else None for record in records]
+        results = tuple(
+            check(record, future.result() if future is not None else None, siblings[record.id])
+            for record, future in zip(records, futures))
+    return Report(game, results, round((time.perf_counter() - started) * 1000, 1))
+
+
+def ambiguous_rules(report):
+    """Matcher rule -> IDs of the questions where it accepts a wrong answer, and one example"""
+    rules = {}
+    for result in report.results:
+        for rule, answer in result.accepted_wrong:
+            ids, example = rules.setdefault(rule, ([], (result.id, answer)))
+            if not ids or ids[-1] != result.id:
+                ids.append(result.id)
+    return rules
+
+
+def _shorten(text, limit=60):
+    return text if len(text) <= limit else text[:limit - 3] + '...'
+
+
+def log_report(report):
+    """A summary line per bank, a line per question that failed, and a line per ambiguous rule"""
+    counts = report.counts()
+    log = logger.error if report.failed() else logger.warning if report.problems() else logger.info
+    log("Verified %s bank in %.0f ms: %s", report.game or 'question',
+        report.elapsed_ms, ', '.join(f"{count} {name}" for name, count in counts.items()))
+    for result in report.results:
+        if result.status in FAILED:
+            logger.error("  %s %s: %s%s", report.game, result.id, result.status,
+                         f" ({_shorten(result.error)})" if result.error else
+                         f", printed {_shorten(result.output.strip())!r}")
+        elif result.status != 'ok':
+            logger.warning("  %s %s: %s%s", report.game, result.id, result.status,
+                           f", only accepted by the '{result.rule}' rule" if result.rule else '')
+    for rule, (ids, (example_id, answer)) in ambiguous_rules(report).items():
+        logger.warning("  '%s' accepts wrong answers to %d question(s), e.g. %r for %s",
+                       rule, len(ids), _shorten(answer), example_id)
+
+
+def report_json(reports):
+    return {
+        report.game: {
+            'elapsed_ms': report.elapsed_ms,
+            'counts': report.counts(),
+            'questions': [dict(result._asdict(), accepted_wrong=[list(pair) for pair in result.accepted_wrong])
+                          for result in report.results]
+        } for report in reports
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', metavar='PATH', help='write the per-question report as JSON')
+    parser.add_argument('--workers', type=int, default=0, help='sandbox worker processes')
+    parser.add_argument('--strict', action='store_true', help='fail on loose matches and ambiguous matchers')
+    parser.add_argument('--synthetic', type=int, metavar='N', help='verify a generated bank of N questions')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    pool = SandboxPool(workers=args.workers or None).start()
+    reports = []
+    try:
+        if args.synthetic:
+            with tempfile.TemporaryDirectory() as directory:
+                write_synthetic_packs(directory, 'python', args.synthetic)
+                compiled = compile_bank(directory, SCHEMAS['python'])
+            reports.append(verify(compiled, pool, 'synthetic'))
+        else:
+            for game, schema in SCHEMAS.items():
+                try:
+                    compiled = compile_bank(os.path.join(CONTENT_DIR, game), schema)
+                except ContentPackError as e:
+                    logger.error("%s: %s", game, e)
+                    return 1
+                reports.append(verify(compiled, pool, game))
+    finally:
+        pool.shutdown()
+
+    for report in reports:
+        log_report(report)
+        slowest = sorted(report.results, key=lambda result: result.elapsed_ms, reverse=True)[:3]
+        logger.info("  slowest: %s", ', '.join(f"{r.id} {r.elapsed_ms:.1f} ms" for r in slowest))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report_json(reports), f, indent=2)
+    return 1 if any(report.failed(args.strict) for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
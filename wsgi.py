@@ -0,0 +1,13 @@
+"""
+Production entry point for an async (gevent) worker
+gunicorn -k gevent -w 1 --worker-connections 5000 wsgi:app
+"""
+
+from gevent import monkey
+monkey.patch_all()
+
+import os
+
+os.environ.setdefault('SOCKETIO_ASYNC_MODE', 'gevent')
+
+from app import app, socketio  # noqa: E402,F401